@@ -4,3 +4,21 @@ PYXET_REPO = os.getenv("PYXET_REPO", "xet://xdssio/xethub-py-3/main")
 GITXET_REPO = os.getenv("GITXET_REPO", "xet://xdssio/xethub-git-3/main")
 LAKEFS_REPO = os.getenv("LAKEFS_REPO", "lakefs://benchmarks/main")
 S3_BUCKET = os.getenv("S3_BUCKET", "benchmarks-uploads")
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+CACHE_SIZE_GB = float(os.getenv("CACHE_SIZE_GB", 20))
+COMMAND_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", 3 * 60 * 60))
+CHUNK_SIZE = 1024 * 1024  # rows generated and written at once
+CHUNK_MB = int(os.getenv("CHUNK_MB", 256))  # caps the rows of a chunk for wide tables
+WORKERS = os.cpu_count() or 1
+S3_PART_SIZE_MB = int(os.getenv("S3_PART_SIZE_MB", 8))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", 8))
+LOCAL_BACKEND_DIR = os.getenv("LOCAL_BACKEND_DIR", "local-backends")
+LOCAL_BANDWIDTH_MBPS = float(os.getenv("LOCAL_BANDWIDTH_MBPS", 0))  # 0 is unlimited
+LOCAL_LATENCY_MS = float(os.getenv("LOCAL_LATENCY_MS", 0))
+LOCAL_JITTER_MS = float(os.getenv("LOCAL_JITTER_MS", 0))
+# chunk sizes of the ideal dedup volume of every prepared step, e.g. "16,64,1024" - empty skips the analysis,
+# which chunks and hashes every file on the critical path
+DEDUP_CHUNK_SIZES_KB = [int(size) for size in os.getenv("DEDUP_CHUNK_SIZES_KB", "").split(",") if size]
+SAMPLE_INTERVAL_MS = float(os.getenv("SAMPLE_INTERVAL_MS", 50))  # 0 disables resource sampling of uploads
+TAXI_DIR = os.getenv("TAXI_DIR", "data")  # where src/download.py saved the monthly FHVHV files
+GIT_SYNC = os.getenv("GIT_SYNC", "full")  # how repos are fetched before a run: full, blobless or shallow
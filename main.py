@@ -1,55 +1,52 @@
+import atexit
 import contextlib
+import contextvars
+import functools
 import os
+import random
 import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from alive_progress import alive_bar
 import typer
 from typing_extensions import Annotated
 from enum import Enum
-import pyxet
 from typing import List
-from src.generators import DataFrameGenerator
+from src.cache import DatasetCache
+from constants import CACHE_DIR, CACHE_SIZE_GB, CHUNK_SIZE, WORKERS, DEDUP_CHUNK_SIZES_KB, SAMPLE_INTERVAL_MS, TAXI_DIR, \
+    GIT_SYNC
+from src import spans
 from src.helper import Helper
-import subprocess
+from src.backends import create_backends
+from src.export import ExportOptions
 from src.logger import Logger
+from src.runs import RunPlan, with_retries
+from src.scheduler import jobs, run_jobs, ISOLATED, CONTENTION
+from src.versions import git_branch, package_version, tool_version
 
 LOGS = 'logs'
 helper = Helper()
-COPY_REPOS = {'gitxet': Helper.XETHUB_GIT,
-              'lfs-git': Helper.LFS_GITHUB,
-              'lfs-s3': Helper.LFS_S3,
-              'dvc': Helper.DVC}
-
-upload_functions = {'pyxet': helper.pyxet_upload,
-                    's3': helper.s3_upload,
-                    'gitxet': helper.gitxet_upload,
-                    'lakefs': helper.lakefs_upload,
-                    'lfs-git': helper.lfs_git_upload,
-                    'lfs-s3': helper.lfs_s3_upload,
-                    'dvc': helper.dvc_upload,
-                    }
-
-#
-gitxet_version = subprocess.run(
-    "git xet --version", shell=True, capture_output=True).stdout.decode('utf-8')
-branch = subprocess.run("git branch --show-current", shell=True, capture_output=True).stdout.decode('utf-8').replace(
-    '\n', '')
+cache = DatasetCache(CACHE_DIR, int(CACHE_SIZE_GB * 1024 ** 3))
+backends = create_backends(helper=helper)
+# the techs benchmarked when none are given - the local emulators are opt-in
+DEFAULT_TECHS = [name for name, backend in backends.items() if backend.default]
+
 app = typer.Typer()
-helper = Helper()
-logger = Logger('logs', {'pyxet': pyxet.__version__,
-                         'gitxet': gitxet_version,
-                         'branch': branch})
+# versions are only probed when the first result is logged
+logger = Logger('logs', {'pyxet': functools.partial(package_version, 'pyxet'),
+                         'gitxet': functools.partial(tool_version, "git xet --version", 'git-xet'),
+                         'branch': git_branch})
+
 
+@atexit.register
+def _write_trace():
+    """Every traced phase of the run, for chrome://tracing or ui.perfetto.dev"""
+    if spans.finished():
+        spans.write_chrome_trace(f"{LOGS}/traces/{logger.name}.json")
 
-class Tech(str, Enum):
-    s3 = "s3"
-    pyxet = "pyxet"
-    gitxet = "gitxet"
-    lakefs = "lakefs"
-    lfs_git = "lfs-git"
-    lfs_s3 = "lfs-s3"
-    dvc = "dvc"
+
+Tech = Enum('Tech', {name.replace('-', '_'): name for name in backends}, type=str)
 
 
 class Workflows(str, Enum):
@@ -65,176 +62,442 @@ class Suffix(str, Enum):
     txt = "txt"
 
 
-def track(func: callable, args: list):
-    logger.info(f"running {func.__name__}")
-    params = {'function_name': func.__name__}
-    start_time = time.time()
-    func(*args)
-    params['time'] = time.time()-start_time
+class Compression(str, Enum):
+    none = "none"
+    snappy = "snappy"
+    gzip = "gzip"
+    brotli = "brotli"
+    zstd = "zstd"
+    lz4 = "lz4"
+
+
+class ConcurrencyMode(str, Enum):
+    isolated = ISOLATED
+    contention = CONTENTION
+
+
+class SyncMode(str, Enum):
+    full = "full"
+    blobless = "blobless"
+    shallow = "shallow"
+
+
+@functools.lru_cache()
+def _sampler():
+    """Started by the first tracked upload - None if sampling is disabled"""
+    if not SAMPLE_INTERVAL_MS:
+        return None
+    from src.utils.sampler import ResourceSampler
+    return ResourceSampler(SAMPLE_INTERVAL_MS / 1000)
+
+
+@contextlib.contextmanager
+def _record(params: dict):
+    """Samples network, disk, cpu and memory while the block runs - the stats are added to params"""
+    sampler = _sampler()
+    if sampler is None:
+        yield
+        return
+    with sampler.record() as timeline:
+        yield
+    params.update(timeline.stats())
+    os.makedirs(f"{LOGS}/samples", exist_ok=True)
+    params['samples'] = f"{LOGS}/samples/{logger.name}-{params.get('tech', '')}-{time.time_ns()}.npz"
+    timeline.save(params['samples'])
+
+
+def _add_spans(params: dict):
+    """Adds the seconds of every phase of the current trace so far to the params, e.g. upload/copy"""
+    root = spans.current()
+    if root is not None:
+        params['spans'] = {**params.get('spans', {}), **root.durations(f"{root.name}/")}
+
+
+def _traced(name: str):
+    """Runs a workflow step in a trace - the seconds of its phases are added to the artifact params"""
+    def decorator(func: callable):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with spans.trace(name, function=func.__name__) as root:
+                artifact = func(*args, **kwargs)
+            artifact['params']['spans'] = root.durations(f"{name}/")
+            return artifact
+        return wrapper
+    return decorator
+
+
+def track(func: callable, args: list, params: dict = None):
+    params = {'function_name': func.__name__, **(params or {})}
+    logger.info(f"running {params['function_name']}")
+    with jobs.job(params.get('tech', func.__name__)) as overlaps, _record(params), \
+            spans.span(params['function_name']):
+        start_time = time.time()
+        result = func(*args)
+        params['time'] = time.time()-start_time
+    if isinstance(result, dict):  # e.g. part statistics of the native s3 upload
+        params.update({key: value for key, value in result.items() if key not in params})
+    params['overlaps'] = sorted(overlaps)
+    params['failed'] = _failure(params) is not None  # failed attempts are logged but never measured
+    _add_spans(params)
     logger.log(params)
+    return params
 
 
 @app.command()
-def pull():
+def pull(mode: Annotated[SyncMode, typer.Option(
+        help="full: fetch everything, blobless: only the file contents which are checked out - "
+             "a full clone becomes a partial clone for good and later git commands fetch blobs lazily, "
+             "which adds to the measured times, shallow: only the latest commit")] = GIT_SYNC):
     """Pull all repos to make sure we have the latest files in all repositories"""
-    _pull()
-
-
-def _pull():
-    command = """
-        cd lfs-github && git pull && cd .. && \
-        cd lfs-s3 && git pull && cd .. && \
-        cd dvc && git pull && cd .. && \
-        cd xethub-git && git pull && cd .. 
-        """
-    helper.run(command, verbose=False)
-
-
-def _taxi():
-    raise NotImplementedError
-
-
-def _features(tech: str,
-              step: int,
-              start_rows: int,
-              suffix: Suffix,
-              seed: int,
-              label: str = 'default'):
+    _pull(mode)
+
+
+def _pull(mode: str = GIT_SYNC):
+    """Syncs the repos at the same time - repos which have the remote head already aren't fetched"""
+    results = helper.sync([Helper.LFS_GITHUB, Helper.LFS_S3, Helper.DVC, Helper.XETHUB_GIT], SyncMode(mode).value)
+    for repo, result in results.items():
+        error = f" - {result['error']}" if result.get('error') else ''
+        logger.info(f"sync {repo}: {result['status']} in {result['time']:.2f}s{error}")
+    return results
+
+
+def _export_options(row_group_size: int = None,
+                    align: bool = False,
+                    start_rows: int = 0,
+                    add_rows: int = None,
+                    compression: Compression = Compression.snappy,
+                    compression_level: int = None,
+                    dictionary: bool = True,
+                    statistics: bool = True) -> ExportOptions:
+    """Parquet layout from the cli options - align pins row group boundaries to the end of every step"""
+    return ExportOptions(row_group_size=row_group_size,
+                         align_rows=add_rows if align and add_rows else None,
+                         align_start=start_rows if align and add_rows else 0,
+                         compression=Compression(compression).value,
+                         compression_level=compression_level,
+                         use_dictionary=dictionary,
+                         write_statistics=statistics)
+
+
+def _export_params(export_options: ExportOptions) -> dict:
+    """The layout as result columns"""
+    return {key: value for key, value in export_options.to_dict().items() if key != 'align_start'}
+
+
+def _generator(**kwargs):
+    """pandas, pyarrow and faker are only imported once data is generated"""
+    from src.generators import DataFrameGenerator
+    return DataFrameGenerator(**kwargs)
+
+
+def _generate(cache_params: dict, filepaths: list, generate: callable) -> int:
+    """Takes the files from the dataset cache, or generates and caches them - returns the number of generated rows"""
+    with spans.span('cache checkout'):
+        if cache.checkout(cache_params, filepaths):
+            return 0
+    with spans.span('export'):
+        generated_rows = generate()
+    with spans.span('cache put'):
+        cache.put(cache_params, filepaths)
+    return generated_rows
+
+
+def _analyze_dedup(artifact: dict, cache_params: dict, step_param: str):
+    """
+    Adds the ideal transfer volume of the step - the MB of its files no earlier step had - per dedup chunk size.
+    Steps of the same series share the cache params, except for step_param which grows with the step.
+    """
+    if not DEDUP_CHUNK_SIZES_KB:
+        return
+    from src.dedup import DedupAnalyzer
+    analyzer = DedupAnalyzer(f"{LOGS}/dedup", [size * 1024 for size in DEDUP_CHUNK_SIZES_KB])
+    series = cache.key({key: value for key, value in cache_params.items() if key != step_param})
+    with spans.span('dedup'):
+        report = analyzer.analyze(series, artifact['params']['step'], artifact['files'])
+    for label, stats in report.items():
+        artifact['params'][f"ideal_mb_{label}"] = helper.to_mb(stats['new_bytes'])
+    artifact['params']['dedup'] = report
+
+
+def _cleanup(artifact: dict, tech: str = None):
+    """Removes the copies of a tech in its repo, or without a tech, the artifact files which are not kept"""
+    for filepath in artifact['files']:
+        if tech is None and filepath not in artifact['keep'] and os.path.exists(filepath):
+            os.remove(filepath)
+        repo = backends[Tech(tech).value].repo if tech is not None else None
+        if repo and os.path.exists(f"{repo}/{os.path.basename(filepath)}"):
+            os.remove(f"{repo}/{os.path.basename(filepath)}")
+
+
+@_traced('prepare')
+def _prepare_features(step: int,
+                      start_rows: int,
+                      suffix: Suffix,
+                      seed: int,
+                      chunk_size: int = CHUNK_SIZE,
+                      workers: int = WORKERS,
+                      export_options: ExportOptions = None):
+    suffix = Suffix(suffix).value
     params = {'workflow': 'feature-engineering',
-              'tech': tech,
               'step': step,
               'suffix': suffix,
               'seed': seed,
               'start_rows': start_rows,
+              'rows': start_rows,
               'numeric': True,
-              'merge': True,
-              'label': label}
+              'merge': True}
     os.makedirs('data', exist_ok=True)
-    generator = DataFrameGenerator(seed=seed, numeric=True)
-    filename = f"features.{suffix}"
-    filepath = f"data/{filename}"
-    df = generator.generate(start_rows)
-    data_features = generator.generate_features(start_rows, step)
-    for column in data_features.columns:
-        df[column] = data_features[column]
-
-    generator.export(df, filepath)
-    params['file_size'] = helper.get_file_size(filepath)
-    params['filename'] = filename
-    logger.params.update(params)
-    if tech in COPY_REPOS:
-        logger.info(f"Copying file to {COPY_REPOS[tech]}")
-        shutil.copyfile(filepath, f"{COPY_REPOS[tech]}/{filename}")
-    func = upload_functions.get(tech)
-    track(func, [filepath])
-
-    # cleanup
-    if os.path.exists(filepath):
-        os.remove(filepath)
-    if os.path.exists(f"{COPY_REPOS.get(tech)}/{filename}"):
-        os.remove(f"{COPY_REPOS.get(tech)}/{filename}")
-
-
-def _split(tech: str,
-           step: int,
-           start_rows: int,
-           add_rows: int,
-           suffix: Suffix,
-           seed: int,  # type: ignore
-           label: str = 'default'):
+    export_options = export_options or ExportOptions()
+    params.update(_export_params(export_options))
+    generator = _generator(seed=seed, numeric=True, chunk_size=chunk_size, workers=workers,
+                           export_options=export_options)
+    filepath = f"data/features.{suffix}"
+    cache_params = {'workflow': 'feature-engineering', 'seed': seed, 'rows': start_rows, 'features': step,
+                    'numeric': True, 'suffix': suffix, 'chunk_size': chunk_size,
+                    'chunk_rows': generator.chunk_rows(step),
+                    'export_options': export_options.to_dict()}
+    params['generated_rows'] = _generate(cache_params, [filepath],
+                                         lambda: generator.export_range(filepath, start_rows, features=step))
+    artifact = {'params': params, 'files': [filepath], 'keep': []}
+    _analyze_dedup(artifact, cache_params, 'features')
+    return artifact
+
+
+@_traced('prepare')
+def _prepare_split(step: int,
+                   start_rows: int,
+                   add_rows: int,
+                   suffix: Suffix,
+                   seed: int,
+                   chunk_size: int = CHUNK_SIZE,
+                   workers: int = WORKERS,
+                   export_options: ExportOptions = None):
+    suffix = Suffix(suffix).value
+    train_size = start_rows + (add_rows * step)
     params = {'workflow': 'split',
-              'tech': tech,
               'step': step,
               'suffix': suffix,
               'seed': seed,
               'start_rows': start_rows,
               'add_rows': add_rows,
+              'rows': train_size + (2 * add_rows),
               'numeric': True,
-              'merge': True,
-              'label': label}     # type: ignore
+              'merge': True}
     os.makedirs('data', exist_ok=True)
-    generator = DataFrameGenerator(seed=seed, numeric=True)
+    export_options = export_options or ExportOptions()
+    params.update(_export_params(export_options))
+    generator = _generator(seed=seed, numeric=True, chunk_size=chunk_size, workers=workers,
+                           export_options=export_options)
 
-    train_size = start_rows + (add_rows * step)
-    df = generator.generate(train_size + (2 * add_rows))
-    train, validation, test = df.iloc[:train_size], df.iloc[train_size:train_size + add_rows], df.iloc[
-        train_size + add_rows:]
     train_path, test_path, validation_path = f"data/train.{suffix}", f"data/test.{suffix}", f"data/validation.{suffix}"
-    for df, path in [(train, train_path), (test, test_path), (validation, validation_path)]:
-        generator.export(df, path)
-
-    if tech in COPY_REPOS:
-        logger.info(f"Copying file to {COPY_REPOS[tech]}")
-        for path in [train_path, test_path, validation_path]:
-            shutil.copyfile(
-                path, f"{COPY_REPOS[tech]}/{os.path.basename(path)}")
-    func: callable = upload_functions.get(tech)
-    with contextlib.suppress(KeyError):
-        start_time = time.time()
-        for filepath in (train_path, test_path, validation_path):
-            if hasattr(func, '__name__'):
-                logger.info(f"running {func.__name__} on {filepath}")
-            params['file_size'] = helper.get_file_size(filepath)
-            params['filename'] = os.path.basename(filepath)
-            logger.params.update(params)
-            """
-            This create another line per file of train, test and validation - but it makes the output file less consistent  
-            """
-            # track(func, [filepath])
-        params['time'] = time.time() - start_time
-        params['file_size'] = params['file_size'] + (params['file_size'] * 2)
-        params['filename'] = f"splits.{suffix}"
-        params['function'] = f"split-{func.__name__}"
-        logger.log(params)
-    # cleanup
-    for filepath in (train_path, test_path, validation_path):
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        if os.path.exists(f"{COPY_REPOS.get(tech)}/{os.path.basename(filepath)}"):
-            os.remove(
-                f"{COPY_REPOS.get(tech)}/{os.path.basename(filepath)}")
-
 
-def _append(tech: str,
-            step: int,
-            start_rows: int,
-            add_rows: int,
-            suffix: str,
-            diverse: bool,
-            seed: int,
-            label: str = 'default'):
+    def train():
+        with spans.span('train'):
+            return generator.extend(train_path, train_size)
+
+    def evaluation():
+        with spans.span('validation and test'):
+            generator.export_split([(validation_path, add_rows), (test_path, add_rows)], start=train_size)
+
+    def generate():
+        # train only generates the new rows of the step, so it's written next to validation and test
+        with ThreadPoolExecutor(2) as pool:  # the spans of both threads nest in the export span
+            train_rows = pool.submit(contextvars.copy_context().run, train)
+            pool.submit(contextvars.copy_context().run, evaluation).result()
+            return train_rows.result() + (2 * add_rows)
+
+    cache_params = {'workflow': 'split', 'seed': seed, 'rows': train_size, 'add_rows': add_rows, 'numeric': True,
+                    'suffix': suffix, 'chunk_size': chunk_size,
+                    'export_options': export_options.to_dict()}
+    params['generated_rows'] = _generate(
+        cache_params, [train_path, generator.manifest_path(train_path), validation_path, test_path], generate)
+    # train is kept so the next step only generates the new rows
+    artifact = {'params': params, 'files': [train_path, validation_path, test_path], 'keep': [train_path]}
+    _analyze_dedup(artifact, cache_params, 'rows')
+    return artifact
+
+
+@_traced('prepare')
+def _prepare_append(step: int,
+                    start_rows: int,
+                    add_rows: int,
+                    suffix: str,
+                    diverse: bool,
+                    seed: int,
+                    chunk_size: int = CHUNK_SIZE,
+                    workers: int = WORKERS,
+                    export_options: ExportOptions = None):
+    suffix = Suffix(suffix).value
     numeric = not diverse
+    rows = start_rows + (add_rows * step)
     params = {'workflow': 'append',
-              'tech': tech,
               'step': step,
               'suffix': suffix,
               'seed': seed,
               'start_rows': start_rows,
               'add_rows': add_rows,
+              'rows': rows,
               'numeric': numeric,
-              'merge': True,
-              'label': label}
-
-    generator = DataFrameGenerator(seed=seed, numeric=numeric)
-    filename = f"append.{suffix}"
-    filepath = f"data/{filename}"
-    df = generator.generate(start_rows + (add_rows * step))
-    generator.export(df, filepath)
+              'merge': True}
+    export_options = export_options or ExportOptions()
+    params.update(_export_params(export_options))
+    generator = _generator(seed=seed, numeric=numeric, chunk_size=chunk_size, workers=workers,
+                           export_options=export_options)
+    filepath = f"data/append.{suffix}"
+    cache_params = {'workflow': 'append', 'seed': seed, 'rows': rows, 'numeric': numeric, 'suffix': suffix,
+                    'chunk_size': chunk_size, 'export_options': export_options.to_dict()}
+    params['generated_rows'] = _generate(cache_params, [filepath, generator.manifest_path(filepath)],
+                                         lambda: generator.extend(filepath, rows))
+    # the data file is kept so the next step only generates the new rows
+    artifact = {'params': params, 'files': [filepath], 'keep': [filepath]}
+    _analyze_dedup(artifact, cache_params, 'rows')
+    return artifact
+
+
+@_traced('prepare')
+def _prepare_taxi(step: int,
+                  suffix: Suffix,
+                  data_dir: str = TAXI_DIR,
+                  chunk_size: int = CHUNK_SIZE,
+                  export_options: ExportOptions = None):
+    """Step N appends month N of the downloaded FHVHV files to the months of the previous steps"""
+    from src.taxi import TaxiDataset
+    suffix = Suffix(suffix).value
+    export_options = export_options or ExportOptions()
+    dataset = TaxiDataset(data_dir, chunk_size, export_options)
+    filepath = f"data/taxi.{suffix}"
+    with spans.span('export'):
+        months = dataset.extend(filepath, step)
+    params = {'workflow': 'taxi',
+              'step': step,
+              'suffix': suffix,
+              'month': months['month'],
+              'months': months['months'],
+              'rows': months['rows'],
+              'add_rows': months['added_rows'],
+              'generated_rows': months['added_rows'],
+              'numeric': False,
+              'merge': True}
+    params.update(_export_params(export_options))
+    # the data file is kept so the next step only reads the new month
+    artifact = {'params': params, 'files': [filepath], 'keep': [filepath]}
+    cache_params = {'workflow': 'taxi', 'months': step, 'suffix': suffix, 'chunk_size': chunk_size,
+                    'export_options': export_options.to_dict()}
+    _analyze_dedup(artifact, cache_params, 'months')
+    return artifact
+
+
+def _upload_file(tech: str, artifact: dict, label: str = 'default'):
+    tech = Tech(tech).value
+    backend = backends[tech]
+    params = {**artifact['params'], 'tech': tech, 'label': label, 'function_name': backend.function_name}
+    filepath = artifact['files'][0]
+    filename = os.path.basename(filepath)
     params['file_size'] = helper.get_file_size(filepath)
     params['filename'] = filename
-    logger.params.update(params)
-    if tech in COPY_REPOS:
-        logger.info(f"Copying file to {COPY_REPOS[tech]}")
-        shutil.copyfile(filepath, f"{COPY_REPOS[tech]}/{filename}")
-    func = upload_functions.get(tech)
-    with contextlib.suppress(KeyError):
-        logger.info(f"running {func.__name__}")
-        track(func, [filepath])
-    # cleanup
-    if os.path.exists(filepath):
-        os.remove(filepath)
-    if os.path.exists(f"{COPY_REPOS.get(tech)}/{filename}"):
-        os.remove(f"{COPY_REPOS.get(tech)}/{filename}")
+    with spans.trace('upload', tech=tech):
+        if backend.repo:
+            logger.info(f"Copying file to {backend.repo}")
+            with spans.span('copy'):
+                shutil.copyfile(filepath, f"{backend.repo}/{filename}")
+        params = track(backend.upload, [filepath], params)
+    _cleanup(artifact, tech)
+    return params
+
+
+def _upload_split(tech: str, artifact: dict, label: str = 'default', concurrent: bool = False):
+    """
+    Uploads train, validation and test - at the same time if concurrent.
+    A single result is logged with the total size and wall time, the files' sizes and times are under `files`.
+    """
+    tech = Tech(tech).value
+    backend = backends[tech]
+    params = {**artifact['params'], 'tech': tech, 'label': label, 'function_name': backend.function_name}
+    with spans.trace('upload', tech=tech):
+        if backend.repo:
+            logger.info(f"Copying file to {backend.repo}")
+            with spans.span('copy'):
+                for path in artifact['files']:
+                    shutil.copyfile(
+                        path, f"{backend.repo}/{os.path.basename(path)}")
+        logger.info(f"running {backend.function_name} on {', '.join(artifact['files'])}")
+        with jobs.job(tech) as overlaps, _record(params), spans.span(backend.function_name):
+            start_time = time.time()
+            results = backend.upload_many(artifact['files'], concurrent)
+            params['time'] = time.time() - start_time
+        _add_spans(params)
+    params['overlaps'] = sorted(overlaps)
+    params['files'] = {os.path.basename(filepath): {**result, 'file_size': helper.get_file_size(filepath)}
+                       for filepath, result in zip(artifact['files'], results)}
+    params['file_size'] = sum(result['file_size'] for result in params['files'].values())
+    params['filename'] = f"splits.{params['suffix']}"
+    params['function'] = f"split-{backend.function_name}"
+    params['concurrent_upload'] = concurrent and backend.concurrent_uploads
+    params['out'] = '\n'.join(result['out'] for result in results if result.get('out'))
+    params['returncode'] = max((result.get('returncode') or 0 for result in results), default=0)
+    params['timed_out'] = any(result.get('timed_out') for result in results)
+    params['failed'] = _failure(params) is not None
+    logger.log(params)
+    _cleanup(artifact, tech)
+    return params
+
+
+def _features(tech: str,
+              step: int,
+              start_rows: int,
+              suffix: Suffix,
+              seed: int,
+              label: str = 'default',
+              chunk_size: int = CHUNK_SIZE,
+              workers: int = WORKERS,
+              export_options: ExportOptions = None):
+    artifact = _prepare_features(step, start_rows, suffix, seed, chunk_size, workers, export_options)
+    _upload_file(tech, artifact, label)
+    _cleanup(artifact)
+
+
+def _split(tech: str,
+           step: int,
+           start_rows: int,
+           add_rows: int,
+           suffix: Suffix,
+           seed: int,  # type: ignore
+           label: str = 'default',
+           chunk_size: int = CHUNK_SIZE,
+           workers: int = WORKERS,
+           export_options: ExportOptions = None,
+           concurrent_upload: bool = False):
+    artifact = _prepare_split(step, start_rows, add_rows, suffix, seed, chunk_size, workers, export_options)
+    _upload_split(tech, artifact, label, concurrent_upload)
+    _cleanup(artifact)
+
+
+def _taxi(tech: str,
+          step: int,
+          suffix: Suffix,
+          label: str = 'default',
+          data_dir: str = TAXI_DIR,
+          chunk_size: int = CHUNK_SIZE,
+          export_options: ExportOptions = None):
+    artifact = _prepare_taxi(step, suffix, data_dir, chunk_size, export_options)
+    _upload_file(tech, artifact, label)
+    _cleanup(artifact)
+
+
+def _append(tech: str,
+            step: int,
+            start_rows: int,
+            add_rows: int,
+            suffix: str,
+            diverse: bool,
+            seed: int,
+            label: str = 'default',
+            chunk_size: int = CHUNK_SIZE,
+            workers: int = WORKERS,
+            export_options: ExportOptions = None):
+    artifact = _prepare_append(step, start_rows, add_rows, suffix, diverse, seed, chunk_size, workers, export_options)
+    _upload_file(tech, artifact, label)
+    _cleanup(artifact)
 
 
 @app.command()
@@ -249,15 +512,58 @@ def split(tech: Annotated[Tech, typer.Option(help="The tech to use")] = Tech.pyx
               help="What file type to save", )] = Suffix.parquet,
           label: Annotated[str, typer.Option(
               help="The experiment to run")] = 'default',
-          seed: Annotated[int, typer.Option(help="The seed to use")] = 0):
+          seed: Annotated[int, typer.Option(help="The seed to use")] = 0,
+          chunk_size: Annotated[int, typer.Option(
+              help="How many rows to generate and write at once", min=1)] = CHUNK_SIZE,
+          workers: Annotated[int, typer.Option(
+              help="How many processes generate the data", min=1)] = WORKERS,
+          row_group_size: Annotated[int, typer.Option(
+              help="Rows per parquet row group, default is the chunk size", min=1)] = None,
+          align: Annotated[bool, typer.Option(
+              help="Pin parquet row group boundaries to the end of every step, so appends keep the previous bytes")] = False,
+          compression: Annotated[Compression, typer.Option(
+              help="Parquet compression codec")] = Compression.snappy,
+          compression_level: Annotated[int, typer.Option(
+              help="Parquet compression level, default is the codec's default")] = None,
+          dictionary: Annotated[bool, typer.Option(
+              help="Whether to dictionary encode parquet columns")] = True,
+          statistics: Annotated[bool, typer.Option(
+              help="Whether to write parquet column statistics")] = True,
+          concurrent_upload: Annotated[bool, typer.Option(
+              help="Upload train, validation and test at the same time")] = False):
     """run a single split experiment on a specific tech in a specific step"""
-    _split(tech, step, start_rows, add_rows, suffix, seed, label)
+    export_options = _export_options(row_group_size, align, start_rows, add_rows, compression, compression_level,
+                                     dictionary, statistics)
+    _split(tech, step, start_rows, add_rows, suffix, seed, label, chunk_size, workers, export_options,
+           concurrent_upload)
 
 
 @app.command()
-def taxi():
-    """Run a benchamrks using the taxi dataset - currently not implemented"""
-    _taxi()
+def taxi(tech: Annotated[Tech, typer.Option(help="The tech to use")] = Tech.pyxet,
+         step: Annotated[int, typer.Option(
+             help="The step to simulate - step N holds the first N + 1 months", min=0)] = 0,
+         suffix: Annotated[Suffix, typer.Option(
+             help="What file type to save", )] = Suffix.parquet,
+         label: Annotated[str, typer.Option(
+             help="The experiment to run")] = 'default',
+         data_dir: Annotated[str, typer.Option(
+             help="Where the monthly files were downloaded with src/download.py")] = TAXI_DIR,
+         chunk_size: Annotated[int, typer.Option(
+             help="How many rows to read and write at once", min=1)] = CHUNK_SIZE,
+         row_group_size: Annotated[int, typer.Option(
+             help="Rows per parquet row group, default is the chunk size", min=1)] = None,
+         compression: Annotated[Compression, typer.Option(
+             help="Parquet compression codec")] = Compression.snappy,
+         compression_level: Annotated[int, typer.Option(
+             help="Parquet compression level, default is the codec's default")] = None,
+         dictionary: Annotated[bool, typer.Option(
+             help="Whether to dictionary encode parquet columns")] = True,
+         statistics: Annotated[bool, typer.Option(
+             help="Whether to write parquet column statistics")] = True):
+    """run a single taxi experiment - the months of the NYC FHVHV trips up to the step - on a specific tech"""
+    export_options = _export_options(row_group_size, compression=compression, compression_level=compression_level,
+                                     dictionary=dictionary, statistics=statistics)
+    _taxi(tech, step, suffix, label, data_dir, chunk_size, export_options)
 
 
 @app.command()
@@ -270,9 +576,25 @@ def features(tech: Annotated[Tech, typer.Option(help="The tech to use")] = Tech.
                  help="What file type to save", )] = Suffix.parquet,
              label: Annotated[str, typer.Option(
                  help="The experiment to run")] = 'default',
-             seed: Annotated[int, typer.Option(help="The seed to use")] = 0):
+             seed: Annotated[int, typer.Option(help="The seed to use")] = 0,
+             chunk_size: Annotated[int, typer.Option(
+                 help="How many rows to generate and write at once", min=1)] = CHUNK_SIZE,
+             workers: Annotated[int, typer.Option(
+                 help="How many processes generate the data", min=1)] = WORKERS,
+             row_group_size: Annotated[int, typer.Option(
+                 help="Rows per parquet row group, default is the chunk size", min=1)] = None,
+             compression: Annotated[Compression, typer.Option(
+                 help="Parquet compression codec")] = Compression.snappy,
+             compression_level: Annotated[int, typer.Option(
+                 help="Parquet compression level, default is the codec's default")] = None,
+             dictionary: Annotated[bool, typer.Option(
+                 help="Whether to dictionary encode parquet columns")] = True,
+             statistics: Annotated[bool, typer.Option(
+                 help="Whether to write parquet column statistics")] = True):
     """run a single features engineering experiment on a specific tech in a specific step"""
-    _features(tech, step, start_rows, suffix, seed, label)
+    export_options = _export_options(row_group_size, compression=compression, compression_level=compression_level,
+                                     dictionary=dictionary, statistics=statistics)
+    _features(tech, step, start_rows, suffix, seed, label, chunk_size, workers, export_options)
 
 
 @app.command()
@@ -291,14 +613,32 @@ def append(
             help="Whether to generate numeric data")] = False,
         label: Annotated[str, typer.Option(
             help="The experiment to run", )] = 'default',
-        seed: Annotated[int, typer.Option(help="The seed to use")] = 0):
+        seed: Annotated[int, typer.Option(help="The seed to use")] = 0,
+        chunk_size: Annotated[int, typer.Option(
+            help="How many rows to generate and write at once", min=1)] = CHUNK_SIZE,
+        workers: Annotated[int, typer.Option(
+            help="How many processes generate the data", min=1)] = WORKERS,
+        row_group_size: Annotated[int, typer.Option(
+            help="Rows per parquet row group, default is the chunk size", min=1)] = None,
+        align: Annotated[bool, typer.Option(
+            help="Pin parquet row group boundaries to the end of every step, so appends keep the previous bytes")] = False,
+        compression: Annotated[Compression, typer.Option(
+            help="Parquet compression codec")] = Compression.snappy,
+        compression_level: Annotated[int, typer.Option(
+            help="Parquet compression level, default is the codec's default")] = None,
+        dictionary: Annotated[bool, typer.Option(
+            help="Whether to dictionary encode parquet columns")] = True,
+        statistics: Annotated[bool, typer.Option(
+            help="Whether to write parquet column statistics")] = True):
     """run a single append experiment on a specific tech in a specific step"""
+    export_options = _export_options(row_group_size, align, start_rows, add_rows, compression, compression_level,
+                                     dictionary, statistics)
     _append(tech, step, start_rows, add_rows,
-            suffix, diverse, seed, label=label)
+            suffix, diverse, seed, label=label, chunk_size=chunk_size, workers=workers, export_options=export_options)
 
 
 @app.command()
-def benchmark(workflow: Annotated[Workflows, typer.Argument(help="The workflow to execute")],
+def benchmark(workflow: Annotated[Workflows, typer.Argument(help="The workflow to execute")] = None,
               tech: Annotated[List[Tech], typer.Option(
                   help="The tech to use")] = None,
               steps: Annotated[int, typer.Option(
@@ -313,66 +653,231 @@ def benchmark(workflow: Annotated[Workflows, typer.Argument(help="The workflow t
                   bool, typer.Option(help="If True generate diverse data, default is numeric only")] = False,
               label: Annotated[str, typer.Option(
                   help="The experiment to run", )] = 'default',
-              seed: Annotated[int, typer.Option(help="The seed to use")] = 0):
+              seed: Annotated[int, typer.Option(help="The seed to use")] = 0,
+              chunk_size: Annotated[int, typer.Option(
+                  help="How many rows to generate and write at once", min=1)] = CHUNK_SIZE,
+              workers: Annotated[int, typer.Option(
+                  help="How many processes generate the data", min=1)] = WORKERS,
+              row_group_size: Annotated[int, typer.Option(
+                  help="Rows per parquet row group, default is the chunk size", min=1)] = None,
+              align: Annotated[bool, typer.Option(
+                  help="Pin parquet row group boundaries to the end of every step, so appends keep the previous bytes")] = False,
+              compression: Annotated[Compression, typer.Option(
+                  help="Parquet compression codec")] = Compression.snappy,
+              compression_level: Annotated[int, typer.Option(
+                  help="Parquet compression level, default is the codec's default")] = None,
+              dictionary: Annotated[bool, typer.Option(
+                  help="Whether to dictionary encode parquet columns")] = True,
+              statistics: Annotated[bool, typer.Option(
+                  help="Whether to write parquet column statistics")] = True,
+              concurrent_upload: Annotated[bool, typer.Option(
+                  help="Upload the files of a split step at the same time")] = False,
+              repeat: Annotated[int, typer.Option(
+                  help="How many measured trials of every tech in every step", min=1)] = 1,
+              warmup: Annotated[int, typer.Option(
+                  help="How many trials of every tech in every step run before the measured ones", min=0)] = 0,
+              shuffle: Annotated[bool, typer.Option(
+                  help="Randomize the order of the techs in every trial, seeded by --seed")] = True,
+              concurrency: Annotated[int, typer.Option(
+                  help="How many techs upload at the same time within a step", min=1)] = 1,
+              mode: Annotated[ConcurrencyMode, typer.Option(
+                  help="isolated: techs sharing a network path or repo never overlap, "
+                       "contention: run them together to measure shared bandwidth")] = ConcurrencyMode.isolated,
+              resume: Annotated[str, typer.Option(
+                  help="The run name of an interrupted benchmark to resume with its options")] = None,
+              retries: Annotated[int, typer.Option(
+                  help="How many times a failed upload is retried before it's marked failed", min=0)] = 2,
+              backoff: Annotated[float, typer.Option(
+                  help="Seconds before the first retry - doubled on every retry", min=0)] = 30,
+              baseline: Annotated[List[str], typer.Option(
+                  help="Compare the results with the baseline results matching column=value, "
+                       "e.g. branch=main or pyxet=0.1.4 - see compare")] = None,
+              threshold: Annotated[float, typer.Option(
+                  help="The slowdown over the baseline median which is a regression, 0.1 = 10%")] = 0.1):
     """
     Benchmark different technologies - run a workflow with different technologies for a number of steps\n\n
 
     Examples:
     python main.py benchmark append --steps 1 --start-rows 10 --add-rows 10\n
-    python main.py benchmark append s3 gitxet --steps 10 --start-rows 100000000 --add-rows 10000000 --suffix csv --label default --seed 0
+    python main.py benchmark append s3 gitxet --steps 10 --start-rows 100000000 --add-rows 10000000 --suffix csv --label default --seed 0\n
+    python main.py benchmark append --steps 10 --concurrency 7 --mode contention\n
+    python main.py benchmark append --steps 10 --align --compression zstd --no-statistics\n
+    python main.py benchmark append --steps 10 --repeat 5 --warmup 1\n
+    python main.py benchmark --resume prehistoric-bulky-lobster\n
+    python main.py benchmark append --repeat 5 --baseline branch=main
+
+    Trials upload the same files again, so techs which skip content they already have are faster on repeats -
+    the git techs make an empty commit for a file they already have and push it.
+    With more than one trial, the median, p95, MAD and confidence interval of every tech and step are printed
+    and written to the summaries table of the results store.
+
+    The plan of the run and the state of every upload are saved in logs/runs/<run name>.json -
+    a resumed run skips the uploads which are done and logs under the same run name.
+    The command fails if uploads still fail after their retries, or if a baseline is given and the run regressed.
     """
+    filters = _baseline(baseline)
+    if resume:
+        plan = RunPlan.load(resume, f"{LOGS}/runs")
+        logger.info(f"Resuming {resume}: {len(plan.cells)} uploads ran, {len(plan.failed())} failed")
+    elif workflow is None:
+        raise typer.BadParameter("A workflow is required unless a run is resumed")
+    else:
+        plan = RunPlan(logger.name, {
+            'workflow': Workflows(workflow).value, 'tech': [Tech(t).value for t in tech or DEFAULT_TECHS],
+            'steps': steps, 'start_rows': start_rows, 'add_rows': add_rows, 'suffix': Suffix(suffix).value,
+            'diverse': diverse, 'label': label, 'seed': seed, 'chunk_size': chunk_size, 'workers': workers,
+            'row_group_size': row_group_size, 'align': align, 'compression': Compression(compression).value,
+            'compression_level': compression_level, 'dictionary': dictionary, 'statistics': statistics,
+            'concurrent_upload': concurrent_upload, 'repeat': repeat, 'warmup': warmup, 'shuffle': shuffle,
+            'concurrency': concurrency, 'mode': ConcurrencyMode(mode).value}, f"{LOGS}/runs")
+        plan.save()
+    logger.rename(plan.run_name)
+    failed = _benchmark(plan, retries, backoff, **plan.options)
+    for key, cell in failed.items():
+        logger.info(f"failed: {key} after {cell['attempts']} attempts - {cell['error']}")
+    regressed = baseline and _compare(logger.name, filters, threshold)['regression'].any()
+    if failed or regressed:
+        raise typer.Exit(1)
+
+
+def _failure(params: dict):
+    """The error of an upload which ran but failed, None if it succeeded"""
+    if params is None:
+        return None
+    if params.get('timed_out'):
+        return f"timed out after {params.get('time', 0):.0f}s"
+    if params.get('returncode'):
+        return f"exit code {params['returncode']}: {str(params.get('out', ''))[-500:]}"
+    return None
+
+
+def _benchmark(plan,
+               retries: int,
+               backoff: float,
+               workflow: str,
+               tech: List[str],
+               steps: int,
+               start_rows: int,
+               add_rows: int,
+               suffix: str,
+               diverse: bool,
+               label: str,
+               seed: int,
+               chunk_size: int,
+               workers: int,
+               row_group_size: int,
+               align: bool,
+               compression: str,
+               compression_level: int,
+               dictionary: bool,
+               statistics: bool,
+               concurrent_upload: bool,
+               repeat: int,
+               warmup: int,
+               shuffle: bool,
+               concurrency: int,
+               mode: str) -> dict:
+    """Runs the cells of the plan which aren't done - returns the failed cells"""
+    workflow = Workflows(workflow)
     _pull()
+    export_options = _export_options(row_group_size, align, start_rows,
+                                     add_rows if workflow in (Workflows.append, Workflows.split) else None,
+                                     compression, compression_level, dictionary, statistics)
     if workflow == Workflows.append:
         if label is None:
             if steps == 1:
                 label = "random"
             else:
                 label = f"append-{steps}"
-        run = _append
+        prepare, upload = _prepare_append, _upload_file
         kwargs = {'suffix': suffix,
                   'start_rows': start_rows,
                   'add_rows': add_rows,
                   'diverse': diverse,
                   'seed': seed,
-                  'label': label}
+                  'chunk_size': chunk_size,
+                  'workers': workers,
+                  'export_options': export_options}
     elif workflow == Workflows.split:
-        run = _split
+        prepare, upload = _prepare_split, functools.partial(_upload_split, concurrent=concurrent_upload)
         kwargs = {'suffix': suffix,
                   'start_rows': start_rows,
                   'add_rows': add_rows,
                   'seed': seed,
-                  'label': label}
+                  'chunk_size': chunk_size,
+                  'workers': workers,
+                  'export_options': export_options}
     elif workflow == Workflows.features:
-        run = _features
+        prepare, upload = _prepare_features, _upload_file
         kwargs = {'suffix': suffix,
                   'start_rows': start_rows,
                   'seed': seed,
-                  'label': label}
+                  'chunk_size': chunk_size,
+                  'workers': workers,
+                  'export_options': export_options}
 
     elif workflow == Workflows.taxi:
-        raise NotImplementedError("Taxi workflow is not implemented yet")
-        run = taxi
+        prepare, upload = _prepare_taxi, _upload_file
+        kwargs = {'suffix': suffix,
+                  'chunk_size': chunk_size,
+                  'export_options': export_options}
     else:
         raise ValueError(f"Unknown workflow {workflow.name}")
 
-    if not tech:
-        tech = list(upload_functions.keys())
-    logger.info(
-        f"Running {workflow} with {str(tech).replace('Tech.', '')} for {steps} steps")
-    with alive_bar(steps * len(tech)) as bar:
+    logger.info(f"Running {workflow.value} with {', '.join(tech)} for {steps} steps")
+    trials = warmup + repeat
+
+    def cell(t: str, artifact: dict, step: int, trial: int):
+        def attempt(number: int):
+            return upload(t, {**artifact, 'params': {**artifact['params'], 'attempt': number}}, label)
+
+        _, error, attempts = with_retries(attempt, retries, backoff, _failure)
+        plan.finish(step, trial, t, error, attempts)
+
+    order = random.Random(seed)
+    with alive_bar(steps * len(tech) * trials) as bar:
         for step in range(steps):
-            for t in tech:
-                kwargs.update({'tech': t, 'step': step})
-                run(**kwargs)
-                bar()
+            techs = [list(tech) for _ in range(trials)]
+            for trial in range(trials):  # the order doesn't depend on which cells are done
+                if shuffle:
+                    order.shuffle(techs[trial])
+            pending = [plan.pending(step, trial, techs[trial]) for trial in range(trials)]
+            bar(sum(len(tech) - len(cells) for cells in pending))
+            if not any(pending):
+                continue
+            # generated once per step and shared by all techs and trials
+            artifact = prepare(step=step, **kwargs)
+            artifact['params'].update({'concurrency': concurrency, 'concurrency_mode': ConcurrencyMode(mode).value})
+            for trial in range(trials):
+                # warmup trials are numbered from -warmup, measured trials from 0
+                trial_artifact = {**artifact, 'params': {**artifact['params'], 'trial': trial - warmup,
+                                                         'warmup': trial < warmup}}
+                tasks = [(t, functools.partial(cell, t, trial_artifact, step, trial)) for t in pending[trial]]
+                for _ in run_jobs(tasks, concurrency, mode):
+                    bar()
+            _cleanup(artifact)
+    if trials > 1:
+        _summarize()
+    return plan.failed()
+
+
+def _summarize():
+    """Prints the statistics of this run's trials and the trials which are outliers"""
+    from src import stats
+    summary = logger.summarize()
+    typer.echo(summary.to_markdown(index=False))
+    results = stats.measured(logger.store.query("run_name = ?", [logger.name]))
+    outliers = results[stats.flag_outliers(results)]
+    for _, row in outliers.iterrows():
+        logger.info(f"outlier: {row['tech']} step {row['step']} trial {row['trial']} took {row['time']:.2f}s")
 
 
 @app.command()
 def test(seed: Annotated[int, typer.Option(help="The seed to use")] = 0):
     """Run a small test to make sure everything works"""
     _pull()
-    with alive_bar(len(upload_functions)) as bar:
-        for tech in upload_functions:
+    with alive_bar(len(DEFAULT_TECHS)) as bar:
+        for tech in DEFAULT_TECHS:
             logger.info(f"test {tech}")
             _append(tech=tech,
                     step=0,
@@ -399,5 +904,102 @@ def latest(rows: Annotated[int, typer.Option(
     typer.echo(result[columns].to_markdown())
 
 
+@app.command()
+def report(workflow: Annotated[Workflows, typer.Option(help="Only report this workflow")] = None,
+           run_name: Annotated[List[str], typer.Option(help="Only report these runs")] = None,
+           label: Annotated[str, typer.Option(help="Only report runs with this label")] = None,
+           scale: Annotated[List[float], typer.Option(
+               help="Predict the time at these multiples of the largest size measured per tech")] = [10.],
+           size: Annotated[List[float], typer.Option(help="Predict the time at these sizes in MB")] = None,
+           output: Annotated[str, typer.Option(help="Directory of the parquet summaries")] = 'output/report'):
+    """
+    How every tech scales - fits time = overhead + seconds per MB * size per workflow and tech
+    over the whole history of results, and predicts the time at larger sizes\n\n
+
+    python main.py report --scale 10 --scale 100 --size 10000\n
+    python main.py report --workflow append --label default
+
+    Writes steps.parquet (median per workflow, tech and step), fits.parquet and predictions.parquet to the output.
+    """
+    from src import report as reports
+    logger.store.import_logs(logger.path)
+    filters = {'workflow': [Workflows(workflow).value] if workflow else None, 'run_name': run_name,
+               'label': [label] if label else None}
+    filters = {column: values for column, values in filters.items() if values}
+    where = ' AND '.join(f"{column} IN ({', '.join('?' * len(values))})" for column, values in filters.items())
+    results = logger.store.sql(f"""SELECT workflow, tech, step, file_size, "time", warmup, failed FROM results
+                                   {f'WHERE {where}' if where else ''}""",
+                               [value for values in filters.values() for value in values])
+    if results.empty:
+        typer.echo("No results to report")
+        raise typer.Exit(1)
+    steps = reports.aggregate(results)
+    fits = reports.fit(steps)
+    predictions = reports.predictions(fits, scale, size)
+    os.makedirs(output, exist_ok=True)
+    for name, df in [('steps', steps), ('fits', fits), ('predictions', predictions)]:
+        df.to_parquet(f"{output}/{name}.parquet", index=False)
+    typer.echo(fits.to_markdown(index=False, floatfmt='.4g'))
+    typer.echo()
+    typer.echo(predictions.to_markdown(index=False, floatfmt='.4g'))
+
+
+def _baseline(specs: List[str]) -> dict:
+    """Parses column=value baseline filters"""
+    from src.results import COLUMNS
+    filters = {}
+    for spec in specs or []:
+        column, separator, value = spec.partition('=')
+        if not separator or column.strip() not in COLUMNS:
+            raise typer.BadParameter(f"A baseline is column=value of a result column, not {spec}")
+        filters[column.strip()] = value.strip()
+    return filters
+
+
+def _compare(run_name: str, filters: dict, threshold: float = 0.1, alpha: float = 0.05):
+    """Prints the comparison of a run with its baseline and logs the regressions"""
+    from src import stats
+    current = logger.store.query("run_name = ?", [run_name])
+    if current.empty:
+        raise typer.BadParameter(f"No results for run {run_name}")
+    baseline = logger.store.lookup(current, filters, exclude_run=run_name)
+    comparison = stats.compare(current, baseline, threshold=threshold, alpha=alpha)
+    typer.echo(comparison.to_markdown(index=False, floatfmt='.4g'))
+    for _, row in comparison[comparison['regression']].iterrows():
+        logger.info(f"regression: {row['tech']} {row['workflow']} step {row['step']} took {row['median']:.2f}s, "
+                    f"{row['change']:.0%} over the baseline {row['baseline_median']:.2f}s (p={row['p_value']:.3f})")
+    return comparison
+
+
+@app.command()
+def compare(baseline: Annotated[List[str], typer.Option(
+                help="The baseline results match column=value, e.g. label=default, branch=main, pyxet=0.1.4 "
+                     "or gitxet=%0.2.0% - values with % are LIKE patterns")] = None,
+            run_name: Annotated[str, typer.Option(help="The run to compare - the latest run by default")] = None,
+            threshold: Annotated[float, typer.Option(
+                help="The slowdown over the baseline median which is a regression, 0.1 = 10%")] = 0.1,
+            alpha: Annotated[float, typer.Option(
+                help="The significance level of the Mann-Whitney test")] = 0.05):
+    """
+    Compare a run with the baseline results of the same workflow, tech, step, rows and suffix\n\n
+
+    python main.py compare --baseline branch=main\n
+    python main.py compare --run-name prehistoric-bulky-lobster --baseline pyxet=0.1.4 --threshold 0.2
+
+    A result regressed if its median time is more than the threshold above the baseline median,
+    and the Mann-Whitney test says it's slower - repeat the trials (benchmark --repeat) for the test to be significant.
+    Exits with 1 if any result regressed.
+    """
+    filters = _baseline(baseline)
+    logger.store.import_logs(logger.path)
+    if run_name is None:
+        latest = logger.store.sql('SELECT run_name FROM results ORDER BY "timestamp" DESC LIMIT 1')
+        if latest.empty:
+            raise typer.BadParameter("No results to compare")
+        run_name = latest['run_name'][0]
+    if _compare(run_name, filters, threshold, alpha)['regression'].any():
+        raise typer.Exit(1)
+
+
 if __name__ == "__main__":
     app()
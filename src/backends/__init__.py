@@ -0,0 +1,3 @@
+from src.backends.base import Backend, BACKENDS, register, create_backends
+from src.backends.remote import HelperBackend, GitBackend
+from src.backends.local import NetworkShaper, LocalBackend, LocalGitBackend
@@ -0,0 +1,76 @@
+import contextvars
+import inspect
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from src.scheduler import NETWORK_GROUPS
+
+BACKENDS = {}
+
+
+class Backend:
+    """
+    A storage tech to benchmark.
+    Files are addressed by the path they were uploaded from, e.g. data/append.parquet
+    """
+    name: str = ''
+    group: str = ''  # techs in the same group share a network path - see scheduler.NETWORK_GROUPS
+    repo: str = None  # a local repo the file is copied into before upload
+    default: bool = True  # part of a benchmark when no tech is given
+    concurrent_uploads: bool = True  # whether files can be uploaded at the same time
+
+    @property
+    def function_name(self) -> str:
+        return f"{self.name.replace('-', '_')}_upload"
+
+    def upload(self, filepath: str) -> dict:
+        raise NotImplementedError
+
+    def _timed_upload(self, filepath: str) -> dict:
+        start_time = time.time()
+        result = self.upload(filepath)
+        return {**(result or {}), 'time': time.time() - start_time}
+
+    def upload_many(self, filepaths: typing.List[str], concurrent: bool = False) -> typing.List[dict]:
+        """
+        Uploads files, at the same time if concurrent and the backend supports it.
+        Returns the result of every file with its upload time.
+        """
+        if concurrent and self.concurrent_uploads and len(filepaths) > 1:
+            contexts = [contextvars.copy_context() for _ in filepaths]  # spans of the uploads nest in the caller's
+            with ThreadPoolExecutor(len(filepaths)) as pool:
+                return list(pool.map(lambda context, filepath: context.run(self._timed_upload, filepath),
+                                     contexts, filepaths))
+        return [self._timed_upload(filepath) for filepath in filepaths]
+
+    def download(self, filepath: str, target: str) -> dict:
+        raise NotImplementedError
+
+    def list(self) -> typing.List[str]:
+        raise NotImplementedError
+
+    def exists(self, filepath: str) -> bool:
+        raise NotImplementedError
+
+    def remove(self, filepath: str):
+        raise NotImplementedError
+
+    def storage_used(self) -> int:
+        """Bytes the backend stores"""
+        raise NotImplementedError
+
+
+def register(cls: typing.Type[Backend]) -> typing.Type[Backend]:
+    """Class decorator adding a backend to the registry"""
+    BACKENDS[cls.name] = cls
+    NETWORK_GROUPS.setdefault(cls.name, cls.group or cls.name)
+    return cls
+
+
+def create_backends(**kwargs) -> typing.Dict[str, Backend]:
+    """An instance of every registered backend - kwargs are passed to the backends which accept them"""
+    backends = {}
+    for name, cls in BACKENDS.items():
+        accepted = inspect.signature(cls).parameters
+        backends[name] = cls(**{key: value for key, value in kwargs.items() if key in accepted})
+    return backends
@@ -0,0 +1,177 @@
+import os
+import os.path as path
+import random
+import shutil
+import threading
+import time
+import typing
+from constants import LOCAL_BACKEND_DIR, LOCAL_BANDWIDTH_MBPS, LOCAL_LATENCY_MS, LOCAL_JITTER_MS
+from src import runner, spans
+from src.backends.base import Backend, register
+
+
+class NetworkShaper:
+    """
+    Emulates a network link by sleeping for the latency of every request and for the transfer time of the bytes sent.
+    Transfers through the same shaper share its bandwidth, like uploads on one uplink.
+    """
+
+    def __init__(self, bandwidth_mbps: float = 0, latency_ms: float = 0, jitter_ms: float = 0, seed: int = 0):
+        """
+        bandwidth_mbps: link bandwidth in megabits per second - 0 is unlimited
+        latency_ms: round trip time added to every request
+        jitter_ms: standard deviation of the latency
+        seed: seed of the jitter, so runs are reproducible
+        """
+        self.bandwidth_mbps = bandwidth_mbps
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._free_at = 0.  # when the link is done sending what's already queued
+
+    def request(self) -> float:
+        """Waits for a round trip, returns the seconds waited"""
+        with self._lock:
+            delay = max(0., self._random.gauss(self.latency_ms, self.jitter_ms) if self.jitter_ms else self.latency_ms)
+        time.sleep(delay / 1000)
+        return delay / 1000
+
+    def transfer(self, num_bytes: int) -> float:
+        """Waits for a request and for num_bytes to go through the link, returns the seconds waited"""
+        start_time = time.time()
+        self.request()
+        if self.bandwidth_mbps and num_bytes:
+            with self._lock:
+                self._free_at = max(self._free_at, time.time()) + num_bytes * 8 / (self.bandwidth_mbps * 10 ** 6)
+                free_at = self._free_at
+            time.sleep(max(0., free_at - time.time()))
+        return time.time() - start_time
+
+
+def _directory_size(directory: str) -> int:
+    return sum(path.getsize(path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+
+
+def _default_shaper() -> NetworkShaper:
+    return NetworkShaper(LOCAL_BANDWIDTH_MBPS, LOCAL_LATENCY_MS, LOCAL_JITTER_MS)
+
+
+@register
+class LocalBackend(Backend):
+    """An object store emulated by a directory - every upload sends the whole file, like s3"""
+    name = 'local'
+    group = 'local'
+    default = False
+
+    def __init__(self, directory: str = None, shaper: NetworkShaper = None):
+        self.directory = directory or path.join(LOCAL_BACKEND_DIR, 'objects')
+        self.shaper = shaper or _default_shaper()
+
+    def _path(self, filepath: str) -> str:
+        return path.join(self.directory, path.normpath(filepath).lstrip(os.sep))
+
+    def upload(self, filepath: str) -> dict:
+        target = self._path(filepath)
+        os.makedirs(path.dirname(target), exist_ok=True)
+        shutil.copyfile(filepath, f"{target}.tmp")
+        with spans.span('network'):
+            shaped_time = self.shaper.transfer(path.getsize(filepath))
+        os.replace(f"{target}.tmp", target)
+        return {'function': 'local upload', 'tech': 'local', 'name': self.name, 'out': '',
+                'bytes_transferred': path.getsize(filepath), 'shaped_time': shaped_time}
+
+    def download(self, filepath: str, target: str) -> dict:
+        source = self._path(filepath)
+        shaped_time = self.shaper.transfer(path.getsize(source))
+        shutil.copyfile(source, target)
+        return {'bytes_transferred': path.getsize(source), 'shaped_time': shaped_time}
+
+    def list(self) -> typing.List[str]:
+        self.shaper.request()
+        return sorted(path.relpath(path.join(root, name), self.directory)
+                      for root, _, names in os.walk(self.directory) for name in names)
+
+    def exists(self, filepath: str) -> bool:
+        self.shaper.request()
+        return path.exists(self._path(filepath))
+
+    def remove(self, filepath: str):
+        self.shaper.request()
+        os.remove(self._path(filepath))
+
+    def storage_used(self) -> int:
+        return _directory_size(self.directory)
+
+
+@register
+class LocalGitBackend(Backend):
+    """
+    A git remote emulated by a bare repo - pushes only send the objects the remote doesn't have yet,
+    so the shaped time reflects git's packing and deltas.
+    """
+    name = 'local-git'
+    group = 'local'
+    default = False
+    concurrent_uploads = False
+
+    def __init__(self, directory: str = None, shaper: NetworkShaper = None):
+        directory = directory or path.join(LOCAL_BACKEND_DIR, 'git')
+        self.remote = path.join(directory, 'remote.git')
+        self._repo = path.join(directory, 'clone')
+        self.shaper = shaper or _default_shaper()
+
+    @property
+    def repo(self) -> str:
+        """The clone the files are copied into - created with its remote on first use"""
+        if not path.exists(self._repo):
+            os.makedirs(self.remote, exist_ok=True)
+            runner.run("git init -q --bare", cwd=self.remote)
+            runner.run(f"git clone -q {path.abspath(self.remote)} {path.abspath(self._repo)}")
+            self._git("git config user.email benchmark@localhost && git config user.name benchmark")
+        return self._repo
+
+    def _git(self, command: str) -> runner.CommandResult:
+        result = runner.run(command, cwd=self.repo)
+        if not result.ok:
+            raise RuntimeError(f"{command} failed: {result.output}")
+        return result
+
+    def _push(self, message: str) -> typing.Tuple[int, float]:
+        """Commits everything and pushes, waiting for the bytes the remote grew by"""
+        before = _directory_size(self.remote)
+        for command in ["git add -A", f"git commit -q --allow-empty -m '{message}'", "git push -q origin HEAD"]:
+            with spans.span(' '.join(command.split()[:2])):
+                self._git(command)
+        pushed = _directory_size(self.remote) - before
+        with spans.span('network'):
+            return pushed, self.shaper.transfer(pushed)
+
+    def upload(self, filepath: str) -> dict:
+        """The file is expected to be copied into the repo already, like the other git based techs"""
+        pushed, shaped_time = self._push(f"commit {path.basename(filepath)}")
+        return {'function': 'local git upload', 'tech': 'git', 'name': self.name, 'out': '',
+                'bytes_transferred': pushed, 'shaped_time': shaped_time}
+
+    def download(self, filepath: str, target: str) -> dict:
+        shaped_time = self.shaper.request()
+        self._git("git pull -q")
+        shutil.copyfile(path.join(self.repo, path.basename(filepath)), target)
+        return {'shaped_time': shaped_time}
+
+    def list(self) -> typing.List[str]:
+        self.shaper.request()
+        if not path.exists(self.remote):
+            return []
+        result = runner.run("git ls-tree --name-only HEAD", cwd=self.remote)
+        return result.stdout.split() if result.ok else []  # nothing was pushed yet
+
+    def exists(self, filepath: str) -> bool:
+        return path.basename(filepath) in self.list()
+
+    def remove(self, filepath: str):
+        os.remove(path.join(self.repo, path.basename(filepath)))
+        self._push(f"remove {path.basename(filepath)}")
+
+    def storage_used(self) -> int:
+        return _directory_size(self.remote)
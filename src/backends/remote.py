@@ -0,0 +1,217 @@
+import os
+import os.path as path
+import re
+import shutil
+import typing
+from src.backends.base import Backend, register
+from src.helper import Helper
+from src.runner import UNITS
+
+# sizes printed by lakectl fs ls, e.g. "842 B", "12 kB", "1.2 MB" - rounded to 2 or 3 significant digits
+HUMAN_SIZE = re.compile(r'\s([\d.]+) (B|kB|[KMGT]i?B)\s')
+
+
+class HelperBackend(Backend):
+    """A tech uploaded through Helper - the upload is the Helper method the results were always logged with"""
+    upload_method: str = ''
+
+    def __init__(self, helper: Helper = None):
+        self._helper = helper
+
+    @property
+    def helper(self) -> Helper:
+        if self._helper is None:
+            self._helper = Helper()
+        return self._helper
+
+    @property
+    def function_name(self) -> str:
+        return self.upload_method
+
+    def upload(self, filepath: str) -> dict:
+        return getattr(self.helper, self.upload_method)(filepath)
+
+
+@register
+class PyxetBackend(HelperBackend):
+    name = 'pyxet'
+    group = 'xethub'
+    upload_method = 'pyxet_upload'
+
+    def _path(self, filepath: str) -> str:
+        return f"{self.helper.xet_pyxet_repo}/{path.basename(filepath)}"
+
+    def upload_many(self, filepaths: typing.List[str], concurrent: bool = False) -> typing.List[dict]:
+        """Concurrent uploads share one transaction - a single commit"""
+        if concurrent and len(filepaths) > 1:
+            return self.helper.pyxet_upload_many(filepaths)
+        return super().upload_many(filepaths)
+
+    def download(self, filepath: str, target: str) -> dict:
+        self.helper.fs_xet.get(self._path(filepath), target)
+        return {}
+
+    def list(self) -> typing.List[str]:
+        return [path.basename(name) for name in self.helper.xet_ls(self.helper.xet_pyxet_repo)]
+
+    def exists(self, filepath: str) -> bool:
+        return self.helper.fs_xet.exists(self._path(filepath))
+
+    def remove(self, filepath: str):
+        self.helper.xet_remove(path.basename(filepath), self.helper.xet_pyxet_repo)
+
+    def storage_used(self) -> int:
+        return self.helper.fs_xet.du(self.helper.xet_pyxet_repo)
+
+
+@register
+class S3Backend(HelperBackend):
+    name = 's3'
+    group = 'aws'
+    upload_method = 's3_upload'
+    prefix = 's3'
+
+    def _key(self, filepath: str) -> str:
+        return f"{self.prefix}/{filepath}"
+
+    def download(self, filepath: str, target: str) -> dict:
+        self.helper.s3.download_file(self.helper.s3_bucket, self._key(filepath), target)
+        return {}
+
+    def _objects(self) -> typing.Iterator[dict]:
+        paginator = self.helper.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.helper.s3_bucket, Prefix=f"{self.prefix}/"):
+            yield from page.get('Contents', [])
+
+    def list(self) -> typing.List[str]:
+        return [item['Key'][len(self.prefix) + 1:] for item in self._objects()]
+
+    def exists(self, filepath: str) -> bool:
+        try:
+            self.helper.s3.head_object(Bucket=self.helper.s3_bucket, Key=self._key(filepath))
+            return True
+        except Exception:
+            return False
+
+    def remove(self, filepath: str):
+        self.helper.s3.delete_object(Bucket=self.helper.s3_bucket, Key=self._key(filepath))
+
+    def storage_used(self) -> int:
+        return sum(item['Size'] for item in self._objects())
+
+
+@register
+class S3NativeBackend(S3Backend):
+    name = 's3-native'
+    upload_method = 's3_native_upload'
+    prefix = 's3-native'
+
+
+class GitBackend(HelperBackend):
+    """Git based techs - files are copied into a local clone, committed and pushed"""
+    concurrent_uploads = False  # uploads commit in the same clone
+    pull_command = "git pull"
+    store = '.git'  # where the clone keeps the uploaded content
+
+    def download(self, filepath: str, target: str) -> dict:
+        result = self.helper.run(self.pull_command.format(filename=path.basename(filepath)), self.repo)
+        shutil.copyfile(path.join(self.repo, path.basename(filepath)), target)
+        return self.helper._outcome(result)
+
+    def list(self) -> typing.List[str]:
+        return self.helper.run("git ls-files", self.repo, verbose=False).stdout.split()
+
+    def exists(self, filepath: str) -> bool:
+        return self.helper.git_exists(path.basename(filepath), self.repo)
+
+    def remove(self, filepath: str):
+        self.helper.git_remove(path.basename(filepath), self.repo)
+
+    def storage_used(self) -> int:
+        """Measured on the local clone - the remotes don't report it"""
+        directory = path.join(self.repo, self.store)
+        return sum(path.getsize(path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+
+
+@register
+class GitxetBackend(GitBackend):
+    name = 'gitxet'
+    group = 'xethub'
+    upload_method = 'gitxet_upload'
+    repo = Helper.XETHUB_GIT
+
+
+@register
+class LakefsBackend(HelperBackend):
+    name = 'lakefs'
+    group = 'aws'
+    upload_method = 'lakefs_upload'
+    concurrent_uploads = False  # every upload commits to the branch
+
+    def _path(self, filepath: str) -> str:
+        return f"{self.helper.lakefs_repo}/{filepath}"
+
+    def download(self, filepath: str, target: str) -> dict:
+        return self.helper._outcome(self.helper.run(f"lakectl fs download {self._path(filepath)} {target}"))
+
+    def list(self) -> typing.List[str]:
+        out = self.helper.run(f"lakectl fs ls --recursive {self.helper.lakefs_repo}/", verbose=False).stdout
+        return [line.split()[-1] for line in out.splitlines() if line.startswith('object')]
+
+    def exists(self, filepath: str) -> bool:
+        return self.helper.run(f"lakectl fs stat {self._path(filepath)}", verbose=False).ok
+
+    def remove(self, filepath: str):
+        self.helper.run(f"lakectl fs rm {self._path(filepath)}")
+
+    def storage_used(self) -> int:
+        """
+        Sum of the object sizes listed by lakectl - approximate, lakectl rounds the sizes it prints.
+        Raises RuntimeError if lakectl fails.
+        """
+        result = self.helper.run(f"lakectl fs ls --recursive {self.helper.lakefs_repo}/", verbose=False)
+        if not result.ok:
+            raise RuntimeError(f"lakectl fs ls failed: {result.output}")
+        total = 0.
+        for line in result.stdout.splitlines():
+            match = HUMAN_SIZE.search(line)
+            if line.startswith('object') and match:
+                total += float(match.group(1)) * {**UNITS, 'kB': 1000}[match.group(2)]
+        return int(total)
+
+
+@register
+class LfsGitBackend(GitBackend):
+    name = 'lfs-git'
+    group = 'github'
+    upload_method = 'lfs_git_upload'
+    repo = Helper.LFS_GITHUB
+    pull_command = "git pull && git lfs pull --include {filename}"
+    store = '.git/lfs/objects'
+
+
+@register
+class LfsS3Backend(LfsGitBackend):
+    name = 'lfs-s3'
+    group = 'aws'
+    upload_method = 'lfs_s3_upload'
+    repo = Helper.LFS_S3
+
+
+@register
+class DvcBackend(GitBackend):
+    name = 'dvc'
+    group = 'aws'
+    upload_method = 'dvc_upload'
+    repo = Helper.DVC
+    pull_command = "git pull && dvc pull {filename}.dvc"
+    store = '.dvc/cache'
+
+    def list(self) -> typing.List[str]:
+        return [name[:-len('.dvc')] for name in super().list() if name.endswith('.dvc')]
+
+    def exists(self, filepath: str) -> bool:
+        return self.helper.git_exists(f"{path.basename(filepath)}.dvc", self.repo)
+
+    def remove(self, filepath: str):
+        self.helper._dvc_remove(path.basename(filepath))
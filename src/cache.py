@@ -0,0 +1,103 @@
+import contextlib
+import hashlib
+import json
+import os
+import os.path as path
+import shutil
+import time
+from loguru import logger
+
+
+class DatasetCache:
+    """
+    Persistent cache of generated datasets, keyed by the parameters that produced them.
+    Entries are evicted least-recently-used first once the cache grows beyond max_bytes.
+    """
+    INDEX = 'index.json'
+
+    def __init__(self, directory: str = 'cache', max_bytes: int = 20 * 1024 ** 3):
+        """
+        directory: where cached files and the index are kept
+        max_bytes: size budget - 0 disables the cache
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index = None
+
+    @staticmethod
+    def key(params: dict) -> str:
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+    @property
+    def index(self) -> dict:
+        if self._index is None:
+            self._index = {}
+            with contextlib.suppress(FileNotFoundError, ValueError):
+                with open(path.join(self.directory, self.INDEX)) as f:
+                    self._index = json.load(f)
+        return self._index
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = path.join(self.directory, f".{self.INDEX}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_path, path.join(self.directory, self.INDEX))
+
+    @staticmethod
+    def _link(source: str, target: str):
+        """Hard links when possible - writers always replace files, so a link is never modified in place"""
+        directory = path.dirname(target)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(target)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+
+    @property
+    def size(self) -> int:
+        return sum(entry['bytes'] for entry in self.index.values())
+
+    def checkout(self, params: dict, filepaths: list) -> bool:
+        """Places the cached files for params at filepaths, returns False on a cache miss"""
+        key = self.key(params)
+        entry = self.index.get(key)
+        if not self.max_bytes or entry is None:
+            return False
+        cached = [path.join(self.directory, key, path.basename(filepath)) for filepath in filepaths]
+        if not all(path.exists(cached_path) for cached_path in cached):
+            self._evict(key)
+            return False
+        for cached_path, filepath in zip(cached, filepaths):
+            self._link(cached_path, filepath)
+        entry['last_used'] = time.time()
+        self._save()
+        logger.info(f"Cache hit {key} for {params}")
+        return True
+
+    def put(self, params: dict, filepaths: list):
+        """Adds the files generated for params, evicting the least recently used entries to stay in budget"""
+        size = sum(path.getsize(filepath) for filepath in filepaths)
+        if not self.max_bytes or size > self.max_bytes:
+            return
+        key = self.key(params)
+        for filepath in filepaths:
+            self._link(filepath, path.join(self.directory, key, path.basename(filepath)))
+        self.index[key] = {'params': params, 'files': [path.basename(filepath) for filepath in filepaths],
+                           'bytes': size, 'last_used': time.time()}
+        while self.size > self.max_bytes:
+            self._evict(min((k for k in self.index if k != key), key=lambda k: self.index[k]['last_used']))
+        self._save()
+
+    def _evict(self, key: str):
+        logger.info(f"Evicting {key} from the dataset cache")
+        shutil.rmtree(path.join(self.directory, key), ignore_errors=True)
+        self.index.pop(key, None)
+        self._save()
+
+    def clear(self):
+        for key in list(self.index):
+            self._evict(key)
@@ -0,0 +1,159 @@
+import contextlib
+import functools
+import hashlib
+import os
+import os.path as path
+import typing
+import numpy as np
+
+KiB = 1024
+CHUNK_SIZES = [16 * KiB, 64 * KiB, 1024 * KiB]
+WINDOW = 48
+BLOCK_SIZE = 4 * 1024 ** 2  # bytes hashed at once
+PRIME = 0x100000001b3
+MASK64 = (1 << 64) - 1
+
+
+def _inverse(p: int) -> int:
+    """Inverse of an odd number modulo 2**64 (Newton's iteration)"""
+    x = p
+    for _ in range(6):
+        x = (x * (2 - p * x)) & MASK64
+    return x
+
+
+# every byte value is mapped to a random 64 bit value, so runs of equal bytes still hash well
+BYTE_TABLE = np.random.default_rng(0).integers(0, 2 ** 63, 256, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def size_label(chunk_size: int) -> str:
+    return f"{chunk_size // KiB}KiB"
+
+
+@functools.lru_cache(maxsize=4)
+def _powers(n: int, base: int) -> np.ndarray:
+    """base**k for k < n - the same for every full block, so it's computed once"""
+    powers = np.full(n, base, dtype=np.uint64)
+    powers[0] = 1
+    np.cumprod(powers, out=powers)
+    powers.flags.writeable = False
+    return powers
+
+
+def _window_hashes(block: np.ndarray, window: int = WINDOW) -> np.ndarray:
+    """
+    Polynomial hash of every `window` bytes of block, for the windows ending at block[window - 1:].
+    The prefix sums of T[b_k] * p**k are differenced and multiplied by p**-start, so the hash only depends on
+    the window's content and not on where the block starts - all in uint64 arithmetic, which wraps modulo 2**64.
+    """
+    n = len(block)
+    powers = _powers(n, PRIME)
+    inverse = _powers(n - window + 1, _inverse(PRIME))
+    prefix = np.zeros(n + 1, dtype=np.uint64)
+    np.cumsum(BYTE_TABLE[block] * powers, out=prefix[1:])
+    return (prefix[window:] - prefix[:n - window + 1]) * inverse
+
+
+def cut_points(filepath: str, chunk_sizes: typing.List[int] = None, window: int = WINDOW) -> typing.Dict[int, list]:
+    """
+    Content defined chunk boundaries of a file for every average chunk size.
+    A chunk ends after a byte whose window hash has its top log2(chunk_size) bits zero,
+    chunks are kept between chunk_size / 4 and chunk_size * 8 bytes.
+    The rolling hash is computed once for all chunk sizes.
+    """
+    chunk_sizes = chunk_sizes or CHUNK_SIZES
+    size = path.getsize(filepath)
+    candidates = {chunk_size: [] for chunk_size in chunk_sizes}
+    if size >= window:
+        data = np.memmap(filepath, dtype=np.uint8, mode='r')
+        for start in range(0, size - window + 1, BLOCK_SIZE):
+            hashes = _window_hashes(data[start:start + BLOCK_SIZE + window - 1], window)
+            for chunk_size in chunk_sizes:
+                shift = np.uint64(64 - int(np.log2(chunk_size)))
+                ends = np.flatnonzero((hashes >> shift) == 0) + start + window  # the chunk ends after the window
+                candidates[chunk_size].append(ends)
+        del data
+    cuts = {}
+    for chunk_size in chunk_sizes:
+        min_size, max_size = chunk_size // 4, chunk_size * 8
+        ends = np.concatenate(candidates[chunk_size]) if candidates[chunk_size] else []
+        boundaries, last = [], 0
+        for end in ends:
+            if end - last < min_size:
+                continue
+            while end - last > max_size:
+                last += max_size
+                boundaries.append(last)
+            boundaries.append(int(end))
+            last = int(end)
+        while size - last > max_size:
+            last += max_size
+            boundaries.append(last)
+        if size > last:
+            boundaries.append(size)
+        cuts[chunk_size] = boundaries
+    return cuts
+
+
+class DedupAnalyzer:
+    """
+    Measures how many bytes of each step's files are new, with content defined chunking.
+    The step each chunk was first seen at is persisted per series, so a step counts as new only the chunks
+    no earlier step had - the ideal transfer volume of a deduplicating tech.
+    Re-analysing a step gives the same result.
+    """
+
+    def __init__(self, directory: str = 'logs/dedup', chunk_sizes: typing.List[int] = None):
+        """
+        directory: where the seen chunks of each series are kept
+        chunk_sizes: average chunk sizes to analyse
+        """
+        self.directory = directory
+        self.chunk_sizes = chunk_sizes or CHUNK_SIZES
+
+    def _state_path(self, key: str, chunk_size: int) -> str:
+        return path.join(self.directory, f"{key}-{size_label(chunk_size)}.npz")
+
+    def _load(self, key: str, chunk_size: int) -> dict:
+        with contextlib.suppress(FileNotFoundError):
+            state = np.load(self._state_path(key, chunk_size))
+            return dict(zip(map(bytes, state['hashes']), state['steps'].tolist()))
+        return {}
+
+    def _save(self, key: str, chunk_size: int, seen: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        hashes = np.frombuffer(b''.join(seen), dtype=np.uint8).reshape(-1, 16)
+        tmp_path = f"{self._state_path(key, chunk_size)}.tmp.npz"
+        np.savez(tmp_path, hashes=hashes, steps=np.fromiter(seen.values(), dtype=np.int64, count=len(seen)))
+        os.replace(tmp_path, self._state_path(key, chunk_size))
+
+    def analyze(self, key: str, step: int, filepaths: typing.List[str]) -> dict:
+        """
+        Returns per chunk size the total, new and reused bytes of the step, in total and per file.
+        A chunk is reused if an earlier step, or an earlier part of this step, already had it.
+        """
+        cuts = {filepath: cut_points(filepath, self.chunk_sizes) for filepath in filepaths}
+        report = {}
+        for chunk_size in self.chunk_sizes:
+            seen = self._load(key, chunk_size)
+            step_seen = set()
+            totals = {'total_bytes': 0, 'new_bytes': 0, 'reused_bytes': 0, 'chunks': 0, 'files': {}}
+            for filepath in filepaths:
+                stats = {'total_bytes': 0, 'new_bytes': 0, 'reused_bytes': 0, 'chunks': 0}
+                with open(filepath, 'rb') as f:
+                    start = 0
+                    for end in cuts[filepath][chunk_size]:
+                        digest = hashlib.blake2b(f.read(end - start), digest_size=16).digest()
+                        new = digest not in step_seen and seen.get(digest, step) >= step
+                        stats['new_bytes' if new else 'reused_bytes'] += end - start
+                        stats['total_bytes'] += end - start
+                        stats['chunks'] += 1
+                        step_seen.add(digest)
+                        seen[digest] = min(seen.get(digest, step), step)
+                        start = end
+                for name, value in stats.items():
+                    totals[name] += value
+                totals['files'][path.basename(filepath)] = stats
+            self._save(key, chunk_size, seen)
+            report[size_label(chunk_size)] = totals
+        return report
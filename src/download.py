@@ -1,56 +1,111 @@
 import argparse
 import os
 import os.path as path
+import re
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 from bs4 import BeautifulSoup
-import re
 import tqdm
 
-from utils import DOWNLOAD_CHOICES
-
 NYC_TLC_SITE = 'https://www.nyc.gov/site/tlc/about/tlc-trip-record-data.page'
 HFVHFV_PATTERN = r'fhvhv_tripdata_'
 DOWNLOAD_CHOICES = ['all', '2023', '2022', '2021', '2020', '2019']
 MERGED_FILENAME = 'merged.parquet'
 MOCK_COLUMNS = ['id', 'name', 'age']
+DOWNLOAD_WORKERS = 4
+CHUNK_BYTES = 1024 ** 2
+TIMEOUT = 60
+PARTIAL_SUFFIX = '.part'
+
+
+def list_urls(choices: str = 'all', site: str = NYC_TLC_SITE) -> typing.List[str]:
+    """The urls of the high volume for-hire vehicle files listed on the site - of a year or all"""
+    response = requests.get(site, timeout=TIMEOUT)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.content, 'html.parser')
+    pattern = re.compile(HFVHFV_PATTERN if choices == 'all' else HFVHFV_PATTERN + choices)
+    return [tag['href'].strip() for tag in soup.find_all('a', href=True) if pattern.search(tag['href'])]
+
+
+def _total_size(response: requests.Response) -> typing.Optional[int]:
+    """The size of the whole file from Content-Range (bytes 100-199/1000) or Content-Length"""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('*'):
+        return int(content_range.rsplit('/', 1)[1])
+    if response.status_code == 200 and 'Content-Length' in response.headers:
+        return int(response.headers['Content-Length'])
+    return None
 
 
-def download(download_dir: str, choices: str, limit: int = -1):
+def download_file(url: str, download_dir: str, session: requests.Session = None,
+                  chunk_bytes: int = CHUNK_BYTES) -> dict:
+    """
+    Streams a url into download_dir/<name>.part and renames it to download_dir/<name> once it has all the bytes,
+    so a file without the suffix is always complete.
+    A partial file left by an interrupted download is resumed with a Range request.
+    Raises IOError if the file doesn't have the size the server announced - the partial file is kept for a retry.
+    """
+    session = session or requests
+    filepath = path.join(download_dir, url.split('/')[-1])
+    if path.exists(filepath):
+        return {'url': url, 'filepath': filepath, 'bytes': 0, 'skipped': True}
+    tmp_path = filepath + PARTIAL_SUFFIX
+    offset = path.getsize(tmp_path) if path.exists(tmp_path) else 0
+    headers = {'Range': f"bytes={offset}-"} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        if response.status_code == 416:  # the partial file already has every byte
+            total = _total_size(response)
+            if total != offset:
+                raise IOError(f"{url}: can't resume at byte {offset} of {total}")
+            os.replace(tmp_path, filepath)
+            return {'url': url, 'filepath': filepath, 'bytes': 0, 'skipped': False}
+        response.raise_for_status()
+        if response.status_code != 206:  # the server ignored the range - start over
+            offset = 0
+        total = _total_size(response)
+        written = 0
+        with open(tmp_path, 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(chunk_bytes):
+                f.write(chunk)
+                written += len(chunk)
+    size = path.getsize(tmp_path)
+    if total is not None and size != total:
+        raise IOError(f"{url}: downloaded {size} of {total} bytes")
+    os.replace(tmp_path, filepath)
+    return {'url': url, 'filepath': filepath, 'bytes': written, 'skipped': False}
+
+
+def download(download_dir: str, choices: str = 'all', limit: int = -1, workers: int = DOWNLOAD_WORKERS,
+             site: str = NYC_TLC_SITE) -> typing.List[dict]:
     '''
     Extract URLs which match the patterns and download them into download_dir
     :param download_dir:
         The directory to download the data
     :param choices:
         Year to download or 'all'
+    :param limit:
+        max number of files to download, -1 for all
+    :param workers:
+        number of files downloaded at the same time
+    Returns the result of every file - failed downloads are reported and can be resumed by running again.
     '''
-    print("download_data")
     if path.exists(download_dir) and not path.isdir(download_dir):
         raise RuntimeError("Cannot download into " + download_dir)
-    if not path.exists(download_dir):
-        os.mkdir(download_dir)
-    response = requests.get(NYC_TLC_SITE)
-    soup = BeautifulSoup(response.content, 'html.parser')
-
-    anchor_tags = soup.find_all('a', href=True)
-
-    if choices == 'all':
-        pattern = re.compile(HFVHFV_PATTERN)
-    else:
-        pattern = re.compile(HFVHFV_PATTERN + choices)
-    matching_urls = [tag['href'] for tag in anchor_tags if pattern.search(tag['href'])]
-    download_count = 0
-
-    for url in tqdm.tqdm(matching_urls):
-        download_count += 1
-        if download_count >= limit > 0:
-            break
-        filename = path.join(download_dir, url.split('/')[-1])
-        if not path.exists(filename):
-            print(f"Downloading {filename}")
-            response = requests.get(url)
-            # Extract the filename from the URL
-            with open(filename, 'wb') as file:
-                file.write(response.content)
+    os.makedirs(download_dir, exist_ok=True)
+    urls = list_urls(choices, site)
+    if limit > 0:
+        urls = urls[:limit]
+    results = []
+    with ThreadPoolExecutor(workers) as pool:
+        futures = {pool.submit(download_file, url, download_dir): url for url in urls}
+        for future in tqdm.tqdm(as_completed(futures), total=len(futures)):
+            try:
+                results.append(future.result())
+            except (IOError, requests.RequestException) as e:
+                print(f"Failed to download {futures[future]}: {e}")
+                results.append({'url': futures[future], 'error': str(e)})
+    return results
 
 
 if __name__ == '__main__':
@@ -66,5 +121,10 @@ if __name__ == '__main__':
     p.add_argument(
         '--limit', default=-1, type=int,
         help='max number of files to download')
+    p.add_argument(
+        '--workers', default=DOWNLOAD_WORKERS, type=int,
+        help='number of files downloaded at the same time')
     args = p.parse_args()
-    download(args.dir, args.download, args.limit)
+    results = download(args.dir, args.download, args.limit, args.workers)
+    if any('error' in result for result in results):
+        raise SystemExit(1)
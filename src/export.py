@@ -0,0 +1,39 @@
+import dataclasses
+import typing
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ExportOptions:
+    """
+    Parquet layout of exported files.
+    With align_rows, row groups never cross align_start + k * align_rows, so when rows are appended in steps
+    of align_rows the previous version's row groups - and their bytes - are a prefix of the new file.
+    """
+    row_group_size: int = None  # rows per row group - None is the generator's chunk_size
+    align_rows: int = None
+    align_start: int = 0
+    compression: str = 'snappy'
+    compression_level: int = None
+    use_dictionary: bool = True
+    write_statistics: bool = True
+
+    def block_end(self, row: int, row_group_size: int) -> int:
+        """The end of the row group starting at row"""
+        end = row + (self.row_group_size or row_group_size)
+        if self.align_rows:
+            if row < self.align_start:
+                return min(end, self.align_start)
+            pinned = self.align_start + ((row - self.align_start) // self.align_rows + 1) * self.align_rows
+            end = min(end, pinned)
+        return end
+
+    def writer_kwargs(self) -> typing.Dict[str, typing.Any]:
+        """Keyword arguments of pyarrow.parquet.ParquetWriter"""
+        return {'compression': self.compression,
+                'compression_level': self.compression_level,
+                'use_dictionary': self.use_dictionary,
+                'write_statistics': self.write_statistics}
+
+    def to_dict(self) -> dict:
+        return dataclasses.asdict(self)
@@ -1,71 +1,511 @@
+import collections
 import contextlib
+import itertools
+import json
 import os
 import os.path as path
 import shutil
+import typing
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from random import choice, randint
 import string
 import tqdm
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from faker import Faker
-
-from pydantic import typing
+from constants import CHUNK_SIZE, CHUNK_MB, WORKERS
+from src import spans
+from src.export import ExportOptions
 
 NYC_TLC_SITE = 'https://www.nyc.gov/site/tlc/about/tlc-trip-record-data.page'
 HFVHFV_PATTERN = r'fhvhv_tripdata_'
 DOWNLOAD_CHOICES = ['all', '2023', '2022', '2021', '2020', '2019']
 MERGED_FILENAME = 'merged.parquet'
+POOL_SIZE = 1024
+
+
+class StreamWriter:
+    """
+    Writes dataframes to a parquet or csv file in fixed size blocks.
+    Incoming frames are buffered until a whole block is available, so every parquet row group
+    (and csv block) has the same boundaries no matter how the data was fed in.
+    Csv blocks have chunk_size rows, parquet row groups follow the layout of the export options.
+    New files are written to a temp file and renamed into place on close, so an existing file (or a hard link
+    to it) is never modified in place.
+    """
+
+    def __init__(self, filepath: str, chunk_size: int = CHUNK_SIZE, existing_rows: int = 0,
+                 options: ExportOptions = None):
+        """
+        existing_rows: rows already in the (csv) file - new rows are appended after them
+        options: parquet layout
+        """
+        self.filepath = filepath
+        self.chunk_size = chunk_size
+        self.options = options or ExportOptions()
+        self.parquet = filepath.endswith('.parquet')
+        if existing_rows and self.parquet:
+            raise ValueError("Parquet files can't be appended to")
+        self.rows = existing_rows
+        directory_path, filename = os.path.split(filepath)
+        self._path = filepath if existing_rows else os.path.join(directory_path, f".tmp-{filename}")
+        self._buffer = []
+        self._buffered = 0
+        self._writer = None
+        self._file = None
+        self._empty = None
+        if directory_path:
+            os.makedirs(directory_path, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(discard=exc_type is not None)
+
+    def write(self, df: pd.DataFrame):
+        if self._empty is None:
+            self._empty = df.iloc[:0]
+            if not self.parquet:
+                self._open_csv()
+        for start in range(0, len(df), self.chunk_size):
+            piece = df.iloc[start:start + self.chunk_size]
+            self._buffer.append(piece)
+            self._buffered += len(piece)
+            while self._buffered and self._buffered >= self._block_rows():
+                self._flush(self._block_rows())
+
+    def _block_rows(self) -> int:
+        if not self.parquet:
+            return self.chunk_size
+        return self.options.block_end(self.rows, self.chunk_size) - self.rows
+
+    def write_text(self, text: str, rows: int):
+        """Writes an already encoded csv block of `rows` rows - must be aligned with chunk_size"""
+        if self.parquet or self._buffered:
+            raise ValueError("Encoded blocks can only be written to csv on chunk boundaries")
+        if self._file is None:
+            self._open_csv()
+        self._file.write(text)
+        self.rows += rows
+
+    def write_table(self, table: pa.Table):
+        """Writes an arrow table as is - used to copy whole row groups"""
+        if not self.parquet or self._buffered:
+            raise ValueError("Tables can only be written to parquet on chunk boundaries")
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._path, table.schema, **self.options.writer_kwargs())
+        self._writer.write_table(table, row_group_size=max(table.num_rows, 1))
+        self.rows += table.num_rows
+
+    def write_arrow(self, table: pa.Table):
+        """
+        Writes an arrow table with the same blocks as `write` - parquet row groups are zero-copy slices of the
+        buffered tables, csv blocks are converted to pandas.
+        """
+        if not self.parquet:
+            for start in range(0, max(table.num_rows, 1), self.chunk_size):
+                self.write(table.slice(start, self.chunk_size).to_pandas())
+            return
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._path, table.schema, **self.options.writer_kwargs())
+        elif table.schema.metadata != self._writer.schema.metadata:  # e.g. row groups copied from a pandas file
+            table = table.replace_schema_metadata(self._writer.schema.metadata)
+        self._buffer.append(table)
+        self._buffered += table.num_rows
+        while self._buffered and self._buffered >= self._block_rows():
+            self._flush(self._block_rows())
+
+    def flush(self):
+        """Writes the buffered rows as a short block - the next rows start a new row group, e.g. of another month"""
+        if self._buffered:
+            self._flush(self._buffered)
+
+    def _open_csv(self):
+        self._file = open(self._path, 'a' if self.rows else 'w', newline='')
+
+    def _flush(self, rows: int):
+        if isinstance(self._buffer[0], pa.Table):
+            table = pa.concat_tables(self._buffer) if len(self._buffer) > 1 else self._buffer[0]
+            block, rest = table.slice(0, rows), table.slice(rows)
+            self._buffer = [rest] if rest.num_rows else []
+            self._buffered = rest.num_rows
+            self._writer.write_table(block, row_group_size=max(block.num_rows, 1))
+            self.rows += block.num_rows
+            return
+        df = pd.concat(self._buffer) if len(self._buffer) > 1 else self._buffer[0]
+        block, rest = df.iloc[:rows], df.iloc[rows:]
+        self._buffer = [rest] if len(rest) else []
+        self._buffered = len(rest)
+        if self.parquet:
+            if self._writer is None:
+                self._open_parquet(block)
+            self._writer.write_table(pa.Table.from_pandas(block, schema=self._writer.schema, preserve_index=False),
+                                     row_group_size=max(len(block), 1))
+        else:
+            block.to_csv(self._file, header=self.rows == 0, index=False)
+        self.rows += len(block)
+
+    def _open_parquet(self, df: pd.DataFrame):
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        self._writer = pq.ParquetWriter(self._path, schema, **self.options.writer_kwargs())
+
+    def close(self, discard: bool = False):
+        if self._buffered and not discard:
+            self._flush(self._buffered)
+        if self.rows == 0 and self._empty is not None and not discard:
+            if self.parquet:
+                self._open_parquet(self._empty)
+            else:
+                self._empty.to_csv(self._file, index=False)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._path != self.filepath and os.path.exists(self._path):
+            if discard:
+                os.remove(self._path)
+            else:
+                os.replace(self._path, self.filepath)
+
+
+NUMERIC_STREAM, FEATURES_STREAM, DIVERSE_STREAM = 0, 1, 2
+
+
+def random_raw(seed: int, key: typing.Tuple[int, ...], start: int, stop: int) -> np.ndarray:
+    """
+    Returns values [start, stop) of the uint64 random stream `key` of the seed.
+    Streams are counter based (Philox) so any range is computed directly without generating the values before it,
+    which makes every chunk independent of the chunk size and of the worker computing it.
+    """
+    bit_generator = np.random.Philox(np.random.SeedSequence(seed, spawn_key=key))
+    bit_generator.advance(start // 4)  # every counter step yields four values
+    bit_generator.random_raw(start % 4)
+    return bit_generator.random_raw(stop - start)
+
+
+def random_uniform(seed: int, key: typing.Tuple[int, ...], start: int, stop: int) -> np.ndarray:
+    """Floats in [0, 1) of the stream - same conversion as numpy's Generator.random"""
+    return (random_raw(seed, key, start, stop) >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+
+def random_index(seed: int, key: typing.Tuple[int, ...], start: int, stop: int, size: int) -> np.ndarray:
+    """Integers in [0, size) of the stream using one value per row"""
+    return ((random_raw(seed, key, start, stop) >> np.uint64(32)) * np.uint64(size) >> np.uint64(32)).astype(np.int32)
+
+
+class DiverseEngine:
+    """
+    Vectorized diverse (faker-like) data.
+    Faker fills small seeded pools once, rows are then assembled by sampling pool indices with numpy
+    and joining the sampled strings with arrow kernels - no per-row python calls.
+    Every sampled part has its own random stream, so any range of rows can be generated on its own.
+    """
+    COLUMNS = ['Name', 'Email', 'Phone', 'Address', 'City', 'State', 'Zip', 'Country', 'Company', 'Job Title',
+               'SSN', 'Latitude', 'Longitude']
+    POOLS = ['first_name', 'last_name', 'user_name', 'free_email_domain', 'street_address', 'city', 'state',
+             'state_abbr', 'country', 'company', 'job']
+    PARTS = ['first_name', 'last_name', 'user_name', 'free_email_domain', 'phone_area', 'phone_exchange',
+             'phone_line', 'street_address', 'address_city', 'state_abbr', 'address_zip', 'city', 'state', 'zip',
+             'country', 'company', 'job', 'ssn_area', 'ssn_group', 'ssn_serial', 'latitude', 'longitude']
+
+    def __init__(self, seed: int = 42, pool_size: int = POOL_SIZE):
+        self.seed = seed
+        fake = Faker()
+        Faker.seed(seed)
+        self.pools = {name: pa.array([getattr(fake, name)() for _ in range(pool_size)]) for name in self.POOLS}
+        for digits in (2, 3, 4, 5):
+            self.pools[f"digits_{digits}"] = pa.array([str(i).zfill(digits) for i in range(10 ** digits)])
+
+    def _key(self, part: str):
+        return DIVERSE_STREAM, self.PARTS.index(part)
+
+    def _sample(self, part: str, pool: str, start: int, stop: int) -> pa.Array:
+        values = self.pools[pool]
+        return values.take(random_index(self.seed, self._key(part), start, stop, len(values)))
+
+    def _uniform(self, part: str, low: float, high: float, start: int, stop: int) -> np.ndarray:
+        return (low + (high - low) * random_uniform(self.seed, self._key(part), start, stop)).round(6)
+
+    def generate(self, start: int, stop: int) -> typing.Dict[str, typing.Any]:
+        """Returns rows [start, stop) as a dict of column name to arrow array or numpy array"""
+        join = pc.binary_join_element_wise
+        rows = start, stop
+        phone = join(self._sample('phone_area', 'digits_3', *rows),
+                     self._sample('phone_exchange', 'digits_3', *rows),
+                     self._sample('phone_line', 'digits_4', *rows), '-')
+        address = join(self._sample('street_address', 'street_address', *rows), '\n',
+                       self._sample('address_city', 'city', *rows), ', ',
+                       self._sample('state_abbr', 'state_abbr', *rows), ' ',
+                       self._sample('address_zip', 'digits_5', *rows), '')
+        return {'Name': join(self._sample('first_name', 'first_name', *rows),
+                             self._sample('last_name', 'last_name', *rows), ' '),
+                'Email': join(self._sample('user_name', 'user_name', *rows),
+                              self._sample('free_email_domain', 'free_email_domain', *rows), '@'),
+                'Phone': phone,
+                'Address': address,
+                'City': self._sample('city', 'city', *rows),
+                'State': self._sample('state', 'state', *rows),
+                'Zip': self._sample('zip', 'digits_5', *rows),
+                'Country': self._sample('country', 'country', *rows),
+                'Company': self._sample('company', 'company', *rows),
+                'Job Title': self._sample('job', 'job', *rows),
+                'SSN': join(self._sample('ssn_area', 'digits_3', *rows),
+                            self._sample('ssn_group', 'digits_2', *rows),
+                            self._sample('ssn_serial', 'digits_4', *rows), '-'),
+                'Latitude': self._uniform('latitude', -90, 90, *rows),
+                'Longitude': self._uniform('longitude', -180, 180, *rows)}
+
+
+_worker_generators = {}
+
+
+def _generate_task(seed: int, numeric: bool, start: int, stop: int, features: int, csv_header: bool = None,
+                   table: bool = False):
+    """Runs in the pool workers - generators (and their diverse pools) are reused per process"""
+    generator = _worker_generators.get((seed, numeric))
+    if generator is None:
+        generator = _worker_generators[(seed, numeric)] = DataFrameGenerator(seed=seed, numeric=numeric, workers=1)
+    if table:
+        return generator.generate_table(start, stop, features)
+    df = generator.generate_range(start, stop, features)
+    if csv_header is None:
+        return df
+    return df.to_csv(header=csv_header, index=False)
 
 
 class DataFrameGenerator:
 
-    def __init__(self, seed: int = 42, numeric: bool = False):
+    def __init__(self, seed: int = 42, numeric: bool = False, chunk_size: int = CHUNK_SIZE, workers: int = 1,
+                 export_options: ExportOptions = None, chunk_mb: int = CHUNK_MB):
+        """
+        seed: seed for the generated data - the same seed always produces the same rows
+        numeric: if True generate float columns, otherwise diverse (faker) columns
+        chunk_size: number of rows generated and written at once when streaming
+        chunk_mb: caps the rows of a chunk, so chunks of wide (feature) tables stay around this size
+        workers: number of processes generating chunks - the data doesn't depend on it
+        export_options: parquet layout of exported files
+        """
         self.numeric = numeric
         self.seed = seed
-        self.fake = Faker()
-        self.columns = ['Name', 'Email', 'Phone', 'Address', 'City', 'State', 'Zip', 'Country', 'Company', 'Job Title',
-                        'SSN', 'Latitude', 'Longitude'] if not numeric else ['col_' + str(i) for i in range(0, 10)]
+        self.chunk_size = chunk_size
+        self.chunk_mb = chunk_mb
+        self.workers = workers
+        self.export_options = export_options or ExportOptions()
+        self._diverse = None
+        self.columns = DiverseEngine.COLUMNS if not numeric else ['col_' + str(i) for i in range(0, 10)]
 
-    def generate(self, num_rows: int):
-        if not self.numeric:
-            Faker.seed(self.seed)
-            data = [[self.fake.name(),
-                     self.fake.email(),
-                     self.fake.phone_number(),
-                     self.fake.address(),
-                     self.fake.city(),
-                     self.fake.state(),
-                     self.fake.zipcode(),
-                     self.fake.country(),
-                     self.fake.company(),
-                     self.fake.job(),
-                     self.fake.ssn(),
-                     self.fake.latitude(),
-                     self.fake.longitude()] for _ in range(num_rows)]
+    @property
+    def diverse(self) -> DiverseEngine:
+        """The pools are built once per generator, on first use"""
+        if self._diverse is None:
+            self._diverse = DiverseEngine(self.seed)
+        return self._diverse
 
-        else:
-            np.random.seed(self.seed)
-            data = np.random.rand(num_rows, len(self.columns))
-        return pd.DataFrame(data, columns=self.columns)
+    def _arrays(self, start: int, stop: int, features: int = 0, columns: bool = True) -> typing.Dict[str, typing.Any]:
+        data = {}
+        if columns and self.numeric:
+            data.update({column: random_uniform(self.seed, (NUMERIC_STREAM, i), start, stop)
+                         for i, column in enumerate(self.columns)})
+        elif columns:
+            data.update(self.diverse.generate(start, stop))
+        data.update({f"feature_{i}": random_uniform(self.seed, (FEATURES_STREAM, i), start, stop)
+                     for i in range(features)})
+        return data
+
+    def generate_range(self, start: int, stop: int, features: int = 0, columns: bool = True) -> pd.DataFrame:
+        """
+        Generates rows [start, stop) directly.
+        features: number of feature columns added after the generated columns
+        columns: if False only the feature columns are generated
+        """
+        index = pd.RangeIndex(start, stop)
+        return pd.DataFrame({column: pd.Series(values, index=index, dtype=pd.ArrowDtype(pa.string()))
+                             if isinstance(values, pa.Array) else values
+                             for column, values in self._arrays(start, stop, features, columns).items()}, index=index)
+
+    def generate_table(self, start: int, stop: int, features: int = 0) -> pa.Table:
+        """Generates rows [start, stop) as an arrow table - the numpy columns are wrapped without copies"""
+        return pa.table(self._arrays(start, stop, features))
+
+    def chunk_rows(self, features: int = 0) -> int:
+        """Rows generated and written at once - chunk_size, or fewer so a chunk of a wide table fits chunk_mb"""
+        row_bytes = 8 * (len(self.columns) + features)  # estimated at 8 bytes a value
+        return max(1, min(self.chunk_size, self.chunk_mb * 1024 ** 2 // row_bytes))
+
+    def _ranges(self, start: int, stop: int, features: int = 0) -> typing.List[typing.Tuple[int, int]]:
+        if start == stop:
+            return [(start, stop)]
+        rows = self.chunk_rows(features)
+        return [(chunk, min(chunk + rows, stop)) for chunk in range(start, stop, rows)]
+
+    def _map(self, tasks: typing.List[tuple]) -> typing.Iterator:
+        """Runs the generation tasks in order, in a process pool if there is more than one worker"""
+        if self.workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                yield _generate_task(*task)
+            return
+        with ProcessPoolExecutor(min(self.workers, len(tasks))) as pool:
+            pending = collections.deque()
+            for task in tasks:
+                pending.append(pool.submit(_generate_task, *task))
+                if len(pending) >= 2 * self.workers:  # bounds the chunks held in memory
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def generate_chunks(self, num_rows: int, features: int = 0, start: int = 0) -> typing.Iterator[pd.DataFrame]:
+        """Yields rows [start, start + num_rows) in consecutive frames of at most chunk_size rows"""
+        return self._map([(self.seed, self.numeric, chunk_start, chunk_stop, features)
+                          for chunk_start, chunk_stop in self._ranges(start, start + num_rows, features)])
+
+    def generate_tables(self, num_rows: int, features: int = 0, start: int = 0) -> typing.Iterator[pa.Table]:
+        """Yields rows [start, start + num_rows) in consecutive arrow tables of at most chunk_rows(features) rows"""
+        return self._map([(self.seed, self.numeric, chunk_start, chunk_stop, features, None, True)
+                          for chunk_start, chunk_stop in self._ranges(start, start + num_rows, features)])
+
+    def generate(self, num_rows: int):
+        return pd.concat(list(self.generate_chunks(num_rows)))
 
     def generate_features(self, num_rows: int, num_columns: int):
-        np.random.seed(self.seed)
-        data = np.random.rand(num_rows, num_columns)
-        return pd.DataFrame(data, columns=[f"feature_{i}" for i in range(num_columns)])
+        return pd.concat([self.generate_range(chunk_start, chunk_stop, num_columns, columns=False)
+                          for chunk_start, chunk_stop in self._ranges(0, num_rows)])
+
+    def generate_with_features(self, num_rows: int, num_columns: int) -> typing.Iterator[pd.DataFrame]:
+        """Yields chunks of the generated columns followed by num_columns feature columns"""
+        return self.generate_chunks(num_rows, features=num_columns)
 
     def export(self, df: pd.DataFrame, filepath: str):
-        directory_path = os.path.dirname(filepath)
-        os.makedirs(directory_path, exist_ok=True)
-        if filepath.endswith('.parquet'):
-            df.to_parquet(filepath, engine='pyarrow')
-        else:
-            df.to_csv(filepath, index=False)
+        with StreamWriter(filepath, self.chunk_size, options=self.export_options) as writer:
+            writer.write(df)
+
+    def export_chunks(self, chunks: typing.Iterable[pd.DataFrame], filepath: str):
+        """
+        Streams chunks into filepath - peak memory is bounded by chunk_size rows.
+        The output is byte-identical to `export` of the concatenated chunks.
+        """
+        with StreamWriter(filepath, self.chunk_size, options=self.export_options) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+        return writer.rows
 
     def generate_mock_files(self, target: str, num_rows: int, file_count: int = 1):
         shutil.rmtree(target, ignore_errors=True)
         os.mkdir(target)
         for filename in tqdm.tqdm(range(0, file_count)):
-            self.generate(num_rows).to_parquet(f"{target}/{filename}.parquet")
+            self.export_range(f"{target}/{filename}.parquet", num_rows, start=filename * num_rows)
+
+    def _writer(self, filepath: str, features: int = 0, existing_rows: int = 0) -> StreamWriter:
+        return StreamWriter(filepath, self.chunk_rows(features), existing_rows=existing_rows,
+                            options=self.export_options)
+
+    def _write_range(self, writer: StreamWriter, start: int, stop: int, features: int = 0):
+        """Parquet is written from arrow tables, so wide tables are never assembled column by column in pandas"""
+        ranges = self._ranges(start, stop, features)
+        if writer.parquet or start == stop:
+            for table in spans.iterate(self.generate_tables(stop - start, features, start), 'generate'):
+                with spans.span('write'):
+                    writer.write_arrow(table)
+            return
+        header = writer.rows == 0
+        tasks = [(self.seed, self.numeric, chunk_start, chunk_stop, features, header and chunk_start == start)
+                 for chunk_start, chunk_stop in ranges]
+        for (chunk_start, chunk_stop), text in zip(ranges, spans.iterate(self._map(tasks), 'generate')):
+            with spans.span('write'):
+                writer.write_text(text, chunk_stop - chunk_start)
+
+    def export_range(self, filepath: str, num_rows: int, features: int = 0, start: int = 0):
+        """
+        Generates and streams rows [start, start + num_rows) into filepath.
+        With several workers, csv blocks are also encoded in the workers.
+        """
+        with self._writer(filepath, features) as writer:
+            self._write_range(writer, start, start + num_rows, features)
+        return writer.rows
+
+    def _manifest(self, features: int = 0) -> dict:
+        return {'seed': self.seed, 'numeric': self.numeric, 'features': features, 'chunk_size': self.chunk_size,
+                'chunk_rows': self.chunk_rows(features),
+                'export_options': self.export_options.to_dict()}
+
+    @staticmethod
+    def manifest_path(filepath: str) -> str:
+        return f"{filepath}.json"
+
+    def existing_rows(self, filepath: str, features: int = 0) -> int:
+        """Number of rows in filepath if it was written by `extend` with the same settings, otherwise 0"""
+        with contextlib.suppress(FileNotFoundError, ValueError, KeyError):
+            with open(self.manifest_path(filepath)) as f:
+                manifest = json.load(f)
+            rows, size = manifest.pop('rows'), manifest.pop('size')
+            if manifest == self._manifest(features) and path.getsize(filepath) == size:
+                return rows
+        return 0
+
+    def extend(self, filepath: str, num_rows: int, features: int = 0) -> int:
+        """
+        Makes filepath hold rows [0, num_rows), only generating the rows it doesn't have yet.
+        Rows of the previous version are reused - whole row groups for parquet, the whole file for csv.
+        The result is byte-identical to `export_range(filepath, num_rows)`.
+        Returns the number of generated rows.
+        """
+        existing = self.existing_rows(filepath, features)
+        if existing > num_rows:
+            existing = 0
+        directory, filename = path.split(filepath)
+        tmp_path = path.join(directory, f".tmp-{filename}")
+        if filepath.endswith('.parquet'):
+            reuse, row_groups = 0, []
+            previous = pq.ParquetFile(filepath) if existing else None
+            for row_group in range(previous.num_row_groups if previous else 0):
+                rows = previous.metadata.row_group(row_group).num_rows
+                if self.export_options.block_end(reuse, self.chunk_rows(features)) != reuse + rows:
+                    break  # the last row group of the previous version was cut short by the end of the file
+                row_groups.append(row_group)
+                reuse += rows
+            with self._writer(filepath, features) as writer:
+                with spans.span('reuse', row_groups=len(row_groups)):
+                    for row_group in row_groups:
+                        writer.write_table(previous.read_row_group(row_group))
+                self._write_range(writer, reuse, num_rows, features)
+        else:
+            reuse = existing
+            if reuse:
+                with spans.span('reuse'):
+                    shutil.copyfile(filepath, tmp_path)
+                with self._writer(tmp_path, features, existing_rows=reuse) as writer:
+                    self._write_range(writer, reuse, num_rows, features)
+                os.replace(tmp_path, filepath)
+            else:
+                self.export_range(filepath, num_rows, features)
+        with open(f"{tmp_path}.json", 'w') as f:
+            json.dump({**self._manifest(features), 'rows': num_rows, 'size': path.getsize(filepath)}, f)
+        os.replace(f"{tmp_path}.json", self.manifest_path(filepath))
+        return num_rows - reuse
+
+    def export_split(self, splits: typing.List[typing.Tuple[str, int]], start: int = 0):
+        """
+        Generates consecutive ranges of rows into files.
+        The rows of all the splits are generated as one arrow table, which is held in memory,
+        and every file is written in its own thread from a zero-copy slice of it.
+        splits: list of (filepath, rows) - the first rows go to the first file and so on
+        """
+        total = sum(rows for _, rows in splits)
+        table = pa.concat_tables(list(self.generate_tables(total, start=start)))
+        offsets = [0] + list(itertools.accumulate(rows for _, rows in splits))
+
+        def write(split: int):
+            filepath, rows = splits[split]
+            with self._writer(filepath) as writer:
+                writer.write_arrow(table.slice(offsets[split], rows))
+
+        with ThreadPoolExecutor(max(len(splits), 1)) as pool:
+            list(pool.map(write, range(len(splits))))
 
 
 class BlogDataGenerator:
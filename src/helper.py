@@ -1,15 +1,21 @@
+import functools
 import os
 import shutil
 import subprocess
 from loguru import logger
-import pyxet
-import duckdb
 import os.path as path
-import boto3
-import fsspec
 import time
-import s3fs
-from constants import LAKEFS_REPO, PYXET_REPO, GITXET_REPO, S3_BUCKET
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from constants import LAKEFS_REPO, PYXET_REPO, GITXET_REPO, S3_BUCKET, COMMAND_TIMEOUT, S3_PART_SIZE_MB, \
+    S3_MAX_CONCURRENCY
+from src import runner, spans
+from src.runner import CommandResult
+
+# how each sync mode fetches the upstream branch and moves the checked out branch to it
+SYNC_COMMANDS = {'full': ("git fetch", "git merge --ff-only @{u}"),
+                 'blobless': ("git fetch --filter=blob:none", "git merge --ff-only @{u}"),
+                 'shallow': ("git fetch --depth 1", "git reset --keep @{u}")}
 
 
 class Helper:
@@ -23,16 +29,36 @@ class Helper:
     LFS_GITHUB = "lfs-github"
     XETHUB_GIT = "xethub-git"
 
-    def __init__(self):
-
-        self.s3 = boto3.client('s3')
+    def __init__(self, timeout: float = COMMAND_TIMEOUT):
+        """
+        timeout: seconds before a shell command is killed
+        """
+        self.timeout = timeout
         self.xet_pyxet_repo = PYXET_REPO
         self.xet_git_repo = GITXET_REPO
         self.lakefs_repo = LAKEFS_REPO
         self.s3_bucket = S3_BUCKET
-        self.fs_xet = pyxet.XetFS()
-        self.fs_s3 = s3fs.S3FileSystem(anon=False)
 
+    # clients are created on first use, so commands which don't touch a backend don't import or authenticate it
+    @functools.cached_property
+    def s3(self):
+        import boto3
+        return boto3.client('s3')
+
+    @functools.cached_property
+    def s3_uploader(self):
+        from src.s3_upload import S3Uploader
+        return S3Uploader(self.s3, part_size=S3_PART_SIZE_MB * 1024 ** 2, max_concurrency=S3_MAX_CONCURRENCY)
+
+    @functools.cached_property
+    def fs_xet(self):
+        import pyxet
+        return pyxet.XetFS()
+
+    @functools.cached_property
+    def fs_s3(self):
+        import s3fs
+        return s3fs.S3FileSystem(anon=False)
 
     @staticmethod
     def _get_xet_repo(path: str):
@@ -42,44 +68,83 @@ class Helper:
         origin = origins.split("\n")[0].split("\t")[1].split(" ")[0].split("/")
         return f"xet://{origin[-2]}/{origin[-1].replace('.git', '')}/main"
 
+    @staticmethod
+    def _outcome(result: CommandResult) -> dict:
+        return {'out': result.output, 'returncode': result.returncode, 'timed_out': result.timed_out,
+                'bytes_transferred': result.bytes_transferred}
+
     def dvc_upload(self, filepath: str):
-        out = self._dvc_upload(filepath)
-        return {'function': 'dvc upload', 'tech': 'dvc', 'name': 'dvc', 'out': out}
+        result = self._dvc_upload(filepath)
+        return {'function': 'dvc upload', 'tech': 'dvc', 'name': 'dvc', **self._outcome(result)}
 
     def lfs_s3_upload(self, filepath: str):
-        out = self._lfs_upload(filepath, Helper.LFS_S3)
-        return {'function': 'lfs s3 upload', 'tech': 'lfs', 'name': 'lfs-s3', 'out': out}
+        result = self._lfs_upload(filepath, Helper.LFS_S3)
+        return {'function': 'lfs s3 upload', 'tech': 'lfs', 'name': 'lfs-s3', **self._outcome(result)}
 
     def lfs_git_upload(self, filepath: str):
-        out = self._lfs_upload(filepath, Helper.LFS_GITHUB)
-        return {'function': 'lfs git upload', 'tech': 'lfs', 'name': 'lfs-git', 'out': out}
+        result = self._lfs_upload(filepath, Helper.LFS_GITHUB)
+        return {'function': 'lfs git upload', 'tech': 'lfs', 'name': 'lfs-git', **self._outcome(result)}
 
     def pyxet_upload(self, filepath: str):
         filename = path.basename(filepath)
         out = ''
         try:
-            with self.fs_xet.transaction:
-                self.fs_xet.put(filepath, f"{self.xet_pyxet_repo}/{filename}")
+            with spans.span('transaction'):
+                with self.fs_xet.transaction:
+                    with spans.span('put'):
+                        self.fs_xet.put(filepath, f"{self.xet_pyxet_repo}/{filename}")
         except Exception as e:
             out = str(e)
             logger.error(out)
-        return {'function': 'pyxet upload', 'tech': 'xethub', 'name': 'pyxet', 'out': out}
+        return {'function': 'pyxet upload', 'tech': 'xethub', 'name': 'pyxet', 'out': out, 'returncode': int(bool(out))}
+
+    def pyxet_upload_many(self, filepaths: typing.List[str]) -> typing.List[dict]:
+        """Uploads the files at the same time in a single transaction - the times of the puts exclude the commit"""
+        def put(filepath: str) -> dict:
+            start_time = time.time()
+            self.fs_xet.put(filepath, f"{self.xet_pyxet_repo}/{path.basename(filepath)}")
+            return {'function': 'pyxet upload', 'tech': 'xethub', 'name': 'pyxet', 'out': '',
+                    'time': time.time() - start_time}
+
+        try:
+            with self.fs_xet.transaction:
+                with ThreadPoolExecutor(len(filepaths)) as pool:
+                    return list(pool.map(put, filepaths))
+        except Exception as e:
+            logger.error(str(e))
+            return [{'function': 'pyxet upload', 'tech': 'xethub', 'name': 'pyxet', 'out': str(e), 'returncode': 1}
+                    for _ in filepaths]
 
     def gitxet_upload(self, filepath: str):
-        out = self._git_upload(filepath, Helper.XETHUB_GIT)
-        return {'function': 'git-xet upload', 'tech': 'xethub', 'name': 'gitxet', 'out': out}
+        result = self._git_upload(filepath, Helper.XETHUB_GIT)
+        return {'function': 'git-xet upload', 'tech': 'xethub', 'name': 'gitxet', **self._outcome(result)}
 
     def lakefs_upload(self, filepath: str):
-        out = self._lakefs_upload(filepath)
-        return {'function': 'lakefs upload', 'tech': 'lakefs', 'name': 'lakefs', 'out': out}
+        result = self._lakefs_upload(filepath)
+        return {'function': 'lakefs upload', 'tech': 'lakefs', 'name': 'lakefs', **self._outcome(result)}
 
     def s3_upload(self, filepath: str):
-        out = self._s3_upload(filepath)
-        if "\rCompleted" in out:
-            out = ""
-        return {'function': 's3 new upload', 'tech': 's3', 'name': 's3', 'out': out}
+        result = self._s3_upload(filepath)
+        outcome = self._outcome(result)
+        if result.ok:
+            outcome['out'] = ""  # only progress lines
+        return {'function': 's3 new upload', 'tech': 's3', 'name': 's3', **outcome}
+
+    def s3_native_upload(self, filepath: str):
+        out = ''
+        stats = {}
+        try:
+            with spans.span('multipart upload'):
+                stats = self.s3_uploader.upload(filepath, self.s3_bucket, f"s3-native/{filepath}")
+            stats.pop('part_stats')  # summarized by the part_time and part_retries statistics
+        except Exception as e:
+            out = str(e)
+            logger.error(out)
+        return {'function': 's3 native upload', 'tech': 's3', 'name': 's3-native', 'out': out,
+                'returncode': int(bool(out)), **stats}
 
     def s3_copy_time(self, local_path: str, s3_path: str):
+        import fsspec
         with fsspec.open(local_path, 'rb') as f1:
             data = f1.read()
         start_time = time.time()
@@ -88,6 +153,8 @@ class Helper:
         return {'function': 's3 copy time', 'tech': 's3', 'upload_time': end_time - start_time}
 
     def xet_copy_time(self, filepath: str, xetpath: str):
+        import fsspec
+        import pyxet
         xet_fs = pyxet.XetFS()
         with fsspec.open(filepath, 'rb') as f1:
             data = f1.read()
@@ -134,41 +201,83 @@ class Helper:
                   """
         return self.run(command, repo)
 
-    def run(self, command: str, repo: str = '', verbose=True):
+    def sync(self, repos: typing.List[str], mode: str = 'full') -> typing.Dict[str, dict]:
+        """
+        Brings git repos up to date with their upstream branch, all at the same time.
+        A repo which has the remote head checked out - according to a cheap ls-remote - isn't fetched.
+        LFS files are never downloaded (GIT_LFS_SKIP_SMUDGE), only their pointers.
+        mode: full fetches everything, blobless only the file contents which are checked out,
+              shallow only the head commit - the branch is then reset to it.
+              Blobless turns a full clone into a partial clone for good - later commands fetch missing blobs
+              lazily, which adds to the times the benchmark measures.
+        Returns the status (up-to-date, updated, failed or missing) and seconds of every repo.
+        """
+        if mode not in SYNC_COMMANDS:
+            raise ValueError(f"Unknown sync mode {mode} - one of {', '.join(SYNC_COMMANDS)}")
+        results = {repo: {'status': 'missing', 'time': 0.} for repo in repos}
+        repos = [repo for repo in repos if path.isdir(path.join(repo, '.git'))]
+        checks = runner.run_many([{'command': "git rev-parse HEAD && git rev-parse --abbrev-ref @{u} && "
+                                              "git ls-remote --heads", 'cwd': repo, 'timeout': self.timeout}
+                                  for repo in repos])
+        behind = []
+        for repo, check in zip(repos, checks):
+            lines = check.stdout.split('\n')  # the local head, the upstream (origin/main) and the remote's heads
+            heads = {ref: sha for sha, ref in (line.split('\t') for line in lines[2:] if '\t' in line)}
+            upstream = lines[1].split('/', 1)[-1] if len(lines) > 1 else ''
+            local, remote = lines[0], heads.get(f"refs/heads/{upstream}")
+            results[repo] = {'status': 'up-to-date', 'time': check.duration, 'local': local, 'remote': remote}
+            if not check.ok or remote is None:
+                results[repo].update({'status': 'failed', 'error': check.stderr.strip()})
+            elif local != remote:
+                behind.append(repo)
+        fetch, update = SYNC_COMMANDS[mode]
+        updates = runner.run_many([{'command': f"{fetch} && {update}", 'cwd': repo, 'timeout': self.timeout,
+                                    'env': {'GIT_LFS_SKIP_SMUDGE': '1'}} for repo in behind])
+        for repo, result in zip(behind, updates):
+            results[repo]['time'] += result.duration
+            results[repo]['status'] = 'updated' if result.ok else 'failed'
+            if not result.ok:
+                results[repo]['error'] = result.stderr.strip()
+        return results
+
+    def run(self, command: str, repo: str = '', verbose=True, timeout: float = None, span: str = None) -> CommandResult:
+        """
+        Runs a shell command in repo with a timeout, streaming its output to the debug log.
+        Returns a CommandResult with the exit code, duration and output.
+        span: name of the command's span - by default its first two words, e.g. git push
+        """
         if verbose:
             logger.info(command)
-        args = {"shell": True, "capture_output": True}
-        if repo:
-            args["cwd"] = repo
-        out = subprocess.run(command, **args)
-        error = False
-        if out.stdout:
-            out = out.stdout.decode()
-        elif out.stderr:
-            error = True
-            out = out.stderr.decode()
-        else:
-            out = ''
+        with spans.span(span or ' '.join(command.split()[:2]), repo=repo):
+            result = runner.run(command, cwd=repo or None, timeout=timeout or self.timeout,
+                                on_line=lambda name, line: logger.debug(f"{name}: {line}") if verbose else None)
+        if result.timed_out:
+            logger.error(f"Timed out after {result.duration:.0f}s: {command.strip()}")
         if verbose:
-            if error:
-                logger.error(out)
-            else:
-                logger.info(out)
-        return out
+            if result.stdout:
+                logger.info(result.stdout)
+            elif result.stderr and result.returncode:
+                logger.error(result.stderr)
+            elif result.stderr:
+                logger.info(result.stderr)
+        return result
 
     def _dvc_add_commit(self, filename: str):
-        command = f"""
-                        dvc add {filename}
-                        git add {filename}.dvc
-                        git commit -m "commit {filename}"
-                        git push                
-                        """
-        return self.run(command, Helper.DVC)
+        """Every command runs on its own, so each has its own span - the first failed command is returned"""
+        result = self.run(f"dvc add {filename}", Helper.DVC)
+        if not result.ok:
+            return result
+        result = self._git_add_commit(f"{filename}.dvc", Helper.DVC, commit=filename)
+        if not result.ok:
+            return result
+        return self._git_push(Helper.DVC)
 
     def _dvc_upload(self, filepath: str):
         filename = os.path.basename(filepath)
-        self._dvc_add_commit(filename)
-        self._dvc_push()
+        result = self._dvc_add_commit(filename)
+        if not result.ok:
+            return result
+        return self._dvc_push()
 
     def _dvc_remove(self, path: str):
         if not path.startswith(Helper.DVC):
@@ -193,15 +302,18 @@ class Helper:
 
     def _git_add_commit(self, filename: str, repo: str = '', commit: str = ""):
         commit = commit or filename
-        command = f"""                                
-                    git add {filename}
-                    git commit -m "commit {commit}"
-                    """
-        return self.run(command, repo)
+        result = self.run(f"git add {filename}", repo)  # runs the clean filters - git-xet and lfs hash the file here
+        if not result.ok:
+            return result
+        # an unchanged file leaves a clean tree - the empty commit lets reruns and retries go on to the push
+        return self.run(f'git commit --allow-empty -m "commit {commit}"', repo)
 
     def _git_upload(self, filepath: str, repo: str):
+        """The first failed command is returned, so a failed add isn't reported as a push"""
         filename = os.path.basename(filepath)
-        self._git_add_commit(filename, repo)
+        result = self._git_add_commit(filename, repo)
+        if not result.ok:
+            return result
         return self._git_push(repo)
 
     def _lfs_upload(self, filepath: str, lfs_dir: str):
@@ -220,15 +332,9 @@ class Helper:
         self._git_add_commit('output/*', commit=commit)
         self._git_push()
 
-    def merge_files(self, new_filepath: str, merged_filepath: str):
-        if not path.exists(merged_filepath):
-            shutil.copyfile(new_filepath, merged_filepath)
-        else:
-            duckdb.execute(
-                f"""
-                        COPY (SELECT * FROM read_parquet(['{new_filepath}', '{merged_filepath}'])) TO '{merged_filepath}' (FORMAT 'parquet');
-                        """
-            )
+    def merge_files(self, new_filepath: str, merged_filepath: str, mode: str = 'rewrite'):
+        from src.utils import merge_files
+        merge_files(new_filepath, merged_filepath, mode=mode)
         return {'filename': new_filepath, 'tech': Helper.M1}
 
     def git_exists(self, path: str, cwd: str):
@@ -250,7 +356,7 @@ class Helper:
             self.fs_xet.rm(f"{xet_repo}/{filename}")
 
     def _lakefs_upload(self, filepath):
-        self.run(f"lakectl fs upload -s {filepath} {self.lakefs_repo}/{filepath}")
+        return self.run(f"lakectl fs upload -s {filepath} {self.lakefs_repo}/{filepath}")
 
     def _s3_upload(self, filepath):  # not capturing output - too noisey
         command = f"aws s3 cp {filepath} s3://{self.s3_bucket}/s3/{filepath}"
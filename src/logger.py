@@ -1,21 +1,19 @@
+import atexit
+import functools
 from loguru import logger
 import os
 from datetime import datetime
 import json
-from json import JSONDecodeError
-import pandas as pd
-from glob import glob
-import contextlib
-from datetime import datetime
 from coolname import generate_slug
 
 
 class Logger():
 
-    def __init__(self, path: str = 'logs', params: dict = None):
+    def __init__(self, path: str = 'logs', params: dict = None, batch_size: int = 100):
         """
         path: path to save the log files
-        params: dict with params to add to each track call
+        params: dict with params to add to each track call - callable values are resolved on the first log
+        batch_size: number of results buffered before they are written to the results store
         """
         if params is None:
             params = {}
@@ -25,32 +23,53 @@ class Logger():
         self.path = path
         self.logger = logger
         self.params = params
-        self.name = generate_slug(3)
         log_file = "{time:YYYY-MM-DD}.log"
+        self.batch_size = batch_size
         logger.add(f"{path}/{log_file}", rotation="1 day")
 
+    def rename(self, name: str):
+        """Logs the next results under another run name, e.g. of a resumed run"""
+        self.name = name
+        self.params['run_name'] = name
+
+    @functools.cached_property
+    def store(self):
+        """Opened on first use - commands which don't log don't pay for importing duckdb"""
+        from src.results import ResultStore
+        store = ResultStore(f"{self.path}/results.duckdb", self.batch_size)
+        atexit.register(store.flush)
+        return store
+
+    def resolve_params(self) -> dict:
+        for key, value in self.params.items():
+            if callable(value):
+                self.params[key] = value()
+        return self.params
+
     def log(self, params):
         params['timestamp'] = datetime.now().isoformat()
-        self.logger.debug(f"|{json.dumps({**self.params, **params})}")
+        record = {**self.resolve_params(), **params}
+        self.logger.debug(f"|{json.dumps(record)}")
+        self.store.append(record)
 
     def info(self, message):
         self.logger.info(message)
 
+    def summarize(self, **kwargs):
+        """
+        Statistics of the trials of this run per workflow, tech and step - see stats.summarize.
+        The summary is written to the results store next to the results.
+        """
+        from src import stats
+        summary = stats.summarize(self.store.query("run_name = ?", [self.name]), **kwargs)
+        self.store.write_summary(self.name, summary)
+        return summary
+
     def to_df(self, latest: bool = True):
         """
-        Returnes a dataframe constructed from the log files
-        latest: if True, only the latest log file is used
+        Returnes a dataframe of the results in the results store
+        latest: if True, only the results of the latest day are returned
+        Log files written before the store existed are imported incrementally on the way.
         """
-        files = glob(f"{self.path}/*.log")
-        if latest:
-            files = [max(files, key=lambda x: os.path.getctime(x))]
-        records = []
-        for file in files:
-            with open(file, 'r') as f:
-                lines = f.readlines()
-                for line in lines:
-                    sections = line.split('|')
-                    if len(sections) > 1 and 'DEBUG' in sections[1]:
-                        with contextlib.suppress(JSONDecodeError):
-                            records.append(json.loads(sections[-1]))
-        return pd.DataFrame(records)
+        self.store.import_logs(self.path)
+        return self.store.latest() if latest else self.store.query()
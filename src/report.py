@@ -0,0 +1,71 @@
+import typing
+import numpy as np
+import pandas as pd
+from src import stats
+
+STEP = ['workflow', 'tech', 'step']
+TECH = ['workflow', 'tech']
+SCALES = [1., 10.]
+
+
+def aggregate(df: pd.DataFrame, by: typing.List[str] = None) -> pd.DataFrame:
+    """
+    Median time and MB/s of the measured trials per workflow, tech, step and file size -
+    runs which uploaded different sizes at the same step aren't mixed
+    """
+    by = (by or STEP) + ['file_size']
+    df = stats.with_throughput(stats.measured(df))
+    df = df.assign(time=pd.to_numeric(df['time'], errors='coerce'),
+                   file_size=pd.to_numeric(df['file_size'], errors='coerce')).dropna(subset=['time', 'file_size'])
+    return (df.groupby(by, sort=True)
+            .agg(count=('time', 'size'), time=('time', 'median'), mb_s=('mb_s', 'median'))
+            .reset_index())
+
+
+def fit(df: pd.DataFrame, by: typing.List[str] = None, x: str = 'file_size', y: str = 'time') -> pd.DataFrame:
+    """
+    Least squares fit of y = overhead + seconds_per_mb * x per group, from sums computed in one group-by.
+    Groups with a single size get a nan slope and their mean time as overhead.
+    r2 is the share of the variance the fit explains, mb_s the throughput the slope implies.
+    """
+    by = by or TECH
+    df = df.assign(_x=df[x].astype(float), _y=df[y].astype(float))
+    df = df.assign(_xx=df['_x'] ** 2, _xy=df['_x'] * df['_y'], _yy=df['_y'] ** 2)
+    sums = df.groupby(by, sort=True).agg(n=('_x', 'size'), x=('_x', 'sum'), y=('_y', 'sum'), xx=('_xx', 'sum'),
+                                         xy=('_xy', 'sum'), yy=('_yy', 'sum'), max_size=('_x', 'max'))
+    n = sums['n']
+    sxx = sums['xx'] - sums['x'] ** 2 / n
+    sxy = sums['xy'] - sums['x'] * sums['y'] / n
+    syy = sums['yy'] - sums['y'] ** 2 / n
+    spread = sxx > 1e-12 * sums['xx'].clip(lower=1)
+    slope = (sxy / sxx).where(spread)
+    overhead = (sums['y'] - slope.fillna(0) * sums['x']) / n
+    r2 = (1 - (syy - slope * sxy) / syy).where(spread & (syy > 0))
+    return pd.DataFrame({'points': n, 'overhead': overhead, 'seconds_per_mb': slope,
+                         'mb_s': 1 / slope.where(slope > 0), 'r2': r2,
+                         'max_size': sums['max_size']}).reset_index()
+
+
+def extrapolate(fits: pd.DataFrame, scales: typing.List[float] = None,
+                sizes: typing.List[float] = None) -> pd.DataFrame:
+    """
+    Predicted time per fit at scales of the largest size it was measured at (10 = 10x today's data)
+    and at absolute sizes in MB - one row per fit and target.
+    """
+    targets = pd.concat([pd.DataFrame({'target': [f"{scale:g}x" for scale in scales or []],
+                                       'scale': scales or [], 'size': np.nan}),
+                         pd.DataFrame({'target': [f"{size:g}MB" for size in sizes or []],
+                                       'scale': np.nan, 'size': sizes or []})], ignore_index=True)
+    df = fits.merge(targets, how='cross')
+    df['size'] = df['size'].fillna(df['scale'] * df['max_size'])
+    df['predicted_time'] = df['overhead'] + df['seconds_per_mb'] * df['size']
+    return df
+
+
+def predictions(fits: pd.DataFrame, scales: typing.List[float] = None, sizes: typing.List[float] = None,
+                by: typing.List[str] = None) -> pd.DataFrame:
+    """The predicted times as a table - a row per fit and a column per target"""
+    by = by or TECH
+    df = extrapolate(fits, scales, sizes)
+    table = df.pivot(index=by, columns='target', values='predicted_time')
+    return table.reindex(columns=df['target'].unique()).rename_axis(columns=None).reset_index()
@@ -0,0 +1,223 @@
+import contextlib
+import json
+import os
+import os.path as path
+import threading
+from glob import glob
+from json import JSONDecodeError
+import duckdb
+import pandas as pd
+from src.stats import MATCH
+
+COLUMNS = {'run_name': 'VARCHAR',
+           'timestamp': 'TIMESTAMP',
+           'workflow': 'VARCHAR',
+           'tech': 'VARCHAR',
+           'label': 'VARCHAR',
+           'step': 'BIGINT',
+           'rows': 'BIGINT',
+           'suffix': 'VARCHAR',
+           'time': 'DOUBLE',
+           'file_size': 'DOUBLE',
+           'row_group_size': 'BIGINT',
+           'align_rows': 'BIGINT',
+           'compression': 'VARCHAR',
+           'compression_level': 'BIGINT',
+           'use_dictionary': 'BOOLEAN',
+           'write_statistics': 'BOOLEAN',
+           'trial': 'BIGINT',
+           'warmup': 'BOOLEAN',
+           'failed': 'BOOLEAN',
+           'branch': 'VARCHAR',
+           'pyxet': 'VARCHAR',
+           'gitxet': 'VARCHAR'}
+INDEXED = ['run_name', 'tech', 'workflow', 'label', 'timestamp']
+
+
+class ResultStore:
+    """
+    Results kept in a duckdb table.
+    The common fields are typed and indexed columns, the full record is kept as json in the `record` column.
+    Records are appended in batches and the connection is only open while reading or writing,
+    so other processes can query the store while a benchmark is running.
+    """
+
+    def __init__(self, filepath: str = 'logs/results.duckdb', batch_size: int = 100):
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._created = False
+
+    @contextlib.contextmanager
+    def connect(self):
+        directory = path.dirname(self.filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        con = duckdb.connect(self.filepath)
+        try:
+            if not self._created:
+                self._create(con)
+            yield con
+        finally:
+            con.close()
+
+    def _create(self, con):
+        columns = ', '.join(f'"{name}" {kind}' for name, kind in COLUMNS.items())
+        con.execute(f"CREATE TABLE IF NOT EXISTS results ({columns}, record VARCHAR)")
+        existing = {name for name, in con.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'results'").fetchall()}
+        missing = {name: kind for name, kind in COLUMNS.items() if name not in existing}
+        if missing:  # stores created before a column was added - filled from the records
+            for column in INDEXED + ['match']:  # tables with indexes can't be altered
+                con.execute(f"DROP INDEX IF EXISTS results_{column}")
+            for name, kind in missing.items():
+                con.execute(f'ALTER TABLE results ADD COLUMN "{name}" {kind}')
+                con.execute(f"""UPDATE results SET "{name}" = TRY_CAST(trim(json_extract_string(record, '$.{name}'))
+                                                            AS {kind})""")
+        con.execute("CREATE TABLE IF NOT EXISTS imported_logs (filepath VARCHAR PRIMARY KEY, bytes_read BIGINT)")
+        for column in INDEXED:
+            con.execute(f'CREATE INDEX IF NOT EXISTS results_{column} ON results ("{column}")')
+        columns = ', '.join(f'"{column}"' for column in MATCH)
+        con.execute(f"CREATE INDEX IF NOT EXISTS results_match ON results ({columns})")
+        self._created = True
+
+    @staticmethod
+    def _to_row(record: dict) -> dict:
+        row = {name: record.get(name) for name in COLUMNS}
+        for name, kind in COLUMNS.items():
+            if row[name] is not None and kind == 'VARCHAR':
+                row[name] = str(row[name]).strip()
+            elif isinstance(row[name], str) and kind in ('BIGINT', 'DOUBLE'):
+                row[name] = pd.to_numeric(row[name], errors='coerce')
+        row['record'] = json.dumps(record, default=str)
+        return row
+
+    def _insert(self, con, records: list):
+        """Inserts records which are not in the store yet - a record is identified by run_name and timestamp"""
+        batch = pd.DataFrame([self._to_row(record) for record in records], columns=list(COLUMNS) + ['record'])
+        batch['timestamp'] = pd.to_datetime(batch['timestamp'], errors='coerce')
+        con.register('batch', batch)
+        columns = ', '.join(f'"{name}"' for name in list(COLUMNS) + ['record'])
+        con.execute(f"""
+            INSERT INTO results ({columns}) SELECT {columns} FROM batch b
+            WHERE NOT EXISTS (SELECT 1 FROM results r
+                              WHERE r.run_name IS NOT DISTINCT FROM b.run_name
+                              AND r."timestamp" IS NOT DISTINCT FROM b."timestamp")
+        """)
+        con.unregister('batch')
+
+    def append(self, record: dict):
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        with self.connect() as con:
+            self._insert(con, self._buffer)
+        self._buffer = []
+
+    def import_logs(self, directory: str) -> int:
+        """
+        Incrementally imports results from loguru files - only the bytes appended since the last import are read.
+        Returns the number of records read.
+        """
+        count = 0
+        with self.connect() as con:
+            offsets = dict(con.execute("SELECT filepath, bytes_read FROM imported_logs").fetchall())
+            for file in sorted(glob(f"{directory}/*.log")):
+                size = path.getsize(file)
+                offset = offsets.get(file, 0)
+                if size == offset:
+                    continue
+                if size < offset:  # the file was rewritten
+                    offset = 0
+                with open(file, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read(size - offset)
+                data = data[:data.rfind(b'\n') + 1]  # a partially written line is read next time
+                records = []
+                for line in data.decode('utf-8', errors='replace').splitlines():
+                    sections = line.split('|')
+                    if len(sections) > 1 and 'DEBUG' in sections[1]:
+                        with contextlib.suppress(JSONDecodeError):
+                            records.append(json.loads(sections[-1]))
+                if records:
+                    self._insert(con, records)
+                con.execute("INSERT OR REPLACE INTO imported_logs VALUES (?, ?)", [file, offset + len(data)])
+                count += len(records)
+        return count
+
+    def query(self, where: str = '', parameters: list = None) -> pd.DataFrame:
+        """Returns the full records matching the where clause, in the order they were logged"""
+        self.flush()
+        with self.connect() as con:
+            records = con.execute(f"""SELECT record FROM results {f'WHERE {where}' if where else ''}
+                                      ORDER BY "timestamp" """, parameters or []).fetchall()
+        return pd.DataFrame([json.loads(record) for record, in records])
+
+    def sql(self, query: str, parameters: list = None) -> pd.DataFrame:
+        """Runs a query on the typed columns of the results table"""
+        self.flush()
+        with self.connect() as con:
+            return con.execute(query, parameters or []).df()
+
+    def lookup(self, keys: pd.DataFrame, filters: dict = None, exclude_run: str = None) -> pd.DataFrame:
+        """
+        The typed results with the same workflow, tech, step, rows and suffix as a row of keys -
+        an equality lookup on the match index per distinct key, so it stays fast over a long history.
+        filters: column values the results must have, e.g. {'branch': 'main'} - values with % are LIKE patterns
+        exclude_run: a run whose results are left out, e.g. the run compared with its baseline
+        """
+        self.flush()
+        conditions, parameters = [], []
+        for column, value in (filters or {}).items():
+            if column not in COLUMNS:
+                raise ValueError(f"Can't filter on {column} - not one of {', '.join(COLUMNS)}")
+            conditions.append(f'"{column}" {"LIKE" if "%" in str(value) else "="} ?')
+            parameters.append(value)
+        if exclude_run is not None:
+            conditions.append("run_name IS DISTINCT FROM ?")
+            parameters.append(exclude_run)
+        columns = ', '.join(f'"{column}"' for column in COLUMNS)
+        frames = []
+        with self.connect() as con:
+            for key in keys[MATCH].drop_duplicates().itertuples(index=False):
+                key = {column: value.item() if hasattr(value, 'item') else value
+                       for column, value in zip(MATCH, key) if not pd.isna(value)}
+                matches = [f'"{column}" = ?' if column in key else f'"{column}" IS NULL' for column in MATCH]
+                frames.append(con.execute(f"SELECT {columns} FROM results WHERE {' AND '.join(matches + conditions)}",
+                                          list(key.values()) + parameters).df())
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(COLUMNS))
+
+    def write_summary(self, run_name: str, summary: pd.DataFrame):
+        """Replaces the summary of a run - summaries are kept in their own table, next to the results"""
+        self.flush()
+        summary = summary.assign(run_name=run_name)
+        columns = ', '.join(f'"{name}"' for name in summary.columns)
+        with self.connect() as con:
+            con.register('summary', summary)
+            con.execute("CREATE TABLE IF NOT EXISTS summaries AS SELECT * FROM summary LIMIT 0")
+            con.execute("DELETE FROM summaries WHERE run_name = ?", [run_name])
+            con.execute(f"INSERT INTO summaries ({columns}) SELECT {columns} FROM summary")
+            con.unregister('summary')
+
+    def summaries(self, run_name: str = None) -> pd.DataFrame:
+        """The summaries of a run, or of every run"""
+        with self.connect() as con:
+            if not con.execute("SELECT 1 FROM information_schema.tables WHERE table_name = 'summaries'").fetchall():
+                return pd.DataFrame()
+            where, parameters = ("WHERE run_name = ?", [run_name]) if run_name else ('', [])
+            return con.execute(f"SELECT * FROM summaries {where}", parameters).df()
+
+    def latest(self) -> pd.DataFrame:
+        """Records of the latest day - like the latest log file"""
+        return self.query("""\"timestamp\" >= (SELECT date_trunc('day', max("timestamp")) FROM results)""")
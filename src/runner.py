@@ -0,0 +1,130 @@
+import asyncio
+import collections
+import contextlib
+import os
+import re
+import signal
+import time
+import typing
+from dataclasses import dataclass, field
+
+MAX_LINES = 1000
+UNITS = {'B': 1, 'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3, 'TiB': 1024 ** 4,
+         'KB': 1000, 'MB': 1000 ** 2, 'GB': 1000 ** 3, 'TB': 1000 ** 4, 'Bytes': 1}
+# "Writing objects: 100% (3/3), 1.20 MiB | ..." (git), "Completed 256.0 KiB/1.2 MiB ..." (aws cli)
+TRANSFERRED_PATTERN = re.compile(r'(?:Writing objects:.*?, |Completed )([\d.]+) ([KMGT]i?B|B|Bytes)')
+
+
+def parse_transferred(line: str) -> typing.Optional[float]:
+    """Bytes transferred so far according to a progress line of git or the aws cli"""
+    match = TRANSFERRED_PATTERN.search(line)
+    if match:
+        return float(match.group(1)) * UNITS[match.group(2)]
+    return None
+
+
+@dataclass
+class CommandResult:
+    command: str
+    returncode: int = None
+    stdout: str = ''
+    stderr: str = ''
+    duration: float = 0.
+    timed_out: bool = False
+    bytes_transferred: float = None
+    lines: int = field(default=0, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+    @property
+    def output(self) -> str:
+        """stdout, or stderr if there is nothing on stdout - what Helper.run used to return"""
+        return self.stdout or self.stderr
+
+    def __str__(self):
+        return self.output
+
+
+async def _read(stream: asyncio.StreamReader, result: CommandResult, name: str, tail: collections.deque,
+                on_line: typing.Callable = None):
+    """Reads a stream incrementally - progress lines ending with \r are handled as lines too"""
+    pending = b''
+
+    def handle(raw: bytes):
+        line = raw.decode(errors='replace')
+        if not line.strip():
+            return
+        tail.append(line)
+        result.lines += 1
+        transferred = parse_transferred(line)
+        if transferred is not None:
+            result.bytes_transferred = max(result.bytes_transferred or 0, transferred)
+        if on_line is not None:
+            on_line(name, line)
+
+    while True:
+        chunk = await stream.read(64 * 1024)
+        if not chunk:
+            break
+        *complete, pending = re.split(rb'[\r\n]', pending + chunk)
+        for raw in complete:
+            handle(raw)
+    handle(pending)
+
+
+async def run_async(command: str, cwd: str = None, timeout: float = None, on_line: typing.Callable = None,
+                    env: dict = None) -> CommandResult:
+    """
+    Runs a shell command, streaming stdout and stderr line by line to on_line(stream_name, line).
+    On timeout the whole process group is killed and the result is marked as timed out.
+    """
+    result = CommandResult(command)
+    tails = {name: collections.deque(maxlen=MAX_LINES) for name in ('stdout', 'stderr')}
+    start_time = time.time()
+    process = await asyncio.create_subprocess_shell(command,
+                                                    cwd=cwd or None,
+                                                    env={**os.environ, **env} if env else None,
+                                                    stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.PIPE,
+                                                    start_new_session=True)
+    readers = asyncio.gather(_read(process.stdout, result, 'stdout', tails['stdout'], on_line),
+                             _read(process.stderr, result, 'stderr', tails['stderr'], on_line),
+                             process.wait())
+    try:
+        await asyncio.wait_for(readers, timeout)
+    except asyncio.TimeoutError:
+        result.timed_out = True
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+        await process.wait()
+    result.returncode = process.returncode
+    result.duration = time.time() - start_time
+    for name, tail in tails.items():  # only the last lines are kept, noisy progress output isn't held in memory
+        setattr(result, name, '\n'.join(tail) + '\n' if tail else '')
+    return result
+
+
+def run(command: str, cwd: str = None, timeout: float = None, on_line: typing.Callable = None,
+        env: dict = None) -> CommandResult:
+    """Blocking wrapper of run_async - safe to call from worker threads"""
+    return asyncio.run(run_async(command, cwd, timeout, on_line, env))
+
+
+def run_many(commands: typing.List[dict], concurrency: int = None) -> typing.List[CommandResult]:
+    """
+    Runs several commands at once, each given as the keyword arguments of run_async.
+    Results are returned in the order of the commands.
+    """
+
+    async def gather():
+        semaphore = asyncio.Semaphore(concurrency or len(commands) or 1)
+
+        async def limited(kwargs: dict):
+            async with semaphore:
+                return await run_async(**kwargs)
+
+        return await asyncio.gather(*[limited(kwargs) for kwargs in commands])
+
+    return list(asyncio.run(gather()))
@@ -0,0 +1,100 @@
+import json
+import os
+import os.path as path
+import threading
+import time
+import typing
+from datetime import datetime
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class RunPlan:
+    """
+    The options of a benchmark and the state of each of its cells - a (step, trial, tech) upload.
+    The plan is saved under <directory>/<run_name>.json after every cell, so an interrupted benchmark
+    can be resumed with the same options, skipping the cells which are done.
+    """
+
+    def __init__(self, run_name: str, options: dict, directory: str = 'logs/runs', cells: dict = None):
+        """
+        run_name: the run the results are logged under
+        options: the benchmark options - must be json serializable
+        directory: where plans are saved
+        """
+        self.run_name = run_name
+        self.options = options
+        self.directory = directory
+        self.cells = cells or {}
+        self._lock = threading.Lock()
+
+    @property
+    def filepath(self) -> str:
+        return path.join(self.directory, f"{self.run_name}.json")
+
+    @classmethod
+    def load(cls, run_name: str, directory: str = 'logs/runs') -> 'RunPlan':
+        try:
+            with open(path.join(directory, f"{run_name}.json")) as f:
+                plan = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No run plan for {run_name} in {directory}") from None
+        return cls(plan['run_name'], plan['options'], directory, plan['cells'])
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.filepath}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'run_name': self.run_name, 'options': self.options, 'cells': self.cells}, f, indent=2)
+        os.replace(tmp_path, self.filepath)
+
+    @staticmethod
+    def key(step: int, trial: int, tech: str) -> str:
+        return f"{step}/{trial}/{tech}"
+
+    def status(self, step: int, trial: int, tech: str) -> str:
+        return self.cells.get(self.key(step, trial, tech), {}).get('status', PENDING)
+
+    def pending(self, step: int, trial: int, techs: typing.List[str]) -> typing.List[str]:
+        """The techs of the step and trial which aren't done - failed cells are tried again"""
+        return [tech for tech in techs if self.status(step, trial, tech) != DONE]
+
+    def finish(self, step: int, trial: int, tech: str, error: str = None, attempts: int = 1):
+        """Records the outcome of a cell and saves the plan"""
+        with self._lock:
+            cell = self.cells.setdefault(self.key(step, trial, tech), {'attempts': 0})
+            cell.update({'status': FAILED if error else DONE, 'error': error,
+                         'attempts': cell['attempts'] + attempts, 'updated': datetime.now().isoformat()})
+            self._save()
+
+    def failed(self) -> typing.Dict[str, dict]:
+        return {key: cell for key, cell in self.cells.items() if cell['status'] == FAILED}
+
+
+def with_retries(func: typing.Callable[[int], typing.Any], retries: int = 2, backoff: float = 30.,
+                 failure: typing.Callable[[typing.Any], typing.Optional[str]] = None,
+                 sleep: typing.Callable[[float], None] = time.sleep) -> typing.Tuple[typing.Any, str, int]:
+    """
+    Calls func(attempt) until it succeeds, at most retries + 1 times, waiting backoff * 2 ** attempt in between.
+    An attempt fails if it raises or if failure(result) returns an error message.
+    Returns the last result (None if it raised), the last error (None on success) and the number of attempts.
+    """
+    result, error = None, None
+    for attempt in range(retries + 1):
+        result, error = None, None
+        try:
+            result = func(attempt)
+            error = failure(result) if failure else None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if error is None:
+            return result, None, attempt + 1
+        if attempt < retries:
+            sleep(backoff * 2 ** attempt)
+    return result, error, retries + 1
@@ -0,0 +1,101 @@
+import os
+import time
+import typing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+MIN_PART_SIZE = 5 * 1024 ** 2  # S3 rejects smaller parts, except for the last one
+
+
+class S3Uploader:
+    """
+    In-process multipart upload on a boto3 client.
+    Parts are read and uploaded by a thread pool, so at most max_concurrency parts are held in memory.
+    """
+
+    def __init__(self, client, part_size: int = 8 * 1024 ** 2, max_concurrency: int = 8, retries: int = 3,
+                 backoff: float = 0.5):
+        """
+        client: a boto3 s3 client
+        part_size: bytes per part - files up to one part are uploaded with a single put_object
+        max_concurrency: parts uploaded at the same time
+        retries: attempts per part after the first one fails
+        backoff: seconds to wait before the first retry, doubled on every retry
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.client = client
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+
+    def _with_retries(self, func: typing.Callable, stats: dict):
+        for attempt in range(self.retries + 1):
+            try:
+                return func()
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                stats['retries'] += 1
+                logger.warning(f"Part {stats['part']} failed ({e}), retrying")
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _upload_part(self, fd: int, bucket: str, key: str, upload_id: str, number: int) -> dict:
+        stats = {'part': number, 'bytes': 0, 'retries': 0}
+        start_time = time.time()
+        data = os.pread(fd, self.part_size, (number - 1) * self.part_size)
+        stats['bytes'] = len(data)
+        response = self._with_retries(lambda: self.client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                                      PartNumber=number, Body=data), stats)
+        stats['etag'] = response['ETag']
+        stats['time'] = time.time() - start_time
+        return stats
+
+    def upload(self, filepath: str, bucket: str, key: str) -> dict:
+        """
+        Uploads filepath to s3://bucket/key.
+        Returns the totals, a summary of the part times and retries (part_retries lists them in part order)
+        and the per part statistics (bytes, time and retries of every part).
+        """
+        size = os.path.getsize(filepath)
+        start_time = time.time()
+        if size <= self.part_size:
+            stats = {'part': 1, 'bytes': size, 'retries': 0}
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            self._with_retries(lambda: self.client.put_object(Bucket=bucket, Key=key, Body=data), stats)
+            stats['time'] = time.time() - start_time
+            parts = [stats]
+        else:
+            upload_id = self.client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+            fd = os.open(filepath, os.O_RDONLY)
+            try:
+                numbers = range(1, -(-size // self.part_size) + 1)
+                with ThreadPoolExecutor(self.max_concurrency) as pool:
+                    parts = list(pool.map(lambda number: self._upload_part(fd, bucket, key, upload_id, number),
+                                          numbers))
+                self.client.complete_multipart_upload(
+                    Bucket=bucket, Key=key, UploadId=upload_id,
+                    MultipartUpload={'Parts': [{'PartNumber': part['part'], 'ETag': part.pop('etag')}
+                                               for part in parts]})
+            except BaseException:
+                self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+                raise
+            finally:
+                os.close(fd)
+        duration = time.time() - start_time
+        part_times = [part['time'] for part in parts]
+        return {'bytes': size,
+                'parts': len(parts),
+                'part_size': self.part_size,
+                'max_concurrency': self.max_concurrency,
+                'upload_time': duration,
+                'retries': sum(part['retries'] for part in parts),
+                'part_time_mean': sum(part_times) / len(part_times),
+                'part_time_p50': float(np.percentile(part_times, 50)),
+                'part_time_p95': float(np.percentile(part_times, 95)),
+                'part_time_max': max(part_times),
+                'part_retries': ','.join(str(part['retries']) for part in parts),
+                'part_stats': parts}
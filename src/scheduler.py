@@ -0,0 +1,75 @@
+import contextlib
+import itertools
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ISOLATED = 'isolated'
+CONTENTION = 'contention'
+
+# techs in the same group share a network path or a repo
+NETWORK_GROUPS = {'s3': 'aws',
+                  's3-native': 'aws',
+                  'dvc': 'aws',
+                  'lfs-s3': 'aws',
+                  'lakefs': 'aws',
+                  'pyxet': 'xethub',
+                  'gitxet': 'xethub',
+                  'lfs-git': 'github'}
+
+
+class JobTracker:
+    """Keeps track of the running jobs, so every job knows which other jobs overlapped with it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}
+
+    @contextlib.contextmanager
+    def job(self, name: str) -> typing.Iterator[set]:
+        """The yielded set is filled with the names of all jobs that ran at the same time"""
+        key = object()
+        with self._lock:
+            overlaps = {other for other, _ in self._active.values()}
+            for _, other_overlaps in self._active.values():
+                other_overlaps.add(name)
+            self._active[key] = (name, overlaps)
+        try:
+            yield overlaps
+        finally:
+            with self._lock:
+                self._active.pop(key)
+
+
+jobs = JobTracker()
+
+
+def run_jobs(tasks: typing.List[typing.Tuple[str, typing.Callable]], concurrency: int = 1,
+             mode: str = ISOLATED) -> typing.Iterator[str]:
+    """
+    Runs (tech, function) tasks on a thread pool and yields the techs as they finish.
+    isolated: techs of the same network group never run at the same time
+    contention: all techs run together, to measure them under shared bandwidth
+    """
+    if concurrency <= 1:
+        for tech, func in tasks:
+            func()
+            yield tech
+        return
+    group_locks = {group: threading.Lock() for group in set(NETWORK_GROUPS.values())}
+    if mode == ISOLATED:  # interleave the groups so workers don't all wait on the same lock
+        by_group = {}
+        for tech, func in tasks:
+            by_group.setdefault(NETWORK_GROUPS.get(tech, tech), []).append((tech, func))
+        tasks = [task for rank in itertools.zip_longest(*by_group.values()) for task in rank if task]
+
+    def run(tech: str, func: typing.Callable):
+        lock = group_locks.get(NETWORK_GROUPS.get(tech)) if mode == ISOLATED else None
+        with lock or contextlib.nullcontext():
+            func()
+        return tech
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        futures = [pool.submit(run, tech, func) for tech, func in tasks]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,114 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import typing
+
+_current = contextvars.ContextVar('span', default=None)
+_finished = []  # closed root spans, for the trace file
+_END = object()
+
+
+class Span:
+    """A named phase with its start, duration and nested phases"""
+
+    def __init__(self, name: str, parent: 'Span' = None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.children = []
+        self.thread = threading.get_ident()
+        self.start = time.time()
+        self.end = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def walk(self, prefix: str = '') -> typing.Iterator[typing.Tuple[str, 'Span']]:
+        """The closed spans under this one with their paths, e.g. upload/git push"""
+        for child in list(self.children):
+            if child.end is not None:
+                path = f"{prefix}{child.name}"
+                yield path, child
+                yield from child.walk(f"{path}/")
+
+    def durations(self, prefix: str = '') -> typing.Dict[str, float]:
+        """Seconds per path of the closed spans under this one - spans with the same path are summed"""
+        durations = {}
+        for path, child in self.walk(prefix):
+            durations[path] = durations.get(path, 0.) + child.duration
+        return durations
+
+    def events(self) -> typing.List[dict]:
+        """Chrome trace complete events of this span and the spans under it"""
+        return [{'name': phase.name, 'ph': 'X', 'ts': phase.start * 10 ** 6, 'dur': phase.duration * 10 ** 6,
+                 'pid': os.getpid(), 'tid': phase.thread, 'args': phase.attributes}
+                for phase in [self] + [child for _, child in self.walk()]]
+
+
+@contextlib.contextmanager
+def trace(name: str, **attributes) -> typing.Iterator[Span]:
+    """A root span - spans opened inside it, in this thread or in contexts copied from it, are nested in it"""
+    root = Span(name, **attributes)
+    token = _current.set(root)
+    try:
+        yield root
+    finally:
+        root.end = time.time()
+        _current.reset(token)
+        _finished.append(root)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes) -> typing.Iterator[typing.Optional[Span]]:
+    """A span nested in the current one - nothing is recorded outside of a trace"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent, **attributes)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.time()
+        _current.reset(token)
+
+
+def current() -> typing.Optional[Span]:
+    return _current.get()
+
+
+def iterate(items: typing.Iterable, name: str) -> typing.Iterator:
+    """Yields the items - the wait for every item is a span, e.g. for chunks generated in a pool"""
+    items = iter(items)
+    while True:
+        with span(name):
+            item = next(items, _END)
+        if item is _END:
+            return
+        yield item
+
+
+def finished() -> typing.List[Span]:
+    return list(_finished)
+
+
+def write_chrome_trace(filepath: str, roots: typing.List[Span] = None) -> int:
+    """
+    Writes the spans as a Chrome trace (chrome://tracing, ui.perfetto.dev) - by default every finished trace.
+    Returns the number of events.
+    """
+    roots = _finished if roots is None else roots
+    events = [event for root in roots for event in root.events()]
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{filepath}.tmp", 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    os.replace(f"{filepath}.tmp", filepath)
+    return len(events)
@@ -0,0 +1,147 @@
+import math
+import typing
+import numpy as np
+import pandas as pd
+
+GROUP = ['workflow', 'tech', 'step']
+MATCH = ['workflow', 'tech', 'step', 'rows', 'suffix']  # a result is compared with baselines of the same key
+METRICS = ['time', 'mb_s']
+OUTLIER_Z = 3.5  # modified z-score above which a trial is an outlier
+BOOTSTRAP_SAMPLES = 1000
+EXACT_SAMPLES = 30  # untied samples up to this combined size get an exact p-value
+
+
+def mad(values: np.ndarray) -> float:
+    """Median absolute deviation"""
+    return float(np.median(np.abs(values - np.median(values)))) if len(values) else np.nan
+
+
+def bootstrap_ci(values: np.ndarray, confidence: float = 0.95, samples: int = BOOTSTRAP_SAMPLES,
+                 seed: int = 0) -> typing.Tuple[float, float]:
+    """Percentile bootstrap confidence interval of the median - all resamples are drawn at once"""
+    if len(values) < 2:
+        return (float(values[0]), float(values[0])) if len(values) else (np.nan, np.nan)
+    rng = np.random.default_rng(seed)
+    medians = np.median(values[rng.integers(0, len(values), (samples, len(values)))], axis=1)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(medians, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def with_throughput(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds mb_s - MB uploaded per second"""
+    df = df.copy()
+    df['mb_s'] = pd.to_numeric(df['file_size'], errors='coerce') / pd.to_numeric(df['time'], errors='coerce')
+    return df
+
+
+def measured(df: pd.DataFrame) -> pd.DataFrame:
+    """Drops the warmup trials and the failed attempts of retried uploads"""
+    for column in ('warmup', 'failed'):
+        if column in df.columns:
+            df = df[~df[column].astype('boolean').fillna(False).astype(bool)]
+    return df
+
+
+def flag_outliers(df: pd.DataFrame, metric: str = 'time', by: typing.List[str] = None,
+                  threshold: float = OUTLIER_Z) -> pd.Series:
+    """
+    True for the rows whose metric is far from the median of their group - modified z-score above threshold.
+    Groups without spread (a MAD of 0) have no outliers.
+    """
+    by = by or GROUP
+    values = pd.to_numeric(df[metric], errors='coerce')
+    median = values.groupby([df[column] for column in by], dropna=False).transform('median')
+    deviation = (values - median).abs()
+    spread = deviation.groupby([df[column] for column in by], dropna=False).transform('median')
+    z = 0.6745 * deviation / spread.where(spread > 0)
+    return z.gt(threshold).fillna(False)
+
+
+def summarize(df: pd.DataFrame, by: typing.List[str] = None, confidence: float = 0.95,
+              samples: int = BOOTSTRAP_SAMPLES, seed: int = 0) -> pd.DataFrame:
+    """
+    Robust statistics of time and MB/s per group of the measured (non warmup) trials:
+    count, median, p95, MAD and a bootstrap confidence interval of the median, and the number of outliers.
+    """
+    by = by or GROUP
+    df = with_throughput(measured(df))
+    outliers = flag_outliers(df, 'time', by)
+    rows = []
+    for key, group in df.groupby(by, dropna=False, sort=True):
+        row = dict(zip(by, key if isinstance(key, tuple) else (key,)))
+        row['count'] = len(group)
+        row['outliers'] = int(outliers[group.index].sum())
+        for metric in METRICS:
+            values = group[metric].dropna().to_numpy(dtype=float)
+            low, high = bootstrap_ci(values, confidence, samples, seed)
+            row.update({f"{metric}_median": float(np.median(values)) if len(values) else np.nan,
+                        f"{metric}_p95": float(np.percentile(values, 95)) if len(values) else np.nan,
+                        f"{metric}_mad": mad(values),
+                        f"{metric}_ci_low": low,
+                        f"{metric}_ci_high": high})
+        rows.append(row)
+    columns = by + ['count', 'outliers'] + [f"{metric}_{name}" for metric in METRICS
+                                            for name in ['median', 'p95', 'mad', 'ci_low', 'ci_high']]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def _rank_sums(n: int, k: int) -> np.ndarray:
+    """How many ways k of the ranks 1..n sum to each total - by dynamic programming over the ranks"""
+    ways = np.zeros((k + 1, n * (n + 1) // 2 + 1))
+    ways[0, 0] = 1
+    for rank in range(1, n + 1):
+        ways[1:, rank:] += ways[:-1, :-rank].copy()
+    return ways[k]
+
+
+def mann_whitney(baseline: np.ndarray, current: np.ndarray) -> float:
+    """
+    One sided Mann-Whitney U test - the p-value of current being no larger than baseline.
+    Exact for small samples without ties, otherwise a normal approximation with tie and continuity corrections.
+    """
+    baseline, current = np.asarray(baseline, dtype=float), np.asarray(current, dtype=float)
+    nx, ny = len(baseline), len(current)
+    if not nx or not ny:
+        return np.nan
+    n = nx + ny
+    ranks = pd.Series(np.concatenate([baseline, current])).rank().to_numpy()
+    rank_sum = ranks[nx:].sum()
+    _, ties = np.unique(ranks, return_counts=True)
+    if n <= EXACT_SAMPLES and (ties == 1).all():
+        ways = _rank_sums(n, ny)
+        return float(ways[int(rank_sum):].sum() / ways.sum())
+    u = rank_sum - ny * (ny + 1) / 2
+    variance = nx * ny / 12 * ((n + 1) - (ties ** 3 - ties).sum() / (n * (n - 1)))
+    if variance <= 0:
+        return 1.
+    z = (u - nx * ny / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(current: pd.DataFrame, baseline: pd.DataFrame, by: typing.List[str] = None, metric: str = 'time',
+            threshold: float = 0.1, alpha: float = 0.05) -> pd.DataFrame:
+    """
+    Matches the measured trials of current with the baseline trials of the same key and tests for a slowdown.
+    A key regressed if its median is more than threshold (0.1 = 10%) above the baseline median
+    and the Mann-Whitney p-value is below alpha - single trials are never significant, repeat them.
+    """
+    by = by or MATCH
+    current, baseline = measured(current), measured(baseline)
+    baselines = dict(list(baseline.groupby(by, sort=False)))
+    rows = []
+    for key, group in current.groupby(by, sort=True):
+        values = pd.to_numeric(group[metric], errors='coerce').dropna().to_numpy()
+        reference = baselines.get(key)
+        reference = (pd.to_numeric(reference[metric], errors='coerce').dropna().to_numpy()
+                     if reference is not None else np.array([]))
+        row = dict(zip(by, key if isinstance(key, tuple) else (key,)))
+        row.update({'count': len(values), 'baseline_count': len(reference),
+                    'median': float(np.median(values)) if len(values) else np.nan,
+                    'baseline_median': float(np.median(reference)) if len(reference) else np.nan,
+                    'p_value': mann_whitney(reference, values)})
+        rows.append(row)
+    df = pd.DataFrame(rows, columns=by + ['count', 'baseline_count', 'median', 'baseline_median', 'p_value'])
+    df['change'] = df['median'] / df['baseline_median'] - 1
+    df['regression'] = (df['change'] > threshold) & (df['p_value'] < alpha)
+    return df
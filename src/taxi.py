@@ -0,0 +1,137 @@
+import contextlib
+import functools
+import json
+import os
+import os.path as path
+import shutil
+import typing
+from glob import glob
+import pyarrow as pa
+import pyarrow.parquet as pq
+from constants import CHUNK_SIZE, TAXI_DIR
+from src import spans
+from src.export import ExportOptions
+from src.generators import StreamWriter
+
+MONTH_PATTERN = 'fhvhv_tripdata_*.parquet'
+
+
+def month_files(directory: str = TAXI_DIR) -> typing.List[str]:
+    """The downloaded monthly files, oldest first - partial downloads end with .part and are left out"""
+    return sorted(glob(path.join(directory, MONTH_PATTERN)))
+
+
+def unified_schema(filepaths: typing.List[str]) -> pa.Schema:
+    """
+    The schema of the first file, where columns which are all null in it take their type from a later file.
+    Only the footers are read.
+    """
+    schema = pq.read_schema(filepaths[0]).remove_metadata()
+    for filepath in filepaths[1:]:
+        nulls = [i for i, field in enumerate(schema) if pa.types.is_null(field.type)]
+        if not nulls:
+            break
+        other = pq.read_schema(filepath)
+        for i in nulls:
+            name = schema.field(i).name
+            if name in other.names and not pa.types.is_null(other.field(name).type):
+                schema = schema.set(i, schema.field(i).with_type(other.field(name).type))
+    return schema
+
+
+class TaxiDataset:
+    """
+    The monthly FHVHV files accumulated into a single file - step N holds months 0 to N.
+    Months are streamed in record batches, so memory is bounded by batch_rows however long the history is.
+    Every month ends its own parquet row group, so the row groups of a step are a prefix of the next step's file
+    and are copied as is.
+    """
+
+    def __init__(self, directory: str = TAXI_DIR, batch_rows: int = CHUNK_SIZE, export_options: ExportOptions = None):
+        """
+        directory: where the monthly files were downloaded
+        batch_rows: rows read and written at once - also the row group size, unless the export options set it
+        export_options: parquet layout
+        """
+        self.directory = directory
+        self.batch_rows = batch_rows
+        self.export_options = export_options or ExportOptions()
+
+    @functools.cached_property
+    def months(self) -> typing.List[str]:
+        return month_files(self.directory)
+
+    @functools.cached_property
+    def schema(self) -> pa.Schema:
+        """Every month is cast to one schema, so the accumulated file has a single one"""
+        return unified_schema(self.months)
+
+    def _manifest(self) -> dict:
+        return {'batch_rows': self.batch_rows, 'export_options': self.export_options.to_dict(),
+                'schema': self.schema.to_string()}
+
+    @staticmethod
+    def manifest_path(filepath: str) -> str:
+        return f"{filepath}.json"
+
+    def existing_months(self, filepath: str) -> typing.List[typing.Tuple[str, int]]:
+        """(month, rows) of the months in filepath if it was written by `extend` with the same settings"""
+        with contextlib.suppress(FileNotFoundError, ValueError, KeyError):
+            with open(self.manifest_path(filepath)) as f:
+                manifest = json.load(f)
+            months, size = manifest.pop('months'), manifest.pop('size')
+            if manifest == self._manifest() and path.getsize(filepath) == size:
+                return [(month, rows) for month, rows in months]
+        return []
+
+    def _tables(self, filepath: str) -> typing.Iterator[pa.Table]:
+        for batch in pq.ParquetFile(filepath).iter_batches(self.batch_rows):
+            yield pa.Table.from_batches([batch]).cast(self.schema)
+
+    @contextlib.contextmanager
+    def _writer(self, filepath: str, existing_rows: int) -> typing.Iterator[StreamWriter]:
+        """Parquet is rewritten from the previous row groups, csv is appended to a copy of the previous file"""
+        if filepath.endswith('.parquet') or not existing_rows:
+            with StreamWriter(filepath, self.batch_rows, options=self.export_options) as writer:
+                yield writer
+            return
+        directory, filename = path.split(filepath)
+        tmp_path = path.join(directory, f".tmp-{filename}")
+        with spans.span('reuse'):
+            shutil.copyfile(filepath, tmp_path)
+        with StreamWriter(tmp_path, self.batch_rows, existing_rows=existing_rows) as writer:
+            yield writer
+        os.replace(tmp_path, filepath)
+
+    def extend(self, filepath: str, step: int) -> dict:
+        """
+        Makes filepath hold months [0, step], only reading the months the previous version doesn't have.
+        Returns the last month, the number of months, the rows of the file and the rows read in this step.
+        """
+        if step >= len(self.months):
+            raise ValueError(f"Step {step} needs {step + 1} months of {MONTH_PATTERN} "
+                             f"but {len(self.months)} are in {self.directory} - download them with src/download.py")
+        names = [path.basename(month) for month in self.months[:step + 1]]
+        months = self.existing_months(filepath)
+        if [month for month, _ in months] != names[:len(months)]:  # a month was downloaded in between
+            months = []
+        existing_rows = sum(rows for _, rows in months)
+        with self._writer(filepath, existing_rows) as writer:
+            if months and writer.parquet:
+                previous = pq.ParquetFile(filepath)
+                with spans.span('reuse', row_groups=previous.num_row_groups):
+                    for row_group in range(previous.num_row_groups):
+                        writer.write_table(previous.read_row_group(row_group))
+            for month in self.months[len(months):step + 1]:
+                start = writer.rows
+                with spans.span('month', month=path.basename(month)):
+                    for table in spans.iterate(self._tables(month), 'read'):
+                        with spans.span('write'):
+                            writer.write_arrow(table)
+                    writer.flush()
+                months.append((path.basename(month), writer.rows - start))
+        with open(f"{filepath}.json.tmp", 'w') as f:
+            json.dump({**self._manifest(), 'months': months, 'size': path.getsize(filepath)}, f)
+        os.replace(f"{filepath}.json.tmp", self.manifest_path(filepath))
+        return {'month': names[-1], 'months': len(months), 'rows': writer.rows,
+                'added_rows': writer.rows - existing_rows}
@@ -1,13 +1,166 @@
+import contextlib
+import json
+import os
 import os.path as path
 import shutil
+import threading
+import typing
 import duckdb
 
+APPEND = 'append'
+REWRITE = 'rewrite'
+MANIFEST = '_manifest.json'
+MAX_PARTS = 64
+TARGET_BYTES = 512 * 1024 ** 2
 
-def merge_files(new_filename: str, merged_filename: str):
-    if not path.exists(merged_filename):
-        shutil.copyfile(new_filename, merged_filename)
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _lock(dataset: str, kind: str = 'write') -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault((path.abspath(dataset), kind), threading.Lock())
+
+
+def read_manifest(dataset: str) -> dict:
+    with contextlib.suppress(FileNotFoundError):
+        with open(path.join(dataset, MANIFEST)) as f:
+            return json.load(f)
+    return {'parts': [], 'rows': 0, 'bytes': 0, 'next_part': 0}
+
+
+def _write_manifest(dataset: str, manifest: dict):
+    manifest['rows'] = sum(part['rows'] for part in manifest['parts'])
+    manifest['bytes'] = sum(part['bytes'] for part in manifest['parts'])
+    tmp_path = path.join(dataset, f".tmp-{MANIFEST}")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path.join(dataset, MANIFEST))
+
+
+def dataset_files(dataset: str) -> typing.List[str]:
+    """The part files of a merged dataset in order - read them rather than globbing, compaction may be running"""
+    return [path.join(dataset, part['file']) for part in read_manifest(dataset)['parts']]
+
+
+def _add_part(dataset: str, manifest: dict, source: str, move: bool = False) -> dict:
+    """Places source in the dataset under the next part name, atomically"""
+    import pyarrow.parquet as pq
+    name = f"part-{manifest['next_part']:05d}.parquet"
+    manifest['next_part'] += 1
+    tmp_path = path.join(dataset, f".tmp-{name}")
+    if move:
+        os.replace(source, tmp_path)
     else:
-        duckdb.execute(f"""
-                    COPY (SELECT * FROM read_parquet(['{new_filename}', '{merged_filename}'])) TO '{merged_filename}' (FORMAT 'parquet');
-                    """)
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, path.join(dataset, name))
+    filepath = path.join(dataset, name)
+    return {'file': name, 'rows': pq.ParquetFile(filepath).metadata.num_rows, 'bytes': path.getsize(filepath)}
+
+
+def compact(dataset: str, target_bytes: int = TARGET_BYTES) -> int:
+    """
+    Rewrites the parts smaller than target_bytes into one part, returns the number of parts merged.
+    Parts merged while compacting are kept - only the manifest swap and the deletion take the dataset lock.
+    """
+    compacting = _lock(dataset, 'compact')
+    if not compacting.acquire(blocking=False):  # another compaction is running
+        return 0
+    try:
+        return _compact(dataset, target_bytes)
+    finally:
+        compacting.release()
+
+
+def _small_runs(parts: typing.List[dict], target_bytes: int) -> typing.List[typing.List[dict]]:
+    """The runs of at least two adjacent parts smaller than target_bytes - a large part ends a run"""
+    runs, run = [], []
+    for part in parts + [None]:
+        if part is not None and part['bytes'] < target_bytes:
+            run.append(part)
+            continue
+        if len(run) > 1:
+            runs.append(run)
+        run = []
+    return runs
+
+
+def _write_run(dataset: str, run: typing.List[dict], tmp_path: str):
+    """Streams the parts of a run into one file, a row group at a time"""
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for part in run:
+            part_file = pq.ParquetFile(path.join(dataset, part['file']))
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, part_file.schema_arrow)
+            for row_group in range(part_file.num_row_groups):
+                writer.write_table(part_file.read_row_group(row_group))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _compact(dataset: str, target_bytes: int) -> int:
+    with _lock(dataset):
+        manifest = read_manifest(dataset)
+        runs = _small_runs(manifest['parts'], target_bytes)
+        if not runs:
+            return 0
+        tmp_paths = [path.join(dataset, f".tmp-compact-{manifest['next_part']}-{i}.parquet") for i in range(len(runs))]
+    for run, tmp_path in zip(runs, tmp_paths):
+        _write_run(dataset, run, tmp_path)
+    with _lock(dataset):
+        manifest = read_manifest(dataset)  # parts may have been appended meanwhile, after the runs
+        compacted = {run[0]['file']: _add_part(dataset, manifest, tmp_path, move=True)
+                     for run, tmp_path in zip(runs, tmp_paths)}
+        files = {part['file'] for run in runs for part in run}
+        # every run is replaced in place by its compacted part, so the rows keep their order
+        manifest['parts'] = [compacted.get(part['file'], part) for part in manifest['parts']
+                             if part['file'] in compacted or part['file'] not in files]
+        _write_manifest(dataset, manifest)
+        for name in files:
+            os.remove(path.join(dataset, name))
+    return len(files)
+
+
+def merge_files(new_filename: str, merged_filename: str, mode: str = REWRITE, max_parts: int = MAX_PARTS,
+                target_bytes: int = TARGET_BYTES, background: bool = False) -> str:
+    """
+    Merges a parquet file into merged_filename.
+    rewrite: merged_filename is a single file rewritten with all the rows.
+    append: merged_filename is a directory of part files listed in a manifest - the new file is added as a part,
+            so a merge costs as much as the new data. Once there are more than max_parts parts, the small ones are
+            compacted, in a background thread if background is True. Read it with dataset_files.
+    Writes go to a temp file which is renamed into place.
+    """
+    if mode == REWRITE:
+        if not path.exists(merged_filename):
+            shutil.copyfile(new_filename, merged_filename)
+        else:
+            directory, filename = path.split(merged_filename)
+            tmp_path = path.join(directory, f".tmp-{filename}")
+            duckdb.execute(f"""
+                        COPY (SELECT * FROM read_parquet(['{new_filename}', '{merged_filename}'])) TO '{tmp_path}' (FORMAT 'parquet');
+                        """)
+            os.replace(tmp_path, merged_filename)
+        return merged_filename
+    with _lock(merged_filename):
+        if path.isfile(merged_filename):  # merged before with rewrite - the file becomes the first part
+            legacy_path = f"{merged_filename}.legacy"
+            os.replace(merged_filename, legacy_path)
+            os.makedirs(merged_filename)
+            manifest = read_manifest(merged_filename)
+            manifest['parts'].append(_add_part(merged_filename, manifest, legacy_path, move=True))
+        else:
+            os.makedirs(merged_filename, exist_ok=True)
+            manifest = read_manifest(merged_filename)
+        manifest['parts'].append(_add_part(merged_filename, manifest, new_filename))
+        _write_manifest(merged_filename, manifest)
+        parts = len(manifest['parts'])
+    if parts > max_parts:
+        if background:
+            threading.Thread(target=compact, args=(merged_filename, target_bytes), daemon=True).start()
+        else:
+            compact(merged_filename, target_bytes)
     return merged_filename
@@ -1,3 +1,4 @@
+import contextlib
 import pathlib
 import psutil
 import typing
@@ -9,6 +10,8 @@ from loguru import logger
 import json
 import duckdb
 import pyxet
+from constants import SAMPLE_INTERVAL_MS
+from src.utils.sampler import ResourceSampler
 
 
 class MetricsHelper:
@@ -27,6 +30,8 @@ class MetricsHelper:
         self.output = 'output/results.csv'
         self.is_merged = False
         self.pyxet_version = pyxet.__version__
+        # None when sampling is disabled with SAMPLE_INTERVAL_MS=0
+        self.sampler = ResourceSampler(SAMPLE_INTERVAL_MS / 1000) if SAMPLE_INTERVAL_MS else None
 
     def count(self, filepath):
         return self.con.execute(f"""SELECT COUNT(*) FROM '{filepath}'""").fetchall()[0][0]
@@ -51,31 +56,24 @@ class MetricsHelper:
         sleep_bytes_recv = net_io_after.bytes_recv - net_io_before.bytes_recv
         return self.to_mb(sleep_bytes_sent), self.to_mb(sleep_bytes_recv)
 
-    def bytes_in_rest(self, duration: float):
-        net_io_before_sleep = psutil.net_io_counters()
-        time.sleep(duration)
-        net_io_after_sleep = psutil.net_io_counters()
-        return self._to_send_recv(net_io_before_sleep, net_io_after_sleep)
-
     def record(self, func: typing.Callable, tech: str, *args, **kwargs, ):
         try:
             logger.info(f"Running {func.__name__}")
             if self.step == -1:
                 raise RuntimeError("No file set")
             error = ''
-            start_func_time = time.time()
-            net_io_before = psutil.net_io_counters()
             logger.debug(f"Running {func.__name__} with {args} and {kwargs}")
-            try:
-                func(*args, **kwargs)
-            except Exception as e:
-                error = str(e)
-                logger.error(f"Error running {func.__name__} with {args} and {kwargs} - {e}")
-
-            net_io_after = psutil.net_io_counters()
-            func_time = time.time() - start_func_time
+            with self.sampler.record() if self.sampler else contextlib.nullcontext() as timeline:
+                start_func_time = time.time()
+                net_io_before = psutil.net_io_counters()
+                try:
+                    func(*args, **kwargs)
+                except Exception as e:
+                    error = str(e)
+                    logger.error(f"Error running {func.__name__} with {args} and {kwargs} - {e}")
+                net_io_after = psutil.net_io_counters()
+                func_time = time.time() - start_func_time
             bytes_sent, bytes_recv = self._to_send_recv(net_io_before, net_io_after)
-            sleep_bytes_sent, sleep_bytes_recv = self.bytes_in_rest(1)
             result = {'time': func_time,
                       'function': func.__name__,
                       'tech': tech,
@@ -86,9 +84,8 @@ class MetricsHelper:
                       'row_count': self.row_count,
                       'sent_mb': bytes_sent,
                       'recv_mb': bytes_recv,
-                      'sent_mb_1s': sleep_bytes_sent,
-                      'recv_mb_1s': sleep_bytes_recv,
                       'error': error,
+                      **(timeline.stats() if timeline is not None else {})
                       }
             logger.debug(json.dumps(result, indent=4))
             self.steps.append(result)
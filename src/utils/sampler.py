@@ -0,0 +1,153 @@
+import collections
+import contextlib
+import threading
+import time
+import typing
+import numpy as np
+import psutil
+
+FIELDS = ['time', 'sent', 'recv', 'read', 'write', 'cpu_busy', 'cpu_total', 'memory']
+COUNTERS = ['sent', 'recv', 'read', 'write']  # bytes counters - reported as MB and MB/s
+MB = 1024 * 1024
+
+
+def sample() -> typing.Tuple[float, ...]:
+    """A row of FIELDS - system wide counters, cpu times are summed over all cpus"""
+    net = psutil.net_io_counters()
+    disk = psutil.disk_io_counters()  # None where the disks aren't visible, e.g. some containers
+    cpu = psutil.cpu_times()
+    total = sum(cpu)
+    busy = total - cpu.idle - getattr(cpu, 'iowait', 0)
+    return (time.time(), net.bytes_sent, net.bytes_recv, disk.read_bytes if disk else 0,
+            disk.write_bytes if disk else 0, busy, total, psutil.virtual_memory().used)
+
+
+class Timeline:
+    """
+    The samples of one operation - a row of FIELDS per sample, kept in a numpy array which grows by doubling.
+    baseline: idle bytes per second of each counter, subtracted from the rates
+    """
+
+    def __init__(self, baseline: typing.Dict[str, float] = None):
+        self.baseline = baseline or {}
+        self._samples = np.empty((64, len(FIELDS)))
+        self._size = 0
+
+    def append(self, row: typing.Sequence[float]):
+        if self._size and row[0] < self._samples[self._size - 1, 0]:
+            return  # sampled by the thread just before the recording started
+        if self._size == len(self._samples):
+            self._samples = np.concatenate([self._samples, np.empty_like(self._samples)])
+        self._samples[self._size] = row
+        self._size += 1
+
+    @property
+    def samples(self) -> np.ndarray:
+        return self._samples[:self._size]
+
+    def column(self, field: str) -> np.ndarray:
+        return self.samples[:, FIELDS.index(field)]
+
+    def rates(self, field: str) -> np.ndarray:
+        """Bytes per second of a counter in every interval, less the idle baseline"""
+        intervals = np.diff(self.column('time'))
+        rates = np.diff(self.column(field)) / np.where(intervals > 0, intervals, np.inf)
+        return np.clip(rates - self.baseline.get(field, 0.), 0, None)
+
+    def stats(self) -> dict:
+        """
+        Totals, mean and peak throughput per counter and the tail - the rate 95% of the intervals were above.
+        Throughput is in MB/s, cpu in percent of all cpus.
+        """
+        if self._size < 2:
+            return {}
+        duration = self.column('time')[-1] - self.column('time')[0]
+        stats = {'sample_count': self._size, 'sampled_time': duration}
+        for field in COUNTERS:
+            rates = self.rates(field)
+            total = self.column(field)[-1] - self.column(field)[0] - self.baseline.get(field, 0.) * duration
+            stats[f"{field}_mb"] = max(total, 0.) / MB
+            stats[f"{field}_mean_mb_s"] = max(total, 0.) / MB / duration if duration else 0.
+            stats[f"{field}_peak_mb_s"] = rates.max() / MB
+            stats[f"{field}_tail_mb_s"] = np.percentile(rates, 5) / MB
+        busy, total = np.diff(self.column('cpu_busy')), np.diff(self.column('cpu_total'))
+        cpu = 100 * busy / np.where(total > 0, total, np.inf)
+        stats['cpu_mean'] = 100 * busy.sum() / total.sum() if total.sum() else 0.
+        stats['cpu_peak'] = cpu.max()
+        stats['memory_peak_mb'] = self.column('memory').max() / MB
+        return {key: float(value) for key, value in stats.items()}
+
+    def save(self, filepath: str):
+        np.savez_compressed(filepath, fields=np.array(FIELDS), samples=self.samples,
+                            baseline=np.array([self.baseline.get(field, 0.) for field in FIELDS]))
+
+
+class ResourceSampler:
+    """
+    Polls network, disk, cpu and memory counters in a background thread, so throughput is measured
+    while an operation runs instead of before and after it.
+    The thread starts on the first recording and keeps sampling, so the rates of the last idle second
+    are known when the next recording starts and are subtracted as the baseline.
+    The counters are system wide - recordings which overlap share them.
+    """
+
+    def __init__(self, interval: float = 0.05, baseline_seconds: float = 1.):
+        """
+        interval: seconds between samples
+        baseline_seconds: how much of the idle time before a recording is used for the baseline
+        """
+        if interval <= 0:
+            raise ValueError("The sampling interval must be positive - disable sampling instead of sampling every 0s")
+        self.interval = interval
+        self._idle = collections.deque(maxlen=max(2, int(baseline_seconds / interval) + 1))
+        self._active = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            row = sample()
+            with self._lock:
+                if not self._active:
+                    self._idle.append(row)
+                for timeline in self._active:
+                    timeline.append(row)
+
+    def _baseline(self) -> typing.Dict[str, float]:
+        if len(self._idle) < 2:
+            return {}
+        first, last = self._idle[0], self._idle[-1]
+        elapsed = last[0] - first[0]
+        return {field: (last[FIELDS.index(field)] - first[FIELDS.index(field)]) / elapsed
+                for field in COUNTERS} if elapsed > 0 else {}
+
+    @contextlib.contextmanager
+    def record(self) -> typing.Iterator[Timeline]:
+        """Samples while the block runs - the timeline starts and ends with a sample taken on the spot"""
+        self.start()
+        with self._lock:
+            timeline = Timeline(self._baseline())
+            timeline.append(sample())
+            self._active.append(timeline)
+        try:
+            yield timeline
+        finally:
+            with self._lock:
+                self._active.remove(timeline)
+                timeline.append(sample())
+                if not self._active:
+                    self._idle.clear()  # the baseline only uses idle time
@@ -0,0 +1,59 @@
+import contextlib
+import functools
+import json
+import os
+import os.path as path
+import shutil
+import subprocess
+from importlib import metadata
+
+VERSIONS_CACHE = 'logs/.versions.json'
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version(command: str, binary: str, cache_path: str = VERSIONS_CACHE) -> str:
+    """
+    Output of a version command like `git xet --version`, probed once per session.
+    The result is also cached on disk keyed on the binary's path and mtime, so it's only probed again after an upgrade.
+    command: the shell command that prints the version
+    binary: the executable the version belongs to, e.g. git-xet
+    """
+    binary_path = shutil.which(binary)
+    if binary_path is None:
+        return ''
+    key = f"{binary_path}:{os.stat(binary_path).st_mtime_ns}"
+    cached = {}
+    with contextlib.suppress(FileNotFoundError, ValueError):
+        with open(cache_path) as f:
+            cached = json.load(f)
+    if cached.get(command, {}).get('key') == key:
+        return cached[command]['version']
+    version = subprocess.run(command, shell=True, capture_output=True).stdout.decode('utf-8')
+    cached[command] = {'key': key, 'version': version}
+    directory = path.dirname(cache_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(cached, f, indent=2)
+    os.replace(tmp_path, cache_path)
+    return version
+
+
+def package_version(name: str) -> str:
+    """Version of an installed package, without importing it"""
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return ''
+
+
+def git_branch(repo: str = '.') -> str:
+    """The current branch, read from .git/HEAD instead of running git"""
+    try:
+        with open(path.join(repo, '.git', 'HEAD')) as f:
+            head = f.read().strip()
+    except (FileNotFoundError, NotADirectoryError):  # a worktree or submodule - let git resolve it
+        return subprocess.run("git branch --show-current", shell=True, capture_output=True,
+                              cwd=repo).stdout.decode('utf-8').strip()
+    return head.removeprefix('ref: refs/heads/') if head.startswith('ref: ') else ''
@@ -0,0 +1,99 @@
+import os
+import shutil
+import time
+from tempfile import TemporaryDirectory
+from src.backends import BACKENDS, create_backends, NetworkShaper, LocalBackend, LocalGitBackend
+from src.scheduler import NETWORK_GROUPS
+
+
+def _write(filepath: str, size: int):
+    with open(filepath, 'wb') as f:
+        f.write(os.urandom(size))
+
+
+def test_registry():
+    assert {'pyxet', 's3', 's3-native', 'gitxet', 'lakefs', 'lfs-git', 'lfs-s3', 'dvc', 'local',
+            'local-git'} <= set(BACKENDS)
+    backends = create_backends(helper=None)
+    assert backends['dvc'].repo == 'dvc'
+    assert backends['lfs-git'].function_name == 'lfs_git_upload'
+    assert not backends['local'].default
+    assert NETWORK_GROUPS['local-git'] == 'local'
+
+
+def test_shaper():
+    shaper = NetworkShaper(bandwidth_mbps=80, latency_ms=20)
+    start_time = time.time()
+    shaper.transfer(10 ** 6)  # 0.1s at 80 Mbps
+    assert 0.11 <= time.time() - start_time < 0.5
+    first, second = NetworkShaper(latency_ms=5, jitter_ms=2, seed=1), NetworkShaper(latency_ms=5, jitter_ms=2, seed=1)
+    assert [first.request() for _ in range(3)] == [second.request() for _ in range(3)]
+
+
+def test_local_backend():
+    tmp = TemporaryDirectory()
+    backend = LocalBackend(f"{tmp.name}/objects")
+    filepath = f"{tmp.name}/data.bin"
+    _write(filepath, 1000)
+    result = backend.upload(filepath)
+    relative = os.path.join(tmp.name, 'data.bin')
+    assert result['bytes_transferred'] == 1000
+    assert backend.exists(relative)
+    assert backend.storage_used() == 1000
+    backend.download(relative, f"{tmp.name}/downloaded.bin")
+    with open(filepath, 'rb') as f1, open(f"{tmp.name}/downloaded.bin", 'rb') as f2:
+        assert f1.read() == f2.read()
+    backend.remove(relative)
+    assert backend.list() == []
+
+
+def test_local_git_backend():
+    tmp = TemporaryDirectory()
+    backend = LocalGitBackend(f"{tmp.name}/git")
+    assert backend.list() == []
+    filepath = f"{tmp.name}/data.bin"
+    _write(filepath, 100000)
+    shutil.copyfile(filepath, f"{backend.repo}/data.bin")
+    first = backend.upload(filepath)
+    assert backend.exists(filepath)
+    assert first['bytes_transferred'] > 0
+    shutil.copyfile(filepath, f"{backend.repo}/data.bin")
+    second = backend.upload(filepath)  # unchanged content isn't sent again
+    assert second['bytes_transferred'] < first['bytes_transferred'] / 10
+    backend.download(filepath, f"{tmp.name}/downloaded.bin")
+    assert os.path.getsize(f"{tmp.name}/downloaded.bin") == 100000
+    backend.remove(filepath)
+    assert backend.list() == []
+
+
+def test_upload_many():
+    tmp = TemporaryDirectory()
+    backend = LocalBackend(f"{tmp.name}/objects", NetworkShaper(latency_ms=200))
+    filepaths = [f"{tmp.name}/{name}.bin" for name in ('train', 'validation', 'test')]
+    for filepath in filepaths:
+        _write(filepath, 1000)
+    start_time = time.time()
+    results = backend.upload_many(filepaths, concurrent=True)
+    assert time.time() - start_time < 0.5  # the latencies overlap
+    assert [result['bytes_transferred'] for result in results] == [1000] * 3
+    assert all(result['time'] >= 0.2 for result in results)
+    assert all(backend.exists(filepath) for filepath in filepaths)
+    assert not LocalGitBackend.concurrent_uploads
+
+
+def test_lakefs_storage_used():
+    from src.runner import CommandResult
+
+    class FakeHelper:
+        lakefs_repo = 'lakefs://benchmarks/main'
+
+        def run(self, command: str, verbose: bool = True) -> CommandResult:
+            assert command == "lakectl fs ls --recursive lakefs://benchmarks/main/"
+            return CommandResult(command, 0, stdout=(
+                "object          2023-10-05 12:34:56 +0000 UTC    842 B           data/a.csv\n"
+                "object          2023-10-05 12:34:56 +0000 UTC    12 kB           data/b.csv\n"
+                "object          2023-10-05 12:34:56 +0000 UTC    1.5 MB          append.parquet\n"
+                "common_prefix                                                    data/\n"))
+
+    backend = create_backends(helper=FakeHelper())['lakefs']
+    assert backend.storage_used() == 842 + 12 * 1000 + 1.5 * 1000 ** 2
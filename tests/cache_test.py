@@ -0,0 +1,37 @@
+import os
+from tempfile import TemporaryDirectory
+from src.cache import DatasetCache
+
+
+def write(filepath: str, size: int):
+    if os.path.exists(filepath):  # cached files are hard links, writers replace them
+        os.remove(filepath)
+    with open(filepath, 'wb') as f:
+        f.write(os.urandom(size))
+
+
+def test_checkout():
+    tmp = TemporaryDirectory()
+    cache = DatasetCache(tmp.name + '/cache', max_bytes=1000)
+    filepath = tmp.name + '/data.parquet'
+    assert not cache.checkout({'rows': 1}, [filepath])
+    write(filepath, 100)
+    cache.put({'rows': 1}, [filepath])
+    os.remove(filepath)
+    assert DatasetCache(tmp.name + '/cache', max_bytes=1000).checkout({'rows': 1}, [filepath])
+    assert os.path.getsize(filepath) == 100
+
+
+def test_lru_eviction():
+    tmp = TemporaryDirectory()
+    cache = DatasetCache(tmp.name + '/cache', max_bytes=250)
+    filepath = tmp.name + '/data.parquet'
+    for rows in range(3):
+        write(filepath, 100)
+        cache.put({'rows': rows}, [filepath])
+        if rows == 1:
+            assert cache.checkout({'rows': 0}, [filepath])
+    assert cache.size == 200
+    assert cache.checkout({'rows': 0}, [filepath])
+    assert not cache.checkout({'rows': 1}, [filepath])
+    assert cache.checkout({'rows': 2}, [filepath])
@@ -0,0 +1,40 @@
+import os
+from tempfile import TemporaryDirectory
+import numpy as np
+from src.dedup import DedupAnalyzer, cut_points, _window_hashes
+
+
+def _write(filepath: str, data: bytes):
+    with open(filepath, 'wb') as f:
+        f.write(data)
+
+
+def test_window_hashes_offset_independent():
+    block = np.random.default_rng(0).integers(0, 256, 1000, dtype=np.uint8)
+    assert (_window_hashes(block)[100:] == _window_hashes(block[100:])).all()
+
+
+def test_cut_points():
+    tmp = TemporaryDirectory()
+    _write(f"{tmp.name}/random.bin", os.urandom(1024 ** 2))
+    _write(f"{tmp.name}/zeros.bin", bytes(1024 ** 2))
+    for name in ['random.bin', 'zeros.bin']:
+        cuts = cut_points(f"{tmp.name}/{name}", [16 * 1024])[16 * 1024]
+        sizes = np.diff([0] + cuts)
+        assert cuts[-1] == 1024 ** 2
+        assert sizes[:-1].min() >= 4 * 1024 and sizes.max() <= 128 * 1024
+
+
+def test_analyze():
+    tmp = TemporaryDirectory()
+    data = os.urandom(2 * 1024 ** 2)
+    _write(f"{tmp.name}/0.bin", data)
+    _write(f"{tmp.name}/1.bin", data[:1000] + b'inserted' + data[1000:] + os.urandom(100000))
+    analyzer = DedupAnalyzer(f"{tmp.name}/state", [16 * 1024])
+    first = analyzer.analyze('series', 0, [f"{tmp.name}/0.bin"])['16KiB']
+    assert first['new_bytes'] == first['total_bytes'] == len(data)
+    second = analyzer.analyze('series', 1, [f"{tmp.name}/1.bin"])['16KiB']
+    assert 100000 < second['new_bytes'] < 100000 + 300 * 1024
+    assert second['new_bytes'] + second['reused_bytes'] == len(data) + 100008
+    assert analyzer.analyze('series', 1, [f"{tmp.name}/1.bin"])['16KiB'] == second
+    assert analyzer.analyze('other', 1, [f"{tmp.name}/1.bin"])['16KiB']['reused_bytes'] == 0
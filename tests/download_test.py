@@ -0,0 +1,97 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+import pytest
+from src.download import PARTIAL_SUFFIX, download, download_file
+
+FILES = {f"fhvhv_tripdata_2023-0{month}.parquet": b'PAR1' + os.urandom(100_000 + month) + b'PAR1'
+         for month in range(1, 4)}
+FILES['yellow_tripdata_2023-01.parquet'] = b'PAR1PAR1'
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves FILES and a page linking to them - with Range requests, and truncated bodies when asked to"""
+    ranges = []
+    truncate = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/':
+            body = ''.join(f'<a href="http://{self.headers["Host"]}/data/{name}">{name}</a>' for name in FILES)
+            return self._send(200, body.encode(), {})
+        content = FILES[self.path.split('/')[-1]]
+        start = 0
+        if 'Range' in self.headers:
+            start = int(self.headers['Range'].split('=')[1].split('-')[0])
+            Handler.ranges.append(start)
+            if start >= len(content):
+                return self._send(416, b'', {'Content-Range': f"bytes */{len(content)}"})
+            headers = {'Content-Range': f"bytes {start}-{len(content) - 1}/{len(content)}"}
+            return self._send(206, content[start:], headers)
+        self._send(200, content, {})
+
+    def _send(self, status: int, body: bytes, headers: dict):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if Handler.truncate and status != 416 and self.path != '/':
+            body = body[:Handler.truncate]
+            self.close_connection = True
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    Handler.ranges, Handler.truncate = [], 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download(server):
+    tmp = TemporaryDirectory()
+    results = download(tmp.name, '2023', limit=2, workers=2, site=f"{server}/")
+    assert sorted(os.listdir(tmp.name)) == ['fhvhv_tripdata_2023-01.parquet', 'fhvhv_tripdata_2023-02.parquet']
+    for result in results:
+        with open(result['filepath'], 'rb') as f:
+            assert f.read() == FILES[os.path.basename(result['filepath'])]
+    results = download(tmp.name, 'all', workers=2, site=f"{server}/")
+    assert sorted(result['skipped'] for result in results) == [False, True, True]
+    assert len(os.listdir(tmp.name)) == 3
+
+
+def test_resume(server):
+    tmp = TemporaryDirectory()
+    name = 'fhvhv_tripdata_2023-01.parquet'
+    url = f"{server}/data/{name}"
+    Handler.truncate = 30_000
+    with pytest.raises(IOError):
+        download_file(url, tmp.name, chunk_bytes=4096)
+    assert os.listdir(tmp.name) == [name + PARTIAL_SUFFIX]  # an incomplete file is never renamed
+    partial = os.path.getsize(f"{tmp.name}/{name}{PARTIAL_SUFFIX}")
+    assert 0 < partial <= 30_000  # the chunks read before the connection was closed
+
+    Handler.truncate = 0
+    result = download_file(url, tmp.name)
+    assert Handler.ranges == [partial]
+    assert result['bytes'] == len(FILES[name]) - partial
+    with open(f"{tmp.name}/{name}", 'rb') as f:
+        assert f.read() == FILES[name]
+    assert os.listdir(tmp.name) == [name]
+
+
+def test_resume_complete(server):
+    tmp = TemporaryDirectory()
+    name = 'fhvhv_tripdata_2023-02.parquet'
+    with open(f"{tmp.name}/{name}{PARTIAL_SUFFIX}", 'wb') as f:
+        f.write(FILES[name])
+    download_file(f"{server}/data/{name}", tmp.name)
+    assert os.listdir(tmp.name) == [name]
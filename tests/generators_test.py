@@ -0,0 +1,118 @@
+from tempfile import TemporaryDirectory
+import filecmp
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from src.export import ExportOptions
+from src.generators import DataFrameGenerator
+
+
+@pytest.mark.parametrize('suffix', ['parquet', 'csv'])
+def test_stream_identical(suffix):
+    tmp = TemporaryDirectory()
+    generator = DataFrameGenerator(seed=1, numeric=True, chunk_size=64)
+    generator.export(generator.generate(1000), f"{tmp.name}/full.{suffix}")
+    generator.export_chunks(generator.generate_chunks(1000), f"{tmp.name}/stream.{suffix}")
+    assert filecmp.cmp(f"{tmp.name}/full.{suffix}", f"{tmp.name}/stream.{suffix}", shallow=False)
+
+
+def test_stream_split():
+    tmp = TemporaryDirectory()
+    generator = DataFrameGenerator(seed=1, numeric=True, chunk_size=64)
+    df = generator.generate(300)
+    splits = [(f"{tmp.name}/train.parquet", 200), (f"{tmp.name}/validation.parquet", 50),
+              (f"{tmp.name}/test.parquet", 50)]
+    generator.export_split(splits)
+    start = 0
+    for path, rows in splits:
+        expected = df.iloc[start:start + rows].reset_index(drop=True)
+        pd.testing.assert_frame_equal(pd.read_parquet(path), expected)
+        start += rows
+
+
+@pytest.mark.parametrize('suffix,numeric', [('parquet', True), ('csv', True), ('parquet', False)])
+def test_split_identical(suffix, numeric):
+    tmp = TemporaryDirectory()
+    generator = DataFrameGenerator(seed=1, numeric=numeric, chunk_size=64,
+                                   export_options=ExportOptions(align_rows=50, align_start=100))
+    splits = [(f"{tmp.name}/validation.{suffix}", 150), (f"{tmp.name}/test.{suffix}", 70)]
+    generator.export_split(splits, start=30)
+    generator.export_range(f"{tmp.name}/expected.{suffix}", 150, start=30)
+    assert filecmp.cmp(splits[0][0], f"{tmp.name}/expected.{suffix}", shallow=False)
+    generator.export_range(f"{tmp.name}/expected.{suffix}", 70, start=180)
+    assert filecmp.cmp(splits[1][0], f"{tmp.name}/expected.{suffix}", shallow=False)
+
+
+def test_features_chunks():
+    generator = DataFrameGenerator(seed=1, numeric=True, chunk_size=64)
+    df = pd.concat(list(generator.generate_with_features(200, 3)))
+    assert list(df.columns[-3:]) == ['feature_0', 'feature_1', 'feature_2']
+    pd.testing.assert_frame_equal(df[['feature_0', 'feature_1', 'feature_2']], generator.generate_features(200, 3))
+
+
+def test_wide_features():
+    tmp = TemporaryDirectory()
+    generator = DataFrameGenerator(seed=1, numeric=True, chunk_size=1000, chunk_mb=1)
+    assert generator.chunk_rows() == 1000
+    assert generator.chunk_rows(500) == 1024 ** 2 // (8 * 510)
+    generator.export_range(f"{tmp.name}/features.parquet", 600, features=500)
+    metadata = pq.ParquetFile(f"{tmp.name}/features.parquet").metadata
+    assert metadata.num_columns == 510
+    assert metadata.row_group(0).num_rows == generator.chunk_rows(500)
+    pd.testing.assert_frame_equal(pd.read_parquet(f"{tmp.name}/features.parquet"),
+                                  generator.generate_range(0, 600, 500), check_index_type=False)
+
+
+def test_diverse_deterministic():
+    df = DataFrameGenerator(seed=3, chunk_size=1000).generate(500)
+    chunked = DataFrameGenerator(seed=3, chunk_size=7).generate(500)
+    pd.testing.assert_frame_equal(df, chunked)
+    assert list(df.columns) == DataFrameGenerator(seed=3).columns
+    assert df['Email'].str.contains('@').all()
+    assert not df.equals(DataFrameGenerator(seed=4).generate(500))
+
+
+@pytest.mark.parametrize('suffix', ['parquet', 'csv'])
+def test_workers_identical(suffix):
+    tmp = TemporaryDirectory()
+    DataFrameGenerator(seed=2, numeric=True, chunk_size=100).export_range(f"{tmp.name}/serial.{suffix}", 1000)
+    DataFrameGenerator(seed=2, numeric=True, chunk_size=100, workers=3).export_range(f"{tmp.name}/pool.{suffix}", 1000)
+    assert filecmp.cmp(f"{tmp.name}/serial.{suffix}", f"{tmp.name}/pool.{suffix}", shallow=False)
+
+
+def test_generate_range():
+    generator = DataFrameGenerator(seed=2, numeric=True, chunk_size=64)
+    df = generator.generate(300)
+    pd.testing.assert_frame_equal(generator.generate_range(123, 201), df.iloc[123:201])
+
+
+@pytest.mark.parametrize('suffix', ['parquet', 'csv'])
+def test_extend(suffix):
+    tmp = TemporaryDirectory()
+    generator = DataFrameGenerator(seed=5, numeric=True, chunk_size=64)
+    generator.export_range(f"{tmp.name}/full.{suffix}", 500)
+    assert generator.extend(f"{tmp.name}/append.{suffix}", 300) == 300
+    generated = generator.extend(f"{tmp.name}/append.{suffix}", 500)
+    assert generated == (200 if suffix == 'csv' else 500 - 256)
+    assert filecmp.cmp(f"{tmp.name}/full.{suffix}", f"{tmp.name}/append.{suffix}", shallow=False)
+    assert DataFrameGenerator(seed=6, numeric=True, chunk_size=64).extend(f"{tmp.name}/append.{suffix}", 500) == 500
+
+
+def test_aligned_row_groups():
+    tmp = TemporaryDirectory()
+    options = ExportOptions(row_group_size=64, align_rows=100, align_start=250, compression='zstd',
+                            use_dictionary=False, write_statistics=False)
+    generator = DataFrameGenerator(seed=7, numeric=True, chunk_size=50, export_options=options)
+    filepath = f"{tmp.name}/append.parquet"
+    generator.extend(filepath, 350)
+    with open(filepath, 'rb') as f:
+        previous = f.read()
+    row_groups = pq.ParquetFile(filepath).metadata
+    assert [row_groups.row_group(i).num_rows for i in range(row_groups.num_row_groups)] == [64, 64, 64, 58, 64, 36]
+    assert generator.extend(filepath, 450) == 100  # every row group of the previous step is reused
+    with open(filepath, 'rb') as f:
+        current = f.read()
+    footer = int.from_bytes(previous[-8:-4], 'little') + 8
+    assert current[:len(previous) - footer] == previous[:-footer]
+    pd.testing.assert_frame_equal(pd.read_parquet(filepath),
+                                  DataFrameGenerator(seed=7, numeric=True).generate(450))
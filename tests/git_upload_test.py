@@ -0,0 +1,75 @@
+import os
+import shutil
+import subprocess
+from tempfile import TemporaryDirectory
+import pytest
+from src.backends import create_backends
+from src.helper import Helper
+from src.runs import with_retries
+
+GIT_ENV = {**os.environ, 'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@test',
+           'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@test'}
+
+
+def _git(command: str, cwd: str) -> str:
+    return subprocess.run(f"git {command}", shell=True, cwd=cwd, env=GIT_ENV, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    """A clone of an empty remote with a data file to upload"""
+    tmp = TemporaryDirectory()
+    _git("init -q --bare -b main remote.git", tmp.name)
+    _git("clone -q remote.git repo", tmp.name)
+    for key in ('GIT_AUTHOR_NAME', 'GIT_AUTHOR_EMAIL', 'GIT_COMMITTER_NAME', 'GIT_COMMITTER_EMAIL'):
+        monkeypatch.setenv(key, GIT_ENV[key])
+    with open(f"{tmp.name}/repo/data.csv", 'w') as f:
+        f.write('id\n1\n')
+    yield f"{tmp.name}/repo"
+
+
+def test_upload_unchanged_file(repo):
+    helper = Helper()
+    assert helper._git_upload('data.csv', repo).ok
+    result = helper._git_upload('data.csv', repo)  # a clean tree is an empty commit, which is pushed
+    assert result.ok and result.command.strip() == 'git push'
+    assert _git("rev-parse HEAD", repo) == _git("rev-parse origin/main", repo)
+    assert _git("rev-list --count HEAD", repo) == '2'
+
+
+def test_repeated_trials(repo, monkeypatch):
+    """Every trial copies the same file into the repo, uploads it and removes the copy, as the benchmark does"""
+    workdir = os.path.dirname(repo)
+    os.symlink(repo, f"{workdir}/{Helper.LFS_S3}")
+    monkeypatch.chdir(workdir)
+    backend = create_backends(helper=Helper())['lfs-s3']
+    shutil.move(f"{repo}/data.csv", f"{workdir}/data.csv")
+    for trial in range(2):
+        shutil.copyfile('data.csv', f"{backend.repo}/data.csv")
+        result = backend.upload('data.csv')
+        assert result['returncode'] == 0, result['out']
+        os.remove(f"{backend.repo}/data.csv")
+    assert _git("rev-parse HEAD", repo) == _git("rev-parse origin/main", repo)
+
+
+def test_retry_after_failed_push(repo):
+    """The first attempt commits but can't push - the retry commits again and pushes both commits"""
+    remote = _git("remote get-url origin", repo)
+    _git("remote set-url origin ../nowhere.git", repo)
+    attempts = []
+
+    def attempt(number: int):
+        attempts.append(number)
+        return Helper()._git_upload('data.csv', repo)
+
+    def restore_remote(seconds: float):
+        _git(f"remote set-url origin {remote}", repo)
+
+    result, error, count = with_retries(attempt, retries=2, backoff=0,
+                                        failure=lambda result: None if result.ok else result.output,
+                                        sleep=restore_remote)
+    assert error is None and count == 2 and attempts == [0, 1]
+    assert result.command.strip() == 'git push'
+    assert _git("rev-parse HEAD", repo) == _git("rev-parse origin/main", repo)
+    assert _git("ls-tree --name-only origin/main", repo) == 'data.csv'
@@ -1,4 +1,7 @@
+import json
+import duckdb
 from src.logger import Logger
+from src.results import ResultStore
 from tempfile import TemporaryDirectory
 
 tmp = TemporaryDirectory()
@@ -16,3 +19,76 @@ def test_logger_print():
 
     df = logger.to_df()
     assert len(df) > 0
+
+
+def test_logger_store():
+    directory = TemporaryDirectory()
+    logger = Logger(directory.name, {'key': 'value'})
+    logger.log({'tech': 'pyxet', 'time': 1.5})
+    logger.log({'tech': 's3', 'time': 2.5})
+    df = logger.to_df()
+    assert list(df['tech']) == ['pyxet', 's3']
+    assert (df['run_name'] == logger.name).all()
+    assert len(logger.store.query("tech = ?", ['s3'])) == 1
+
+
+def test_import_logs():
+    directory = TemporaryDirectory()
+    store = ResultStore(f"{directory.name}/results.duckdb")
+    line = '2023-09-25 13:44:41.586 | DEBUG    | src.logger:log:33 - |{}\n'
+    with open(f"{directory.name}/2023-09-25.log", 'w') as f:
+        f.write(line.format(json.dumps({'run_name': 'old', 'timestamp': '2023-09-25T13:44:41', 'tech': 's3'})))
+        f.write('2023-09-25 13:44:42.000 | INFO     | main:track:68 - running s3_upload\n')
+    assert store.import_logs(directory.name) == 1
+    assert store.import_logs(directory.name) == 0
+    with open(f"{directory.name}/2023-09-25.log", 'a') as f:
+        f.write(line.format(json.dumps({'run_name': 'old', 'timestamp': '2023-09-25T13:50:00', 'tech': 'dvc'})))
+    assert store.import_logs(directory.name) == 1
+    assert list(store.query()['tech']) == ['s3', 'dvc']
+
+
+def test_store_new_columns():
+    directory = TemporaryDirectory()
+    filepath = f"{directory.name}/results.duckdb"
+    con = duckdb.connect(filepath)
+    con.execute('CREATE TABLE results (run_name VARCHAR, "timestamp" TIMESTAMP, record VARCHAR)')
+    con.execute('CREATE INDEX results_run_name ON results (run_name)')
+    con.execute("INSERT INTO results VALUES ('old', '2023-09-24', ?)", [json.dumps({'branch': 'main', 'step': 3})])
+    con.close()
+    store = ResultStore(filepath)
+    store.append({'run_name': 'new', 'timestamp': '2023-09-25T13:44:41', 'compression': 'zstd',
+                  'use_dictionary': False, 'row_group_size': 64})
+    df = store.sql("SELECT compression, use_dictionary, row_group_size FROM results WHERE run_name = 'new'")
+    assert df.to_dict('records') == [{'compression': 'zstd', 'use_dictionary': False, 'row_group_size': 64}]
+    old = store.sql("SELECT branch, step FROM results WHERE run_name = 'old'")  # filled from the record
+    assert old.to_dict('records') == [{'branch': 'main', 'step': 3}]
+
+
+def test_logger_summarize():
+    directory = TemporaryDirectory()
+    logger = Logger(directory.name)
+    for trial, time in enumerate([3., 1., 2., 2.5]):
+        logger.log({'workflow': 'append', 'tech': 's3', 'step': 0, 'file_size': 10., 'time': time,
+                    'trial': trial - 1, 'warmup': trial == 0})
+    summary = logger.summarize()
+    assert summary['count'].tolist() == [3]
+    stored = logger.store.summaries(logger.name)
+    assert stored['time_median'].tolist() == [2.]
+    logger.summarize()  # a summary replaces the previous one of the run
+    assert len(logger.store.summaries()) == 1
+
+
+def test_store_lookup():
+    directory = TemporaryDirectory()
+    store = ResultStore(f"{directory.name}/results.duckdb")
+    for run_name, branch, step, time in [('old', 'main', 0, 1.), ('old', 'main', 1, 2.), ('other', 'dev', 0, 3.),
+                                         ('new', 'dev', 0, 4.)]:
+        store.append({'run_name': run_name, 'timestamp': f"2023-09-25T13:44:0{int(time)}", 'workflow': 'append',
+                      'tech': 's3', 'step': step, 'rows': 100, 'suffix': 'parquet', 'time': time,
+                      'branch': branch, 'gitxet': 'git-xet version 0.2.0\n'})
+    keys = store.query("run_name = ?", ['new'])
+    assert store.lookup(keys, {'branch': 'main'})['time'].tolist() == [1.]
+    assert sorted(store.lookup(keys, exclude_run='new')['time']) == [1., 3.]
+    assert len(store.lookup(keys, {'gitxet': '%0.2.0%'}, exclude_run='new')) == 2
+    assert store.lookup(keys, {'gitxet': 'git-xet version 0.2.0'})['time'].tolist() == [1., 3., 4.]
+    assert store.lookup(keys, {'branch': 'missing'}).empty
@@ -1,6 +1,9 @@
+import os
 from tempfile import TemporaryDirectory
+import pandas as pd
 from src.generators import DataFrameGenerator
 from src.helper import Helper
+from src.utils import APPEND, MANIFEST, REWRITE, compact, dataset_files, merge_files, read_manifest
 
 from glob import glob
 
@@ -20,5 +23,64 @@ def test_merge():
     helper = Helper()
     for file in files:
         helper.merge_files(file, path+'/merged.parquet')
+    assert os.path.isfile(path + '/merged.parquet')  # rewrite is the default, the path stays a single file
 
 
+def _mock_files(path, count, rows):
+    DataFrameGenerator().generate_mock_files(path, rows, count)
+    return sorted(glob(path + '/*.parquet'), key=lambda file: int(os.path.basename(file).split('.')[0]))
+
+
+def _read(files):
+    return pd.concat([pd.read_parquet(file) for file in files], ignore_index=True)
+
+
+def test_merge_append():
+    tmp = TemporaryDirectory()
+    files = _mock_files(tmp.name + '/mock', 3, 100)
+    merged = tmp.name + '/merged.parquet'
+    for file in files:
+        merge_files(file, merged, mode=APPEND)
+    assert read_manifest(merged)['rows'] == 300
+    assert _read(dataset_files(merged)).equals(_read(files))
+    assert not glob(merged + '/.tmp-*')
+
+
+def test_merge_compact():
+    tmp = TemporaryDirectory()
+    files = _mock_files(tmp.name + '/mock', 6, 50)
+    merged = tmp.name + '/merged.parquet'
+    for file in files:
+        merge_files(file, merged, mode=APPEND, max_parts=3)
+    assert len(dataset_files(merged)) <= 3
+    assert _read(dataset_files(merged)).equals(_read(files))
+    assert sorted(os.listdir(merged)) == sorted([MANIFEST] + [os.path.basename(f) for f in dataset_files(merged)])
+
+
+def test_compact_keeps_order():
+    tmp = TemporaryDirectory()
+    small = _mock_files(tmp.name + '/small', 3, 50)
+    big = _mock_files(tmp.name + '/big', 1, 5000)
+    files = [small[0], big[0], small[1], small[2]]
+    merged = tmp.name + '/merged.parquet'
+    for file in files:
+        merge_files(file, merged, mode=APPEND)
+    sizes = [part['bytes'] for part in read_manifest(merged)['parts']]
+    assert compact(merged, target_bytes=sizes[1]) == 2  # the first part is cut off from the others by the big one
+    parts = read_manifest(merged)['parts']
+    assert [part['rows'] for part in parts] == [50, 5000, 100]
+    assert parts[0]['bytes'] == sizes[0]
+    assert _read(dataset_files(merged)).equals(_read(files))
+
+
+def test_merge_rewrite_and_legacy():
+    tmp = TemporaryDirectory()
+    files = _mock_files(tmp.name + '/mock', 3, 100)
+    merged = tmp.name + '/merged.parquet'
+    merge_files(files[0], merged, mode=REWRITE)
+    merge_files(files[1], merged, mode=REWRITE)
+    assert pd.read_parquet(merged).shape[0] == 200
+    assert not glob(tmp.name + '/.tmp-*')
+    merge_files(files[2], merged, mode=APPEND)  # the rewritten file becomes the first part
+    assert len(dataset_files(merged)) == 2
+    assert _read(dataset_files(merged)).shape[0] == 300
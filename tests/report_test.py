@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src import report
+
+
+def _results():
+    sizes = np.repeat([10., 20., 40.], 3)
+    s3 = pd.DataFrame({'tech': 's3', 'step': np.repeat([0, 1, 2], 3), 'file_size': sizes,
+                       'time': 2 + 0.5 * sizes + np.tile([-0.1, 0, 0.1], 3), 'warmup': False})
+    dvc = pd.DataFrame({'tech': 'dvc', 'step': 0, 'file_size': [10., 10.], 'time': [3., 5.], 'warmup': False})
+    warmup = pd.DataFrame({'tech': 's3', 'step': [0], 'file_size': [10.], 'time': [100.], 'warmup': [True]})
+    return pd.concat([s3, dvc, warmup], ignore_index=True).assign(workflow='append')
+
+
+def test_aggregate_and_fit():
+    steps = report.aggregate(_results())
+    assert len(steps) == 4
+    s3 = steps[steps['tech'] == 's3']
+    assert list(s3['count']) == [3, 3, 3]  # the warmup trial is dropped
+    assert list(s3['time']) == [7, 12, 22]
+
+    fits = report.fit(steps).set_index('tech')
+    assert fits.loc['s3', 'overhead'] == pytest.approx(2)
+    assert fits.loc['s3', 'seconds_per_mb'] == pytest.approx(0.5)
+    assert fits.loc['s3', 'mb_s'] == pytest.approx(2)
+    assert fits.loc['s3', 'r2'] == pytest.approx(1)
+    assert fits.loc['dvc', 'overhead'] == 4 and np.isnan(fits.loc['dvc', 'seconds_per_mb'])  # a single size
+
+
+def test_predictions():
+    fits = report.fit(report.aggregate(_results()))
+    table = report.predictions(fits, scales=[10], sizes=[1000]).set_index('tech')
+    assert list(table.columns) == ['workflow', '10x', '1000MB']
+    assert table.loc['s3', '10x'] == pytest.approx(2 + 0.5 * 400)
+    assert table.loc['s3', '1000MB'] == pytest.approx(502)
+    assert np.isnan(table.loc['dvc', '10x'])
@@ -0,0 +1,32 @@
+import time
+from src.runner import run, run_many, parse_transferred
+
+
+def test_run():
+    lines = []
+    result = run("echo hello && printf 'a\\rb\\n' && echo oops 1>&2 && exit 3",
+                 on_line=lambda name, line: lines.append((name, line)))
+    assert result.returncode == 3 and not result.ok
+    assert result.stdout == 'hello\na\nb\n'
+    assert result.stderr == 'oops\n'
+    assert ('stderr', 'oops') in lines
+
+
+def test_timeout():
+    start_time = time.time()
+    result = run("sleep 10", timeout=0.5)
+    assert result.timed_out and not result.ok
+    assert time.time() - start_time < 5
+
+
+def test_run_many():
+    start_time = time.time()
+    results = run_many([{'command': f"sleep 0.5 && echo {i}"} for i in range(4)])
+    assert [result.stdout for result in results] == ['0\n', '1\n', '2\n', '3\n']
+    assert time.time() - start_time < 1.5
+
+
+def test_parse_transferred():
+    assert parse_transferred('Writing objects: 100% (3/3), 1.50 MiB | 2.00 MiB/s, done.') == 1.5 * 1024 ** 2
+    assert parse_transferred('Completed 256.0 KiB/1.2 MiB (1.0 MiB/s) with 1 file(s) remaining') == 256 * 1024
+    assert parse_transferred('Everything up-to-date') is None
@@ -0,0 +1,49 @@
+from tempfile import TemporaryDirectory
+import pytest
+from src.runs import DONE, FAILED, PENDING, RunPlan, with_retries
+
+
+def test_plan_resume():
+    tmp = TemporaryDirectory()
+    plan = RunPlan('run', {'workflow': 'append', 'tech': ['local', 'local-git']}, tmp.name)
+    plan.save()
+    assert plan.pending(0, 0, ['local', 'local-git']) == ['local', 'local-git']
+    plan.finish(0, 0, 'local')
+    plan.finish(0, 0, 'local-git', error='exit code 1', attempts=3)
+
+    loaded = RunPlan.load('run', tmp.name)
+    assert loaded.options == plan.options
+    assert loaded.status(0, 0, 'local') == DONE
+    assert loaded.status(0, 0, 'local-git') == FAILED
+    assert loaded.status(1, 0, 'local') == PENDING
+    assert loaded.pending(0, 0, ['local', 'local-git']) == ['local-git']  # failed cells run again
+    assert list(loaded.failed()) == ['0/0/local-git']
+
+    loaded.finish(0, 0, 'local-git')
+    assert RunPlan.load('run', tmp.name).failed() == {}
+    assert loaded.cells['0/0/local-git']['attempts'] == 4
+    with pytest.raises(FileNotFoundError):
+        RunPlan.load('missing', tmp.name)
+
+
+def test_with_retries():
+    waits = []
+    results = iter([{'returncode': 1}, ValueError('network'), {'returncode': 0}])
+
+    def attempt(number: int):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def failure(result: dict):
+        return 'failed' if result['returncode'] else None
+
+    result, error, attempts = with_retries(attempt, retries=2, backoff=1, failure=failure, sleep=waits.append)
+    assert (result, error, attempts) == ({'returncode': 0}, None, 3)
+    assert waits == [1, 2]
+
+    waits.clear()
+    result, error, attempts = with_retries(lambda number: 1 / 0, retries=1, backoff=5, sleep=waits.append)
+    assert result is None and error.startswith('ZeroDivisionError') and attempts == 2
+    assert waits == [5]
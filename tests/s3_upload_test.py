@@ -0,0 +1,61 @@
+import os
+from tempfile import TemporaryDirectory
+import pytest
+from src.s3_upload import S3Uploader, MIN_PART_SIZE
+
+moto_server = pytest.importorskip('moto.server')
+boto3 = pytest.importorskip('boto3')
+
+BUCKET = 'test-bucket'
+
+
+@pytest.fixture(scope='module')
+def client():
+    server = moto_server.ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    client = boto3.client('s3', endpoint_url=f"http://{host}:{port}", region_name='us-east-1',
+                          aws_access_key_id='testing', aws_secret_access_key='testing')
+    client.create_bucket(Bucket=BUCKET)
+    yield client
+    server.stop()
+
+
+@pytest.mark.parametrize('size', [1000, 2 * MIN_PART_SIZE + 123])
+def test_upload(client, size):
+    tmp = TemporaryDirectory()
+    filepath = f"{tmp.name}/data.bin"
+    data = os.urandom(size)
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    stats = S3Uploader(client, part_size=MIN_PART_SIZE, max_concurrency=3).upload(filepath, BUCKET, f"{size}.bin")
+    assert client.get_object(Bucket=BUCKET, Key=f"{size}.bin")['Body'].read() == data
+    assert stats['parts'] == -(-size // MIN_PART_SIZE)
+    assert sum(part['bytes'] for part in stats['part_stats']) == size
+    assert stats['retries'] == 0
+    assert stats['part_retries'] == ','.join(['0'] * stats['parts'])
+    assert stats['part_time_p50'] <= stats['part_time_p95'] <= stats['part_time_max']
+
+
+def test_retries(client):
+    tmp = TemporaryDirectory()
+    filepath = f"{tmp.name}/data.bin"
+    with open(filepath, 'wb') as f:
+        f.write(os.urandom(MIN_PART_SIZE + 1))
+    uploader = S3Uploader(client, part_size=MIN_PART_SIZE, retries=2, backoff=0)
+    upload_part = client.upload_part
+    failures = iter([True])
+
+    def flaky(**kwargs):
+        if next(failures, False):
+            raise ConnectionError('reset')
+        return upload_part(**kwargs)
+
+    client.upload_part = flaky
+    try:
+        stats = uploader.upload(filepath, BUCKET, 'flaky.bin')
+    finally:
+        client.upload_part = upload_part
+    assert stats['retries'] == 1
+    assert sorted(stats['part_retries'].split(',')) == ['0', '1']
+    assert client.head_object(Bucket=BUCKET, Key='flaky.bin')['ContentLength'] == MIN_PART_SIZE + 1
@@ -0,0 +1,59 @@
+import os
+import time
+from tempfile import TemporaryDirectory
+import numpy as np
+import pytest
+from src.utils.sampler import FIELDS, MB, ResourceSampler, Timeline
+
+
+def _row(seconds: float, sent: float, busy: float = 0., total: float = 0.):
+    row = dict.fromkeys(FIELDS, 0.)
+    row.update({'time': seconds, 'sent': sent, 'cpu_busy': busy, 'cpu_total': total})
+    return [row[field] for field in FIELDS]
+
+
+def test_timeline_stats():
+    timeline = Timeline({'sent': 1 * MB})
+    for seconds, sent in enumerate([0, 2, 6, 8, 10]):  # MB sent so far, sampled every second
+        timeline.append(_row(seconds, sent * MB, busy=seconds, total=4 * seconds))
+    stats = timeline.stats()
+    assert stats['sample_count'] == 5 and stats['sampled_time'] == 4
+    assert stats['sent_mb'] == pytest.approx(10 - 4)  # the idle MB/s is subtracted
+    assert stats['sent_mean_mb_s'] == pytest.approx(1.5)
+    assert stats['sent_peak_mb_s'] == pytest.approx(3)
+    assert stats['sent_tail_mb_s'] == pytest.approx(1)
+    assert stats['cpu_mean'] == pytest.approx(25)
+
+
+def test_timeline_grows():
+    timeline = Timeline()
+    for seconds in range(200):
+        timeline.append(_row(seconds, seconds))
+    assert timeline.samples.shape == (200, len(FIELDS))
+    np.testing.assert_array_equal(timeline.column('sent'), np.arange(200))
+
+
+def test_sampler_records():
+    tmp = TemporaryDirectory()
+    sampler = ResourceSampler(interval=0.01)
+    try:
+        with sampler.record() as timeline:
+            with open(f"{tmp.name}/data.bin", 'wb') as f:
+                f.write(os.urandom(MB))
+            time.sleep(0.2)
+        samples = len(timeline.samples)
+        time.sleep(0.05)
+        assert len(timeline.samples) == samples  # nothing is added once the block is done
+        assert samples > 5
+        stats = timeline.stats()
+        assert 0.2 <= stats['sampled_time'] < 1
+        assert stats['memory_peak_mb'] > 0
+        timeline.save(f"{tmp.name}/samples.npz")
+        assert np.load(f"{tmp.name}/samples.npz")['samples'].shape == (samples, len(FIELDS))
+    finally:
+        sampler.stop()
+
+
+def test_sampler_interval():
+    with pytest.raises(ValueError):
+        ResourceSampler(interval=0)
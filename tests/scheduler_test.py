@@ -0,0 +1,31 @@
+import threading
+import time
+from src.scheduler import jobs, run_jobs, CONTENTION, ISOLATED
+
+
+def make_task(tech: str, results: dict, running: list, lock: threading.Lock):
+    def task():
+        with lock:
+            running.append(tech)
+            results[tech] = set(running)
+        with jobs.job(tech) as overlaps:
+            time.sleep(0.1)
+        with lock:
+            running.remove(tech)
+        results[tech] = overlaps
+    return tech, task
+
+
+def test_contention_overlaps():
+    results, running, lock = {}, [], threading.Lock()
+    tasks = [make_task(tech, results, running, lock) for tech in ['s3', 'dvc', 'pyxet']]
+    assert sorted(run_jobs(tasks, concurrency=3, mode=CONTENTION)) == ['dvc', 'pyxet', 's3']
+    assert results['s3'] == {'dvc', 'pyxet'}
+
+
+def test_isolated_groups():
+    results, running, lock = {}, [], threading.Lock()
+    tasks = [make_task(tech, results, running, lock) for tech in ['s3', 'dvc', 'pyxet']]
+    list(run_jobs(tasks, concurrency=3, mode=ISOLATED))
+    assert 'dvc' not in results['s3'] and 's3' not in results['dvc']
+    assert results['pyxet'] & {'s3', 'dvc'}
@@ -0,0 +1,69 @@
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+from src import spans
+from src.helper import Helper
+
+
+def test_nested_durations():
+    with spans.trace('upload') as root:
+        with spans.span('copy'):
+            time.sleep(0.02)
+        for _ in range(2):
+            with spans.span('git add'):
+                with spans.span('clean'):
+                    time.sleep(0.01)
+    durations = root.durations('upload/')
+    assert set(durations) == {'upload/copy', 'upload/git add', 'upload/git add/clean'}
+    assert durations['upload/copy'] >= 0.02
+    assert durations['upload/git add/clean'] >= 0.02  # spans with the same path are summed
+    assert durations['upload/git add'] >= durations['upload/git add/clean']
+    assert root in spans.finished()
+
+
+def test_no_trace():
+    with spans.span('orphan') as span:
+        assert span is None
+    assert spans.current() is None
+
+
+def test_threads_and_iterate():
+    def work():
+        with spans.span('thread'):
+            return sum(spans.iterate(range(3), 'item'))
+
+    with spans.trace('root') as root:
+        with ThreadPoolExecutor(2) as pool:
+            assert pool.submit(contextvars.copy_context().run, work).result() == 3
+            assert pool.submit(work).result() == 3  # without the context the spans aren't recorded
+    assert [path for path, _ in root.walk()] == ['thread'] + ['thread/item'] * 4
+
+
+def test_helper_commands():
+    with spans.trace('upload') as root:
+        Helper().run("echo hello", verbose=False)
+        Helper().run("true", verbose=False, span='commit')
+    assert list(root.durations()) == ['echo hello', 'commit']
+
+
+def test_chrome_trace():
+    tmp = TemporaryDirectory()
+    with spans.trace('prepare', workflow='append') as root:
+        with spans.span('export'):
+            pass
+    assert spans.write_chrome_trace(f"{tmp.name}/trace.json", [root]) == 2
+    with open(f"{tmp.name}/trace.json") as f:
+        events = json.load(f)['traceEvents']
+    assert [event['name'] for event in events] == ['prepare', 'export']
+    assert events[0]['ph'] == 'X' and events[0]['args'] == {'workflow': 'append'}
+    assert events[0]['ts'] <= events[1]['ts'] and events[1]['dur'] <= events[0]['dur']
+
+
+def test_helper_stops_at_failed_command():
+    tmp = TemporaryDirectory()  # not a git repo, so git add fails
+    with spans.trace('upload') as root:
+        result = Helper()._git_upload(f"{tmp.name}/data.csv", tmp.name)
+    assert result.command == "git add data.csv" and not result.ok
+    assert list(root.durations()) == ['git add']  # nothing is committed or pushed
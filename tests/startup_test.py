@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_STARTUP_SECONDS = float(os.getenv("MAX_STARTUP_SECONDS", 1))
+HEAVY_MODULES = ['pandas', 'pyarrow', 'faker', 'duckdb', 'boto3', 's3fs', 'pyxet']
+
+
+def test_startup_time():
+    durations = []
+    for _ in range(3):
+        start_time = time.time()
+        subprocess.run([sys.executable, 'main.py', '--help'], cwd=ROOT, check=True, capture_output=True)
+        durations.append(time.time() - start_time)
+    assert min(durations) < MAX_STARTUP_SECONDS, f"main.py --help took {min(durations):.2f}s"
+
+
+def test_no_heavy_imports():
+    code = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES} if m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True)
+    assert out.stdout.decode().strip() == ''
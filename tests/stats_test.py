@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src import stats
+
+
+def _results(times, tech='s3', step=0, warmup=0):
+    return pd.DataFrame({'workflow': 'append', 'tech': tech, 'step': step, 'file_size': 100.,
+                         'time': times, 'warmup': [i < warmup for i in range(len(times))]})
+
+
+def test_mad_and_bootstrap():
+    values = np.array([1., 2., 3., 4., 100.])
+    assert stats.mad(values) == 1
+    low, high = stats.bootstrap_ci(values)
+    assert low <= 3 <= high
+    assert stats.bootstrap_ci(values) == stats.bootstrap_ci(values)  # seeded
+    assert stats.bootstrap_ci(np.array([2.])) == (2, 2)
+
+
+def test_flag_outliers():
+    df = pd.concat([_results([10, 11, 10.5, 9.5, 60]), _results([1, 1, 1, 1, 1], tech='dvc')], ignore_index=True)
+    assert list(stats.flag_outliers(df)) == [False] * 4 + [True] + [False] * 5
+
+
+def test_summarize():
+    df = pd.concat([_results([100, 10, 12, 11, 50], warmup=1), _results([5, 5], tech='dvc', step=1)],
+                   ignore_index=True)
+    summary = stats.summarize(df).set_index('tech')
+    assert summary.loc['s3', 'count'] == 4  # the warmup trial is dropped
+    assert summary.loc['s3', 'time_median'] == 11.5
+    assert summary.loc['s3', 'time_mad'] == 1
+    assert summary.loc['s3', 'outliers'] == 1
+    assert summary.loc['s3', 'time_p95'] == pytest.approx(np.percentile([10, 12, 11, 50], 95))
+    assert summary.loc['dvc', 'mb_s_median'] == 20
+    assert summary.loc['dvc', 'time_ci_low'] == summary.loc['dvc', 'time_ci_high'] == 5
+
+
+def test_mann_whitney():
+    assert stats.mann_whitney([1, 2, 3], [4, 5, 6]) == pytest.approx(0.05)  # 1 of 20 orderings
+    assert stats.mann_whitney([4, 5, 6], [1, 2, 3]) == 1
+    rng = np.random.default_rng(0)
+    assert stats.mann_whitney(rng.normal(10, 1, 40), rng.normal(12, 1, 40)) < 0.001
+    assert stats.mann_whitney([1, 1, 1], [1, 1, 1]) == 1  # no spread
+    assert np.isnan(stats.mann_whitney([], [1]))
+
+
+def test_compare():
+    current = pd.concat([_results([12, 13, 12.5, 13.5]), _results([1, 1.1], tech='dvc')], ignore_index=True)
+    baseline = pd.concat([_results([10, 10.5, 9.5, 10.2]), _results([1, 1.05], tech='dvc')], ignore_index=True)
+    for df in (current, baseline):
+        df['rows'], df['suffix'] = 100, 'parquet'
+    comparison = stats.compare(current, baseline).set_index('tech')
+    assert comparison.loc['s3', 'regression']
+    assert comparison.loc['s3', 'change'] == pytest.approx(12.75 / 10.1 - 1)
+    assert not comparison.loc['dvc', 'regression']  # 2 trials are never significant
+    assert not stats.compare(current, baseline, threshold=0.5)['regression'].any()
+    missing = stats.compare(current, baseline.iloc[:0])
+    assert missing['baseline_count'].tolist() == [0, 0] and not missing['regression'].any()
+
+
+def test_measured_drops_failed_attempts():
+    df = _results([0.1, 10, 11, 12], warmup=0)
+    df['failed'] = [True, False, None, False]  # a fast auth error, retried
+    assert stats.measured(df)['time'].tolist() == [10, 11, 12]
+    assert stats.summarize(df).loc[0, 'time_median'] == 11
@@ -0,0 +1,65 @@
+import os
+import subprocess
+from tempfile import TemporaryDirectory
+import pytest
+from src.helper import Helper
+
+GIT_ENV = {**os.environ, 'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@test',
+           'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@test'}
+
+
+def _git(command: str, cwd: str) -> str:
+    return subprocess.run(f"git {command}", shell=True, cwd=cwd, env=GIT_ENV, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+def _commit(repo: str, filename: str):
+    with open(f"{repo}/{filename}", 'w') as f:
+        f.write(filename)
+    _git(f"add {filename} && git commit -q -m {filename} && git push -q origin HEAD:main", repo)
+
+
+@pytest.fixture
+def repos():
+    """A remote, a clone which pushes to it and two clones which sync from it"""
+    tmp = TemporaryDirectory()
+    _git("init -q --bare -b main remote.git", tmp.name)
+    _git("clone -q remote.git writer", tmp.name)
+    _commit(f"{tmp.name}/writer", 'first')
+    for name in ('a', 'b'):
+        _git(f"clone -q remote.git {name}", tmp.name)
+    yield tmp.name
+
+
+@pytest.mark.parametrize('mode', ['full', 'blobless', 'shallow'])
+def test_sync(repos, mode):
+    helper = Helper()
+    a, b = f"{repos}/a", f"{repos}/b"
+    results = helper.sync([a, b, f"{repos}/missing"], mode)
+    assert [result['status'] for result in results.values()] == ['up-to-date', 'up-to-date', 'missing']
+
+    _commit(f"{repos}/writer", 'second')
+    results = helper.sync([a, b], mode)
+    assert results[a]['status'] == results[b]['status'] == 'updated'
+    assert results[a]['time'] > 0
+    remote = _git("rev-parse HEAD", f"{repos}/writer")
+    assert _git("rev-parse HEAD", a) == _git("rev-parse HEAD", b) == remote
+    assert os.path.exists(f"{a}/second")
+    assert helper.sync([a], mode)[a]['status'] == 'up-to-date'
+
+
+def test_sync_keeps_full_clone(repos):
+    a = f"{repos}/a"
+    _commit(f"{repos}/writer", 'second')
+    assert Helper().sync([a])[a]['status'] == 'updated'
+    with pytest.raises(subprocess.CalledProcessError):  # the default doesn't make it a partial clone
+        _git("config --get remote.origin.partialclonefilter", a)
+
+
+def test_sync_failure(repos):
+    a = f"{repos}/a"
+    _git("remote set-url origin ../nowhere.git", a)
+    result = Helper().sync([a])[a]
+    assert result['status'] == 'failed' and result['error']
+    with pytest.raises(ValueError):
+        Helper().sync([a], 'deep')
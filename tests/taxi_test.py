@@ -0,0 +1,67 @@
+import os
+from tempfile import TemporaryDirectory
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from src.export import ExportOptions
+from src.taxi import TaxiDataset, month_files
+
+
+def _months(directory: str, sizes=(1000, 1500, 700)):
+    """Fake monthly files - the first month has an all null column, like early months of the real data"""
+    frames = []
+    for month, rows in enumerate(sizes, start=1):
+        df = pd.DataFrame({'hvfhs_license_num': 'HV0003',
+                           'pickup_datetime': pd.date_range(f"2023-0{month}-01", periods=rows, freq='min'),
+                           'trip_miles': [float(i % 97) for i in range(rows)],
+                           'airport_fee': None if month == 1 else 2.5})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, f"{directory}/fhvhv_tripdata_2023-0{month}.parquet")
+        frames.append(table.cast(pa.schema([field if field.name != 'airport_fee' else field.with_type(pa.float64())
+                                            for field in table.schema])).to_pandas())
+    with open(f"{directory}/fhvhv_tripdata_2023-04.parquet.part", 'wb') as f:
+        f.write(b'PAR1')
+    return frames
+
+
+def test_extend():
+    tmp = TemporaryDirectory()
+    frames = _months(tmp.name)
+    assert len(month_files(tmp.name)) == 3
+    filepath = f"{tmp.name}/out/taxi.parquet"
+    dataset = TaxiDataset(tmp.name, batch_rows=400)
+    assert dataset.extend(filepath, 0) == {'month': 'fhvhv_tripdata_2023-01.parquet', 'months': 1, 'rows': 1000,
+                                           'added_rows': 1000}
+    previous = pq.ParquetFile(filepath)
+    first = [previous.metadata.row_group(i).num_rows for i in range(previous.num_row_groups)]
+    assert first == [400, 400, 200]  # the month ends its own row group
+
+    result = TaxiDataset(tmp.name, batch_rows=400).extend(filepath, 2)
+    assert result['rows'] == 3200 and result['added_rows'] == 2200
+    df = pd.read_parquet(filepath)
+    pd.testing.assert_frame_equal(df, pd.concat(frames, ignore_index=True))
+    assert df['airport_fee'].dtype == 'float64'
+    parquet = pq.ParquetFile(filepath)
+    sizes = [parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)]
+    assert sizes == first + [400, 400, 400, 300, 400, 300]
+
+    fresh = f"{tmp.name}/fresh/taxi.parquet"
+    TaxiDataset(tmp.name, batch_rows=400).extend(fresh, 2)
+    with open(filepath, 'rb') as f, open(fresh, 'rb') as g:
+        assert f.read() == g.read()  # reusing the previous step doesn't change the file
+
+    with pytest.raises(ValueError):
+        dataset.extend(filepath, 3)
+
+
+def test_extend_csv():
+    tmp = TemporaryDirectory()
+    frames = _months(tmp.name, (10, 20))
+    filepath = f"{tmp.name}/taxi.csv"
+    dataset = TaxiDataset(tmp.name, batch_rows=8, export_options=ExportOptions())
+    dataset.extend(filepath, 0)
+    assert dataset.extend(filepath, 1)['added_rows'] == 20
+    df = pd.read_csv(filepath, parse_dates=['pickup_datetime'])
+    assert len(df) == 30 and list(df.columns) == list(frames[0].columns)
+    assert sorted(os.listdir(tmp.name))[-2:] == ['taxi.csv', 'taxi.csv.json']
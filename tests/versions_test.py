@@ -0,0 +1,33 @@
+import os
+import stat
+from tempfile import TemporaryDirectory
+from src.versions import tool_version, git_branch
+
+
+def test_tool_version_cached():
+    tmp = TemporaryDirectory()
+    binary = f"{tmp.name}/fake-tool"
+    counter = f"{tmp.name}/calls"
+    with open(binary, 'w') as f:
+        f.write(f"#!/bin/sh\necho x >> {counter}\necho 1.0\n")
+    os.chmod(binary, os.stat(binary).st_mode | stat.S_IEXEC)
+    cache_path = f"{tmp.name}/versions.json"
+    assert tool_version(binary, binary, cache_path) == '1.0\n'
+    tool_version.cache_clear()  # a new session
+    assert tool_version(binary, binary, cache_path) == '1.0\n'
+    with open(counter) as f:
+        assert len(f.readlines()) == 1
+    os.utime(binary, ns=(0, 0))  # upgraded
+    tool_version.cache_clear()
+    tool_version(binary, binary, cache_path)
+    with open(counter) as f:
+        assert len(f.readlines()) == 2
+    assert tool_version('missing-tool --version', 'missing-tool', cache_path) == ''
+
+
+def test_git_branch():
+    tmp = TemporaryDirectory()
+    os.makedirs(f"{tmp.name}/.git")
+    with open(f"{tmp.name}/.git/HEAD", 'w') as f:
+        f.write("ref: refs/heads/feature/x\n")
+    assert git_branch(tmp.name) == 'feature/x'